@@ -1,10 +1,42 @@
+import os
+import io
+import zipfile
+import tempfile
+import weakref
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
-from sqlite_database import get_all_users, get_all_predictions, get_prediction_details
-from session_state import is_admin, get_current_user_id
+from datetime import datetime, timedelta
+from storage import (get_all_users, get_prediction_details, search_predictions, get_prediction_analytics,
+                     get_prediction_date_range)
+from timeseries import BUCKET_SECONDS, choose_bucket
+from export import EXPORT_FORMATS, export_predictions
+from session_state import is_admin, get_current_user_id, get_current_username
+from admission import limiters
+from fragments import page_fragment
+from memory import track_frame, evict_hooks, memory_report
+from profiling import (PROFILE_TARGETS, PROFILE_MAX_RUNS, start_capture, stop_capture, capture_status,
+                       last_capture)
 
+# Prediction records shown per page in the admin history view
+RECORDS_PAGE_SIZE = 50
+
+# Analytics time ranges, in days (None for all time)
+ANALYTICS_RANGES = {
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365,
+    "All time": None
+}
+
+# Analytics timeline bucket sizes; Auto picks the finest one within the chart point budget
+ANALYTICS_BUCKETS = {"Auto": None, "Hour": "hour", "Day": "day", "Week": "week", "Month": "month"}
+
+# Most active users shown in the user distribution chart
+ANALYTICS_TOP_USERS = 20
+
+@page_fragment
 def render_admin_panel():
     """Render the admin panel with user management and data insights"""
     if not is_admin():
@@ -14,7 +46,7 @@ def render_admin_panel():
     st.title("🔐 Admin Panel")
     
     # Admin dashboard tabs
-    tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "👥 User Management", "📋 Prediction History"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard", "👥 User Management", "📋 Prediction History", "⏱️ Profiling"])
     
     with tab1:
         render_admin_dashboard()
@@ -24,14 +56,17 @@ def render_admin_panel():
     
     with tab3:
         render_prediction_history()
+    
+    with tab4:
+        render_profiling()
 
 def render_admin_dashboard():
     """Render the admin dashboard with key metrics and charts"""
     st.header("Dashboard")
     
-    # Get all users and predictions for analytics
+    # Get all users, and prediction counts aggregated by the database
     users = get_all_users()
-    predictions = get_all_predictions()
+    analytics = get_prediction_analytics(bucket=None, top_users=0)
     
     # Key metrics
     col1, col2, col3 = st.columns(3)
@@ -40,12 +75,11 @@ def render_admin_dashboard():
         st.metric("Total Users", len(users))
     
     with col2:
-        st.metric("Total Predictions", len(predictions))
+        st.metric("Total Predictions", analytics['total'])
     
     with col3:
         # Calculate high risk percentage
-        high_risk_count = sum(1 for p in predictions if p['risk_level'] == 'High')
-        high_risk_percentage = (high_risk_count / len(predictions)) * 100 if predictions else 0
+        high_risk_percentage = (analytics['high'] / analytics['total']) * 100 if analytics['total'] else 0
         st.metric("High Risk Patients", f"{high_risk_percentage:.1f}%")
     
     # Create user signup trend chart
@@ -55,6 +89,7 @@ def render_admin_dashboard():
         # Convert to DataFrame for charting
         df_users = pd.DataFrame(users)
         df_users['date'] = pd.to_datetime(df_users['created_at']).dt.date
+        track_frame("admin.user_registrations", df_users)
         user_counts = df_users.groupby('date').size().reset_index(name='count')
         
         fig = px.line(
@@ -67,12 +102,13 @@ def render_admin_dashboard():
         st.plotly_chart(fig, use_container_width=True)
     
     # Create risk distribution chart
-    if predictions:
+    if analytics['total']:
         st.subheader("Risk Level Distribution")
         
-        # Convert to DataFrame for charting
-        df_predictions = pd.DataFrame(predictions)
-        risk_counts = df_predictions.groupby('risk_level').size().reset_index(name='count')
+        risk_counts = pd.DataFrame({
+            'risk_level': ['High', 'Low'],
+            'count': [analytics['high'], analytics['low']]
+        })
         
         fig = px.pie(
             risk_counts,
@@ -83,6 +119,117 @@ def render_admin_dashboard():
             color_discrete_map={'High': '#e74c3c', 'Low': '#2ecc71'}
         )
         st.plotly_chart(fig, use_container_width=True)
+    
+    render_server_load()
+    render_memory_usage()
+
+def render_server_load():
+    """Show how busy each admission-controlled stage is in this server process"""
+    st.subheader("Server Load")
+    
+    rows = []
+    for name, limiter in limiters.items():
+        stats = limiter.stats()
+        rows.append({
+            'Stage': name,
+            'Running': f"{stats['running']} / {stats['concurrency']}",
+            'Waiting': f"{stats['waiting']} / {stats['queue_size']}",
+            'Admitted': stats['admitted'],
+            'Rejected': stats['rejected'],
+            'Timed Out': stats['timed_out']
+        })
+    
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+def render_profiling():
+    """Profile the next script runs or predictions from any session, and download the results"""
+    st.header("Profiling")
+    st.caption("Captures a cProfile profile and sampled stacks of the next script runs in this server process, "
+               "from any user's session. Profiling slows those runs down, so keep captures short.")
+    
+    capture = capture_status()
+    if capture is not None:
+        st.info(f"Profiling the {capture.describe()}: {len(capture.completed)} captured so far.")
+        if st.button("Stop profiling"):
+            stop_capture()
+            st.rerun(scope="fragment")
+    else:
+        with st.form("profiling_form"):
+            target = st.radio("Profile", options=list(PROFILE_TARGETS), format_func=lambda t: f"Next {PROFILE_TARGETS[t]}",
+                              horizontal=True)
+            runs = st.number_input("Number of runs", min_value=1, max_value=PROFILE_MAX_RUNS, value=5)
+            if st.form_submit_button("Start profiling"):
+                success, message = start_capture(target, int(runs), get_current_username())
+                if success:
+                    st.success(message)
+                else:
+                    st.error(message)
+    
+    capture = last_capture()
+    if capture is None:
+        return
+    
+    st.subheader(f"Last profile: {capture.id}")
+    st.caption(f"{capture.describe()}; files in {capture.directory}")
+    if capture.completed:
+        st.dataframe(pd.DataFrame([{
+            'Run': record['number'],
+            'Kind': record['kind'],
+            'Labels': ", ".join(record['labels']),
+            'Duration (ms)': round(record['duration_ms'], 1),
+            'Samples': record['samples'],
+            'Finished': record['finished_at'].strftime('%H:%M:%S')
+        } for record in capture.completed]), use_container_width=True, hide_index=True)
+    else:
+        st.info("No runs were profiled before the capture stopped.")
+    
+    if capture.summary_path and os.path.exists(capture.summary_path):
+        col1, col2 = st.columns(2)
+        with col1:
+            with open(capture.summary_path, 'rb') as summary_file:
+                st.download_button("Download summary", data=summary_file, file_name=f"profile-{capture.id}.txt",
+                                   mime="text/plain")
+        with col2:
+            # pstats and collapsed-stack files for snakeviz, flamegraph.pl or speedscope
+            bundle = io.BytesIO()
+            with zipfile.ZipFile(bundle, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name in sorted(os.listdir(capture.directory)):
+                    archive.write(os.path.join(capture.directory, name), arcname=f"profile-{capture.id}/{name}")
+            st.download_button("Download all files", data=bundle.getvalue(), file_name=f"profile-{capture.id}.zip",
+                               mime="application/zip")
+
+def render_memory_usage():
+    """Show what this server process holds in memory, by cache and by session"""
+    st.subheader("Memory")
+    
+    report = memory_report()
+    sessions = report['sessions']
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Resident Memory", f"{report['rss'] / 2**20:,.0f} MiB" if report['rss'] else "n/a")
+    with col2:
+        st.metric("Peak Resident Memory", f"{report['peak_rss'] / 2**20:,.0f} MiB" if report['peak_rss'] else "n/a")
+    with col3:
+        session_total = sum(s['state_bytes'] + s['frame_bytes'] for s in sessions)
+        st.metric("Held by Sessions", f"{session_total / 2**10:,.0f} KiB", f"{len(sessions)} open", delta_color="off")
+    
+    st.dataframe(pd.DataFrame([{
+        'Cache': name,
+        'Entries': entries,
+        'Size (KiB)': round(size / 2**10, 1)
+    } for name, entries, size in report['caches']]), use_container_width=True, hide_index=True)
+    
+    if sessions:
+        # Largest sessions first
+        st.dataframe(pd.DataFrame([{
+            'Session': s['session'],
+            'User': s['username'] or "guest",
+            'State (KiB)': round(s['state_bytes'] / 2**10, 1),
+            'Last Rerun DataFrames (KiB)': round(s['frame_bytes'] / 2**10, 1),
+            'Largest Key': s['largest_key'],
+            'Evictions': s['evictions']
+        } for s in sessions[:20]]), use_container_width=True, hide_index=True)
 
 def render_user_management():
     """Render the user management section"""
@@ -111,22 +258,43 @@ def render_user_management():
     })
     
     # Display users table
+    track_frame("admin.users", df_users)
     st.dataframe(df_users[['ID', 'Username', 'Email', 'Admin', 'Created At']], use_container_width=True)
 
 def render_prediction_history():
     """Render the prediction history section with enhanced analytics and visualization"""
     st.header("Prediction History Analytics")
     
-    # Get all predictions
-    predictions = get_all_predictions()
+    range_col, bucket_col = st.columns(2)
+    with range_col:
+        range_label = st.selectbox("Time range", options=list(ANALYTICS_RANGES), index=1)
+    with bucket_col:
+        bucket_label = st.selectbox("Group timeline by", options=list(ANALYTICS_BUCKETS))
     
-    if not predictions:
-        st.info("No predictions found.")
-        return
+    days = ANALYTICS_RANGES[range_label]
+    until = datetime.utcnow()
+    since = until - timedelta(days=days) if days else None
     
-    # Convert to DataFrame for display
-    df_predictions = pd.DataFrame(predictions)
-    df_predictions['date'] = pd.to_datetime(df_predictions['prediction_date'])
+    # Keep the timeline within the chart point budget for the visible range
+    smallest_bucket = choose_bucket(since or get_prediction_date_range()[0], until)
+    bucket = ANALYTICS_BUCKETS[bucket_label] or smallest_bucket
+    if BUCKET_SECONDS[bucket] < BUCKET_SECONDS[smallest_bucket]:
+        st.caption(f"Grouping by {smallest_bucket} to keep the timeline readable over this range.")
+        bucket = smallest_bucket
+    
+    # Only aggregated rows come back from the database
+    analytics = get_prediction_analytics(since=since, bucket=bucket, top_users=ANALYTICS_TOP_USERS)
+    
+    if analytics['total']:
+        render_prediction_analytics(analytics, bucket.capitalize())
+    else:
+        st.info("No predictions found in this time range.")
+    
+    render_prediction_records()
+
+def render_prediction_analytics(analytics, bucket_label):
+    """Render the summary cards and analytics tabs from aggregated prediction counts"""
+    total = analytics['total']
     
     # Add quick stats at the top
     stats_col1, stats_col2, stats_col3, stats_col4 = st.columns(4)
@@ -135,13 +303,13 @@ def render_prediction_history():
         st.markdown(f"""
         <div style="background-color: #f5f9fa; padding: 15px; border-radius: 10px; text-align: center; border: 1px solid #e0e0e0;">
             <h4 style="margin: 0; color: #0cb8b6;">Total Tests</h4>
-            <h2 style="margin: 10px 0; color: #325C6A;">{len(predictions)}</h2>
+            <h2 style="margin: 10px 0; color: #325C6A;">{total}</h2>
         </div>
         """, unsafe_allow_html=True)
     
     with stats_col2:
-        high_risk_count = sum(1 for p in predictions if p['risk_level'] == 'High')
-        high_risk_percent = (high_risk_count / len(predictions) * 100) if predictions else 0
+        high_risk_count = analytics['high']
+        high_risk_percent = high_risk_count / total * 100
         st.markdown(f"""
         <div style="background-color: #ffebee; padding: 15px; border-radius: 10px; text-align: center; border: 1px solid #e0e0e0;">
             <h4 style="margin: 0; color: #e74c3c;">High Risk</h4>
@@ -150,8 +318,8 @@ def render_prediction_history():
         """, unsafe_allow_html=True)
     
     with stats_col3:
-        low_risk_count = sum(1 for p in predictions if p['risk_level'] == 'Low')
-        low_risk_percent = (low_risk_count / len(predictions) * 100) if predictions else 0
+        low_risk_count = analytics['low']
+        low_risk_percent = low_risk_count / total * 100
         st.markdown(f"""
         <div style="background-color: #e8f5e9; padding: 15px; border-radius: 10px; text-align: center; border: 1px solid #e0e0e0;">
             <h4 style="margin: 0; color: #2ecc71;">Low Risk</h4>
@@ -160,7 +328,7 @@ def render_prediction_history():
         """, unsafe_allow_html=True)
     
     with stats_col4:
-        unique_users = len(set(p['user_id'] for p in predictions))
+        unique_users = analytics['unique_users']
         st.markdown(f"""
         <div style="background-color: #e3f2fd; padding: 15px; border-radius: 10px; text-align: center; border: 1px solid #e0e0e0;">
             <h4 style="margin: 0; color: #2196f3;">Unique Users</h4>
@@ -176,24 +344,24 @@ def render_prediction_history():
         # Timeline analysis
         st.markdown("#### Prediction Trends Over Time")
         
-        # Group predictions by date and risk level
-        df_predictions['date_only'] = df_predictions['date'].dt.date
-        daily_counts = df_predictions.groupby(['date_only', 'risk_level']).size().reset_index(name='count')
+        # Predictions per period and risk level, already grouped by the database
+        period_counts = pd.DataFrame(analytics['timeline'])
+        track_frame("admin.timeline", period_counts)
         
         # Create a line chart showing prediction trends over time by risk level
         fig = px.line(
-            daily_counts,
-            x='date_only',
+            period_counts,
+            x='period',
             y='count',
             color='risk_level',
             title='Predictions Over Time by Risk Level',
-            labels={'count': 'Number of Predictions', 'date_only': 'Date', 'risk_level': 'Risk Level'},
+            labels={'count': 'Number of Predictions', 'period': bucket_label, 'risk_level': 'Risk Level'},
             color_discrete_map={'High': '#e74c3c', 'Low': '#2ecc71'}
         )
         
         # Improve the chart appearance
         fig.update_layout(
-            xaxis_title="Date",
+            xaxis_title=bucket_label,
             yaxis_title="Number of Predictions",
             legend_title="Risk Level",
             height=400
@@ -205,8 +373,14 @@ def render_prediction_history():
         # User distribution analysis
         st.markdown("#### Predictions by User")
         
-        # Group predictions by user and risk level
-        user_counts = df_predictions.groupby(['username', 'risk_level']).size().reset_index(name='count')
+        # High and Low counts for the most active users, reshaped for a stacked bar chart
+        user_counts = pd.DataFrame(analytics['by_user']).melt(
+            id_vars=['username'],
+            value_vars=['high', 'low'],
+            var_name='risk_level',
+            value_name='count'
+        )
+        user_counts['risk_level'] = user_counts['risk_level'].str.capitalize()
         
         # Create a bar chart showing predictions by user and risk level
         fig = px.bar(
@@ -214,7 +388,7 @@ def render_prediction_history():
             x='username',
             y='count',
             color='risk_level',
-            title='Predictions by User and Risk Level',
+            title=f'Predictions by User and Risk Level (top {ANALYTICS_TOP_USERS} users)',
             labels={'count': 'Number of Predictions', 'username': 'Username', 'risk_level': 'Risk Level'},
             color_discrete_map={'High': '#e74c3c', 'Low': '#2ecc71'}
         )
@@ -236,33 +410,132 @@ def render_prediction_history():
         # This would require examining the user_data in each prediction
         # to identify common factors among high risk predictions
         st.info("This analysis will be implemented in a future update.")
-    
+
+def remove_export_file(path):
+    """Delete a prepared export file, if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class ExportFile:
+    """A prepared export on disk, deleted when it is replaced, evicted or its session ends"""
+
+    def __init__(self, path, export_format, rows, size):
+        self.path = path
+        self.export_format = export_format
+        self.rows = rows
+        self.size = size
+        # Runs on remove(), when the session's state is dropped, or at shutdown
+        self._finalizer = weakref.finalize(self, remove_export_file, path)
+
+    @property
+    def available(self):
+        return self._finalizer.alive and os.path.exists(self.path)
+
+    def remove(self):
+        """Delete the file now"""
+        self._finalizer()
+
+    def read(self):
+        """The file's contents, for the download button"""
+        with open(self.path, 'rb') as export_file:
+            return export_file.read()
+
+# A session evicted for memory also gives up its export file
+evict_hooks['export_file'] = ExportFile.remove
+
+def render_prediction_export(search_text, risk_level):
+    """Export every prediction matching the current filters to a file the admin can download"""
+    with st.expander("Export matching predictions"):
+        export_format = st.radio("Format", options=list(EXPORT_FORMATS), horizontal=True, format_func=str.upper)
+        
+        if st.button("Prepare export"):
+            # Rows are streamed from the database into a temporary file, never held in memory
+            previous = st.session_state.pop('export_file', None)
+            if previous is not None:
+                previous.remove()
+            
+            fd, path = tempfile.mkstemp(prefix="cardiopredict_export_", suffix=EXPORT_FORMATS[export_format])
+            try:
+                with st.spinner("Exporting predictions..."):
+                    with os.fdopen(fd, 'wb') as out:
+                        rows, size = export_predictions(out, export_format, search=search_text, risk_level=risk_level)
+            except Exception as e:
+                remove_export_file(path)
+                st.error(f"Export failed: {e}")
+                return
+            
+            st.session_state.export_file = ExportFile(path, export_format, rows, size)
+        
+        export = st.session_state.get('export_file')
+        if export is not None and export.available:
+            st.caption(f"{export.rows:,} predictions, {export.size / 1024:,.1f} KiB")
+            # The file stays until the next export replaces it, so a failed download can be retried;
+            # clicking does not rerun the page, which would read the file again
+            st.download_button(
+                f"Download {export.export_format.upper()}",
+                data=export.read(),
+                file_name=f"predictions{EXPORT_FORMATS[export.export_format]}",
+                mime="text/csv" if export.export_format == 'csv' else "application/octet-stream",
+                on_click="ignore"
+            )
+
+def reset_prediction_page():
+    """Go back to the first page when the prediction filters change"""
+    st.session_state.prediction_page = 1
+
+def render_prediction_records():
+    """Render the searchable, paged prediction table and the detail view"""
     # Add searchable prediction table
     st.markdown("### Prediction Records")
     
-    # Add filter functionality
-    filter_col1, filter_col2 = st.columns(2)
+    # Filters are applied by the database, which returns one page at a time
+    filter_col1, filter_col2, filter_col3 = st.columns([2, 3, 1])
     with filter_col1:
-        risk_filter = st.selectbox("Filter by Risk Level", options=["All", "High", "Low"])
+        risk_filter = st.selectbox("Filter by Risk Level", options=["All", "High", "Low"],
+                                   on_change=reset_prediction_page)
     with filter_col2:
-        user_list = ["All"] + sorted(df_predictions['username'].unique().tolist())
-        user_filter = st.selectbox("Filter by User", options=user_list)
+        search_text = st.text_input("Search by username or prediction ID", key="prediction_search",
+                                    on_change=reset_prediction_page)
+    with filter_col3:
+        page_number = st.number_input("Page", min_value=1, value=1, step=1, key="prediction_page")
+    
+    risk_level = None if risk_filter == "All" else risk_filter
+    page, total_matches = search_predictions(
+        search=search_text,
+        risk_level=risk_level,
+        limit=RECORDS_PAGE_SIZE,
+        offset=(page_number - 1) * RECORDS_PAGE_SIZE
+    )
     
-    # Format the date column
-    df_predictions['formatted_date'] = df_predictions['date'].dt.strftime('%Y-%m-%d %H:%M')
+    page_count = max(1, -(-total_matches // RECORDS_PAGE_SIZE))
+    if page_number > page_count:
+        # Past the last page, e.g. typed in by hand: show the last page instead
+        page_number = page_count
+        page, total_matches = search_predictions(
+            search=search_text,
+            risk_level=risk_level,
+            limit=RECORDS_PAGE_SIZE,
+            offset=(page_number - 1) * RECORDS_PAGE_SIZE
+        )
+    st.caption(f"{total_matches} matching predictions - page {page_number} of {page_count}")
     
-    # Format the probability column
-    df_predictions['formatted_probability'] = df_predictions['probability'].apply(lambda x: f"{x:.2%}")
+    if total_matches:
+        render_prediction_export(search_text, risk_level)
     
-    # Apply filters
-    filtered_df = df_predictions.copy()
-    if risk_filter != "All":
-        filtered_df = filtered_df[filtered_df['risk_level'] == risk_filter]
-    if user_filter != "All":
-        filtered_df = filtered_df[filtered_df['username'] == user_filter]
+    if not page:
+        st.info("No predictions match these filters.")
+        return
+    
+    # Format the page for display
+    page_df = pd.DataFrame(page)
+    track_frame("admin.prediction_page", page_df)
+    page_df['formatted_date'] = pd.to_datetime(page_df['prediction_date']).dt.strftime('%Y-%m-%d %H:%M')
+    page_df['formatted_probability'] = page_df['probability'].map(lambda x: f"{x:.2%}")
     
     # Rename columns for display
-    display_df = filtered_df.rename(columns={
+    display_df = page_df.rename(columns={
         'id': 'ID',
         'user_id': 'User ID',
         'username': 'Username',
@@ -281,12 +554,17 @@ def render_prediction_history():
     # Detailed prediction view
     st.markdown("### Detailed Prediction View")
     
-    # Only show selector if there are predictions
-    if not filtered_df.empty:
+    # Option labels by prediction ID, so the selector does one lookup per option
+    option_labels = {
+        row['id']: f"ID: {row['id']} - User: {row['username']} - Date: {row['formatted_date']}"
+        for row in page_df[['id', 'username', 'formatted_date']].to_dict('records')
+    }
+    
+    if option_labels:
         selected_prediction = st.selectbox(
             "Select a prediction to view details:",
-            options=filtered_df['id'].tolist(),
-            format_func=lambda x: f"ID: {x} - User: {filtered_df[filtered_df['id'] == x]['username'].values[0]} - Date: {filtered_df[filtered_df['id'] == x]['formatted_date'].values[0]}"
+            options=list(option_labels),
+            format_func=option_labels.get
         )
         
         if st.button("View Complete Details", use_container_width=True):
@@ -0,0 +1,130 @@
+"""
+Admission control for CardioPredict's expensive stages.
+
+Every Streamlit session runs in the same process, so a traffic spike can
+have all of them scoring the model, hashing passwords and writing to the
+database at once, and then everyone waits. Each stage here admits a fixed
+number of callers at a time. A bounded number more can wait for a slot.
+Anyone beyond that, or anyone who waits longer than STAGE_QUEUE_TIMEOUT, gets
+StageBusy straight away. StageBusy carries a message that can be shown to
+the user.
+
+Each stage's limits come from CARDIOPREDICT_<STAGE>_CONCURRENCY and
+CARDIOPREDICT_<STAGE>_QUEUE, for example CARDIOPREDICT_INFERENCE_QUEUE=64.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from metrics import LatencyHistogram
+
+# Seconds a caller may wait for a free slot before it is turned away
+STAGE_QUEUE_TIMEOUT = float(os.environ.get("CARDIOPREDICT_STAGE_QUEUE_TIMEOUT", "5"))
+
+# Every stage limiter created in this process, by name, for reporting
+limiters = {}
+
+class StageBusy(Exception):
+    """Raised when a stage is full; the message is meant for the user"""
+
+class StageLimiter:
+    """Caps how many callers run a stage at once, with a bounded wait queue"""
+
+    def __init__(self, name, concurrency, queue_size, timeout=STAGE_QUEUE_TIMEOUT,
+                 busy_message="The service is busy. Please try again in a moment."):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.busy_message = busy_message
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0  # Turned away because the queue was full
+        self.timed_out = 0  # Turned away after waiting `timeout` seconds
+        self.wait_time = LatencyHistogram(bounds=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+        self._cond = threading.Condition()
+        limiters[name] = self
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room, or raise StageBusy"""
+        start = time.perf_counter()
+        with self._cond:
+            if self.running >= self.concurrency:
+                if self.waiting >= self.queue_size:
+                    self.rejected += 1
+                    raise StageBusy(self.busy_message)
+
+                self.waiting += 1
+                deadline = start + self.timeout
+                try:
+                    while self.running >= self.concurrency:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            raise StageBusy(self.busy_message)
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.running += 1
+            self.admitted += 1
+        self.wait_time.observe(time.perf_counter() - start)
+
+    def release(self):
+        """Give a slot back to the next caller in the queue"""
+        with self._cond:
+            self.running -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Run the body of a with block inside a slot"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """Current occupancy, limits and admission counts"""
+        with self._cond:
+            return {
+                'running': self.running,
+                'waiting': self.waiting,
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'wait_time': self.wait_time.snapshot()
+            }
+
+def stage_limiter(name, concurrency, queue_size, busy_message):
+    """Create a stage limiter whose limits can be overridden from the environment"""
+    prefix = f"CARDIOPREDICT_{name.upper()}"
+    return StageLimiter(
+        name,
+        concurrency=int(os.environ.get(f"{prefix}_CONCURRENCY", str(concurrency))),
+        queue_size=int(os.environ.get(f"{prefix}_QUEUE", str(queue_size))),
+        busy_message=busy_message
+    )
+
+# Model scoring; concurrent callers share micro-batches, so this mostly bounds the queue
+inference_limit = stage_limiter(
+    "inference", concurrency=64, queue_size=128,
+    busy_message="We are analysing a lot of results right now. Please submit your prediction again in a moment."
+)
+
+# Saving predictions; SQLite takes one writer at a time anyway
+persist_limit = stage_limiter(
+    "persist", concurrency=4, queue_size=64,
+    busy_message="Your result could not be saved because the server is busy. Please try again in a moment."
+)
+
+# Sign-in and sign-up; each runs a bcrypt hash in the password pool
+auth_limit = stage_limiter(
+    "auth", concurrency=4, queue_size=32,
+    busy_message="Many people are signing in right now. Please try again in a moment."
+)
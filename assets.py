@@ -0,0 +1,56 @@
+"""
+Static asset links for CardioPredict.
+
+Stylesheets live in ./static and are served by Streamlit's static file serving
+(server.enableStaticServing) under app/static/. Each file is read and hashed
+once per process; pages emit a short <link> tag whose URL carries the content
+hash, so browsers cache the file and fetch it again only after it changes.
+
+Without static serving the stylesheet text is inlined instead, still read from
+disk only once.
+"""
+
+import os
+import hashlib
+import threading
+import streamlit as st
+
+# Directory Streamlit serves static files from, and the URL it serves them at
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+_assets = {}  # relative path -> (content hash, text)
+_assets_lock = threading.Lock()
+
+def load_asset(path):
+    """Read a static file once per process, returning (content hash, text)"""
+    with _assets_lock:
+        asset = _assets.get(path)
+        if asset is None:
+            with open(os.path.join(STATIC_DIR, path), "r", encoding="utf-8") as f:
+                text = f.read()
+            asset = (hashlib.sha256(text.encode("utf-8")).hexdigest()[:12], text)
+            _assets[path] = asset
+        return asset
+
+def asset_url(path):
+    """Content-addressed URL of a static file"""
+    digest, _ = load_asset(path)
+    return f"{STATIC_URL}/{path}?v={digest}"
+
+def static_serving_enabled():
+    """True if Streamlit is serving the static directory"""
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except RuntimeError:
+        return False
+
+def stylesheet_html(*paths):
+    """HTML that applies the given stylesheets, relative to STATIC_DIR"""
+    if static_serving_enabled():
+        return "".join(f'<link rel="stylesheet" href="{asset_url(path)}">' for path in paths)
+    return "".join(f"<style>{load_asset(path)[1]}</style>" for path in paths)
+
+def use_stylesheets(*paths):
+    """Apply stylesheets to the current page"""
+    st.markdown(stylesheet_html(*paths), unsafe_allow_html=True)
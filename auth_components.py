@@ -1,8 +1,10 @@
 import streamlit as st
 from streamlit_extras.colored_header import colored_header
-from sqlite_database import create_user, db_connected
+from storage import create_user, db_connected
+from admission import StageBusy
 from session_state import login_user, toggle_signup_login
 from layout import render_custom_button
+from assets import use_stylesheets
 
 def render_login_form():
     """Render the login form with modern styling"""
@@ -32,30 +34,7 @@ def render_login_form():
     
     
     # Custom CSS for form elements
-    st.markdown("""
-    <style>
-    div[data-testid="stForm"] {
-        background-color: white;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
-    }
-    
-    .stTextInput > div > div > input {
-        border-radius: 5px;
-    }
-    
-    div.stButton > button:first-child {
-        background: linear-gradient(90deg, #0cb8b6 0%, #325C6A 100%);
-        color: white;
-        font-weight: bold;
-        border: none;
-        padding: 0.5rem 1rem;
-        width: 100%;
-        border-radius: 5px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    use_stylesheets("css/auth.css")
     
     with st.form("login_form"):
         st.markdown('<p style="font-weight: 600; color: #325C6A;">Username</p>', unsafe_allow_html=True)
@@ -69,7 +48,12 @@ def render_login_form():
         
         if submit_button:
             if username and password:
-                login_success = login_user(username, password)
+                try:
+                    login_success = login_user(username, password)
+                except StageBusy as e:
+                    # Busy, not wrong: the same password can be tried again shortly
+                    st.warning(str(e))
+                    login_success = False
                 if login_success:
                     st.success("Login successful!")
                     st.rerun()
@@ -139,30 +123,7 @@ def render_signup_form():
         return
     
     # Custom CSS for form elements
-    st.markdown("""
-    <style>
-    div[data-testid="stForm"] {
-        background-color: white;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
-    }
-    
-    .stTextInput > div > div > input {
-        border-radius: 5px;
-    }
-    
-    div.stButton > button:first-child {
-        background: linear-gradient(90deg, #0cb8b6 0%, #325C6A 100%);
-        color: white;
-        font-weight: bold;
-        border: none;
-        padding: 0.5rem 1rem;
-        width: 100%;
-        border-radius: 5px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    use_stylesheets("css/auth.css")
     
     with st.form("signup_form"):
         st.markdown('<p style="font-weight: 600; color: #325C6A;">Username</p>', unsafe_allow_html=True)
@@ -187,7 +148,11 @@ def render_signup_form():
             elif password != confirm_password:
                 st.warning("Passwords do not match")
             else:
-                success, message = create_user(username, email, password)
+                try:
+                    success, message = create_user(username, email, password)
+                except StageBusy as e:
+                    st.warning(str(e))
+                    success, message = False, None
                 
                 if success:
                     st.success(message)
@@ -196,7 +161,7 @@ def render_signup_form():
                     st.session_state.show_login = True
                     st.session_state.show_signup = False
                     st.rerun()
-                else:
+                elif message:
                     st.error(message)
     
     # Display signup error message if any
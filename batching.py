@@ -0,0 +1,239 @@
+"""
+Micro-batching for CardioPredict model inference.
+
+Scoring one patient costs almost as much as scoring fifty: most of a
+predict_proba call is per-call overhead across the forest's 100 trees. When
+many sessions or API clients predict at once, their rows are queued here for
+up to BATCH_MAX_WAIT_MS (or until BATCH_MAX_SIZE rows are waiting), scored in
+one vectorized call, and the results handed back to each caller.
+
+Run this file directly to compare throughput with and without batching:
+    python batching.py [--threads 32] [--requests 2000]
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from model import load_model, predict_heart_disease
+from metrics import LatencyHistogram
+from admission import inference_limit
+from tracing import current_span, capture
+
+# Most rows scored in one model call
+BATCH_MAX_SIZE = int(os.environ.get("CARDIOPREDICT_BATCH_MAX_SIZE", "64"))
+
+# Longest a request waits for others to join its batch, in milliseconds
+BATCH_MAX_WAIT_MS = float(os.environ.get("CARDIOPREDICT_BATCH_MAX_WAIT_MS", "5"))
+
+# Every batcher created in this process, by name, for reporting
+batchers = {}
+
+class MicroBatcher:
+    """
+    Collects rows from concurrent callers and scores them together.
+
+    `score` takes a list of rows and returns one result per row, in order.
+    `dispatchers` threads take batches off the queue, so that many batches
+    can be scored at once when `score` hands work to a process pool.
+    """
+
+    def __init__(self, name, score, max_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, dispatchers=1):
+        self.name = name
+        self.score_batch = score
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.dispatchers = dispatchers
+        self.batches = 0
+        self.rows = 0
+        # Rows per model call, and time from submit until the batch is scored
+        self.batch_sizes = LatencyHistogram(bounds=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self.latency = LatencyHistogram(bounds=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+        self._queue = queue.Queue()  # (rows, future, submitted_at, span of a sampled trace or None)
+        self._threads = []
+        self._lock = threading.Lock()
+        batchers[name] = self
+
+    def submit(self, rows):
+        """Queue rows for scoring, returning a Future of their results"""
+        self._start()
+        future = Future()
+        self._queue.put((list(rows), future, time.perf_counter(), current_span()))
+        return future
+
+    def score(self, rows, timeout=None):
+        """Score rows with the next batch, waiting for the results"""
+        return self.submit(rows).result(timeout)
+
+    def stats(self):
+        """Batches scored so far and their size distribution"""
+        with self._lock:
+            batches, rows = self.batches, self.rows
+        return {
+            'batches': batches,
+            'rows': rows,
+            'mean_batch_size': rows / batches if batches else 0.0,
+            'queued': self._queue.qsize(),
+            'batch_sizes': self.batch_sizes.snapshot(),
+            'latency': self.latency.snapshot()
+        }
+
+    def _start(self):
+        """Start the dispatcher threads on first use"""
+        if self._threads:
+            return
+        with self._lock:
+            while len(self._threads) < self.dispatchers:
+                thread = threading.Thread(target=self._dispatch, name=f"batcher-{self.name}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _collect(self, first=None):
+        """
+        Wait for a request, then gather others until the batch is full or max_wait has passed.
+
+        Returns:
+            Tuple of (batch, rows in it, request held over for the next batch or None)
+        """
+        batch = [first or self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + len(item[0]) > self.max_size:
+                # Too big for this batch; it starts the next one
+                return batch, size, item
+            batch.append(item)
+            size += len(item[0])
+
+        return batch, size, None
+
+    def _dispatch(self):
+        """Score batches until the process exits"""
+        held = None
+        while True:
+            batch, size, held = self._collect(held)
+            rows = [row for item in batch for row in item[0]]
+
+            # Spans opened while scoring are recorded only if a caller in the batch is being traced
+            traced = [item[3] for item in batch if item[3] is not None]
+            try:
+                if traced:
+                    with capture() as spans:
+                        results = self.score_batch(rows)
+                    for parent in traced:
+                        parent.adopt(spans, batch_rows=size)
+                else:
+                    results = self.score_batch(rows)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            with self._lock:
+                self.batches += 1
+                self.rows += size
+            self.batch_sizes.observe(size)
+
+            start = 0
+            for item_rows, future, submitted_at, _ in batch:
+                future.set_result(results[start:start + len(item_rows)])
+                start += len(item_rows)
+                self.latency.observe(finished - submitted_at)
+
+# Model used for batched predictions, loaded once per process
+_model_data = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Load the model on first use and keep it for the life of the process"""
+    global _model_data
+    with _model_lock:
+        if _model_data is None:
+            _model_data = load_model()
+        return _model_data
+
+def score_rows(rows):
+    """Score a list of input dicts in one model call, returning (prediction, probabilities) per row"""
+    predictions, probabilities = predict_heart_disease(get_model(), pd.DataFrame(rows))
+    return list(zip(predictions, probabilities))
+
+# Shared by every Streamlit session in this process
+prediction_batcher = MicroBatcher("predictions", score_rows)
+
+def predict_heart_disease_batched(user_data):
+    """
+    Batched equivalent of predict_heart_disease(load_model(), user_data).
+
+    Args:
+        user_data: DataFrame of input rows
+
+    Returns:
+        Tuple of (predictions array, probabilities array), as predict_heart_disease returns
+
+    Raises StageBusy when too many predictions are already waiting.
+    """
+    with inference_limit.slot():
+        results = prediction_batcher.score(user_data.to_dict('records'))
+    return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+if __name__ == "__main__":
+    # Throughput with and without batching for many concurrent single-row predictions
+    import random
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Compare prediction throughput with and without micro-batching")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent callers")
+    parser.add_argument("--requests", type=int, default=2000, help="Single-row predictions per run")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rows = [
+        {'age': rng.randint(30, 80), 'sex': rng.randint(0, 1), 'cp': rng.randint(0, 3),
+         'trestbps': rng.randint(90, 180), 'chol': rng.randint(150, 350), 'fbs': rng.randint(0, 1),
+         'restecg': rng.randint(0, 2), 'thalach': rng.randint(90, 200), 'exang': rng.randint(0, 1),
+         'oldpeak': round(rng.uniform(0, 4), 1), 'slope': rng.randint(0, 2)}
+        for _ in range(args.requests)
+    ]
+    get_model()
+
+    def run(batcher):
+        latencies = []
+
+        def one(row):
+            start = time.perf_counter()
+            batcher.score([row])
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(one, rows))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return len(rows) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+    unbatched = MicroBatcher("unbatched", score_rows, max_size=1, dispatchers=1)
+    batched = MicroBatcher("batched", score_rows)
+
+    for label, batcher in (("unbatched", unbatched), ("batched", batched)):
+        throughput, p50, p99 = run(batcher)
+        stats = batcher.stats()
+        print(f"{label:<10} {throughput:8.1f} predictions/s   p50 {p50 * 1000:6.1f} ms   "
+              f"p99 {p99 * 1000:6.1f} ms   mean batch {stats['mean_batch_size']:.1f}")
+        if batcher is batched:
+            previous = 0
+            print("Batch size distribution:")
+            for bound, count in stats['batch_sizes']['buckets'].items():
+                if count > previous:
+                    print(f"  <= {bound:>5}: {count - previous}")
+                previous = count
@@ -1,13 +1,25 @@
 import pandas as pd
 import numpy as np
-import requests
 import io
 import os
-from sklearn.preprocessing import StandardScaler
+import json
+import hashlib
+import threading
 
 # Path to local dataset
 DATASET_PATH = "data/heart.csv"
 
+# Precomputed summary statistics, rebuilt whenever the dataset changes
+STATS_PATH = "data/heart_stats.json"
+
+# Age bins used for the home page statistics
+AGE_BINS = [0, 40, 50, 60, 100]
+AGE_LABELS = ['<40', '40-50', '50-60', '>60']
+
+# Process-wide copy of the statistics and the dataset file state they match
+_stats_cache = {'file_state': None, 'stats': None}
+_stats_lock = threading.Lock()
+
 def load_data():
     """
     Load heart disease dataset from local file.
@@ -30,6 +42,9 @@ def load_data():
             # Try to load from UCI repository as a fallback
             print("Attempting to fetch data from UCI repository...")
             
+            # Only needed for this fallback, so not imported at startup
+            import requests
+            
             response = requests.get("https://archive.ics.uci.edu/ml/machine-learning-databases/heart-disease/processed.cleveland.data")
             response.raise_for_status()
             
@@ -155,6 +170,87 @@ def preprocess_data(data):
     
     return X, y
 
+def compute_dataset_stats(df):
+    """
+    Summarize the dataset for display.
+    
+    Args:
+        df: Preprocessed DataFrame from load_data()
+    
+    Returns:
+        JSON-serializable dictionary with totals and per-group target counts
+    """
+    age_group = pd.cut(df['age'], bins=AGE_BINS, labels=AGE_LABELS)
+    age_counts = pd.crosstab(age_group, df['target']).reindex(index=AGE_LABELS, columns=[0, 1], fill_value=0)
+    
+    sex_counts = pd.crosstab(df['sex'], df['target']).reindex(columns=[0, 1], fill_value=0)
+    
+    return {
+        'total_patients': int(len(df)),
+        'heart_disease_count': int(df['target'].sum()),
+        'age_groups': AGE_LABELS,
+        'age_group_target': {str(t): [int(c) for c in age_counts[t]] for t in (0, 1)},
+        'sexes': [{0: 'Female', 1: 'Male'}.get(sex, str(sex)) for sex in sex_counts.index],
+        'sex_target': {str(t): [int(c) for c in sex_counts[t]] for t in (0, 1)}
+    }
+
+def _file_sha256(path):
+    """Content hash of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_dataset_stats():
+    """
+    Return the dataset statistics without touching pandas when possible.
+    
+    Statistics are kept in memory for the process and in STATS_PATH on disk.
+    A stat() of the dataset detects changes; the on-disk artifact is matched by
+    content hash, and only a changed dataset is loaded and summarized again.
+    """
+    try:
+        st_result = os.stat(DATASET_PATH)
+        file_state = (st_result.st_mtime_ns, st_result.st_size)
+    except OSError:
+        file_state = None
+    
+    with _stats_lock:
+        if _stats_cache['stats'] is not None and _stats_cache['file_state'] == file_state:
+            return _stats_cache['stats']
+        
+        stats = None
+        sha256 = _file_sha256(DATASET_PATH) if file_state else None
+        
+        # Reuse the artifact if it was built from this exact dataset
+        if sha256 and os.path.exists(STATS_PATH):
+            try:
+                with open(STATS_PATH, "r") as f:
+                    artifact = json.load(f)
+                if artifact.get('dataset_sha256') == sha256:
+                    stats = artifact['stats']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable statistics file: {e}")
+        
+        if stats is None:
+            print("Computing dataset statistics...")
+            stats = compute_dataset_stats(load_data())
+            
+            # Only a local dataset gets a stored artifact
+            if sha256:
+                try:
+                    tmp_path = STATS_PATH + ".tmp"
+                    with open(tmp_path, "w") as f:
+                        json.dump({'dataset_sha256': sha256, 'stats': stats}, f, indent=2)
+                    os.replace(tmp_path, STATS_PATH)
+                except OSError as e:
+                    print(f"Could not save dataset statistics: {e}")
+        
+        _stats_cache['file_state'] = file_state
+        _stats_cache['stats'] = stats
+        return stats
+
 def get_real_time_data():
     """
     This function would connect to external APIs or databases to get real-time heart disease data.
@@ -182,3 +278,7 @@ if __name__ == "__main__":
     X, y = preprocess_data(df)
     print(f"Features shape: {X.shape}")
     print(f"Target shape: {y.shape}")
+    
+    # Build (or verify) the statistics artifact
+    stats = load_dataset_stats()
+    print(f"Dataset statistics: {stats['total_patients']} patients, {stats['heart_disease_count']} with heart disease")
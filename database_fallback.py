@@ -1,20 +1,27 @@
 import os
 import sqlalchemy as db
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session, relationship
 from datetime import datetime
-import bcrypt
+from passwords import hash_password, verify_password, needs_rehash
+from storage_common import SUMMARY_FEATURES, build_trends
 import json
 import streamlit as st
 
 # Create base class for models
 Base = declarative_base()
 
+# Connection pool settings
+POOL_SIZE = int(os.environ.get("CARDIOPREDICT_DB_POOL_SIZE", "5"))  # Connections kept open
+POOL_MAX_OVERFLOW = int(os.environ.get("CARDIOPREDICT_DB_MAX_OVERFLOW", "10"))  # Extra connections allowed under load
+POOL_PRE_PING = os.environ.get("CARDIOPREDICT_DB_POOL_PRE_PING", "1") == "1"  # Test connections before use
+POOL_RECYCLE = int(os.environ.get("CARDIOPREDICT_DB_POOL_RECYCLE", "300"))  # Max connection lifetime in seconds
+
 # Database connection flag
 db_connected = False
 engine = None
 SessionLocal = None
+ScopedSession = None
 
 # Define User model
 class User(Base):
@@ -24,24 +31,39 @@ class User(Base):
     username = Column(String(50), unique=True, nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     password_hash = Column(String(128), nullable=False)
+    is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     predictions = relationship("PredictionHistory", back_populates="user", cascade="all, delete-orphan")
     
     def set_password(self, password):
         """Hash password before storing"""
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Verify password against stored hash"""
-        password_bytes = password.encode('utf-8')
-        hash_bytes = self.password_hash.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hash_bytes)
+        """Verify password against stored hash, upgrading it if the cost factor changed"""
+        if not verify_password(password, self.password_hash):
+            return False
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
+    
+    def to_dict(self):
+        """Plain dictionary view of the user, safe to use after the session closes"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'is_admin': bool(self.is_admin)
+        }
 
 # Define Prediction History model
 class PredictionHistory(Base):
     __tablename__ = 'prediction_history'
+    # Same indexes as the other backends: newest-first listings and per-user history
+    __table_args__ = (
+        Index('idx_prediction_history_date', 'prediction_date'),
+        Index('idx_prediction_history_user', 'user_id', 'prediction_date'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -51,7 +73,8 @@ class PredictionHistory(Base):
     user_data = Column(Text, nullable=False)  # Store user input as JSON
     prescription = Column(Text, nullable=True)  # Store doctor's prescription or recommendations
     
-    user = relationship("User", back_populates="predictions")
+    # Never lazy-load the user; queries that need it join explicitly
+    user = relationship("User", back_populates="predictions", lazy="raise")
     
     def set_user_data(self, user_data_dict):
         """Convert user data dictionary to JSON string for storage"""
@@ -73,39 +96,157 @@ class PredictionHistory(Base):
             return json.loads(self.prescription)
         return None
 
-# Try to create database connection
+def prediction_row_to_dict(row):
+    """Convert a projected prediction row into the shared prediction dictionary"""
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'date': row.prediction_date,
+        'risk_level': row.risk_level,
+        'probability': row.probability,
+        'user_data': json.loads(row.user_data) if isinstance(row.user_data, str) else {},
+        'prescription': json.loads(row.prescription) if row.prescription and isinstance(row.prescription, str) else None
+    }
+
+# Columns loaded for a full prediction; avoids building ORM objects on read paths
+PREDICTION_COLUMNS = (
+    PredictionHistory.id,
+    PredictionHistory.user_id,
+    PredictionHistory.prediction_date,
+    PredictionHistory.risk_level,
+    PredictionHistory.probability,
+    PredictionHistory.user_data,
+    PredictionHistory.prescription
+)
+
+# Migrations applied to the database, one row per schema version
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+def create_tables(connection):
+    """Create the users and prediction_history tables if they don't exist"""
+    Base.metadata.create_all(connection, tables=[User.__table__, PredictionHistory.__table__])
+
+def add_admin_column(connection):
+    """Add users.is_admin to a users table created before it existed"""
+    columns = {column['name'] for column in db.inspect(connection).get_columns('users')}
+    if 'is_admin' not in columns:
+        connection.execute(db.text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE"))
+
+def create_prediction_indexes(connection):
+    """Create the prediction_history indexes on a table created before them"""
+    for index in PredictionHistory.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+# Schema changes in order, each run in its own transaction; a database at
+# version N has had the first N applied. Each one must be safe to re-run on a
+# database that already has its changes.
+MIGRATIONS = [
+    create_tables,  # 1: users and prediction_history; create_all never alters an existing table
+    add_admin_column,  # 2: users.is_admin
+    create_prediction_indexes,  # 3: prediction_history indexes
+]
+
+def engine_options(url):
+    """Pool settings for create_engine"""
+    options = {'pool_pre_ping': POOL_PRE_PING, 'pool_recycle': POOL_RECYCLE}
+    
+    # Local SQLite URLs use SQLAlchemy's own pool choice and take no sizing
+    if not url.startswith("sqlite"):
+        options['pool_size'] = POOL_SIZE
+        options['max_overflow'] = POOL_MAX_OVERFLOW
+    
+    return options
+
+# Try to create database connection; get_schema_version() checks it is reachable
 try:
     DATABASE_URL = os.environ.get("DATABASE_URL")
     if DATABASE_URL:
-        engine = db.create_engine(DATABASE_URL)
-        # Verify connection
-        connection = engine.connect()
-        connection.close()
-        db_connected = True
+        engine = db.create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
         
-        # Create tables if not exist
-        Base.metadata.create_all(engine)
+        # Create session factory; objects stay readable after commit without a refresh query
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
         
-        # Create session factory
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        # One session per script run thread, shared by every helper during that run
+        ScopedSession = scoped_session(SessionLocal)
 except Exception as e:
     # For local development, you might want to see the specific error
     print(f"Database connection error: {str(e)}")
 
+def get_schema_version():
+    """
+    Schema version recorded in the database, read with a single query.
+
+    Returns:
+        Number of migrations applied (0 for a database never migrated), or None if unreachable
+    """
+    global db_connected
+    if engine is None:
+        return None
+    
+    try:
+        with engine.connect() as connection:
+            db_connected = True
+            try:
+                return connection.execute(db.select(db.func.max(SchemaVersion.version))).scalar() or 0
+            except db.exc.DBAPIError:
+                # No schema_version table yet
+                return 0
+    except db.exc.SQLAlchemyError as e:
+        print(f"Database connection error: {str(e)}")
+        db_connected = False
+        return None
+
+def migrate():
+    """
+    Apply pending migrations.
+
+    Idempotent: migrations already recorded in schema_version are skipped.
+    Unlike the local backends no default admin account is created.
+
+    Returns:
+        Tuple of (success, message)
+    """
+    version = get_schema_version()
+    if version is None:
+        return False, "Cannot connect to the database; check DATABASE_URL"
+    if version > len(MIGRATIONS):
+        return False, f"Database schema version {version} is newer than this code ({len(MIGRATIONS)})"
+    
+    try:
+        with engine.begin() as connection:
+            SchemaVersion.__table__.create(connection, checkfirst=True)
+        
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            with engine.begin() as connection:
+                migration(connection)
+                connection.execute(db.insert(SchemaVersion).values(version=number))
+    except db.exc.SQLAlchemyError as e:
+        return False, f"Error migrating database: {str(e)}"
+    
+    return True, f"Schema at version {len(MIGRATIONS)} ({len(MIGRATIONS) - version} migrations applied)"
+
 # Demo user data for offline mode
-demo_user = {"id": 1, "username": "demo_user", "email": "demo@example.com"}
+demo_user = {"id": 999, "username": "demo", "email": "demo@example.com", "is_admin": False}
 
 def get_db_session():
-    """Return a database session if connected, None otherwise"""
-    if not db_connected or SessionLocal is None:
+    """Return the current script run's session if connected, None otherwise"""
+    if not db_connected or ScopedSession is None:
         return None
     
     try:
-        session = SessionLocal()
-        return session
-    except Exception as e:
+        return ScopedSession()
+    except db.exc.SQLAlchemyError as e:
         return None
 
+def end_script_run():
+    """Close the current script run's session and return its connection to the pool"""
+    if ScopedSession is not None:
+        ScopedSession.remove()
+
 # User management functions
 def create_user(username, email, password):
     """Create a new user account"""
@@ -124,7 +265,6 @@ def create_user(username, email, password):
         ).first()
         
         if existing_user:
-            session.close()
             return False, "Username or email already exists"
         
         # Create new user
@@ -133,41 +273,44 @@ def create_user(username, email, password):
         
         session.add(user)
         session.commit()
-        session.close()
         
         return True, "User created successfully"
-    except Exception as e:
-        if session:
-            session.rollback()
-            session.close()
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
         return False, f"Error creating user: {str(e)}"
 
-def authenticate_user(username, password):
-    """Authenticate a user by username and password"""
+def get_authenticated_user(username, password):
+    """Authenticate a user and return their user record, or None if the login fails"""
     if not db_connected:
         # Demo login for offline mode
         if username == "demo" and password == "demo":
-            return True, 1
-        return False, None
+            return demo_user
+        return None
     
     session = get_db_session()
     if not session:
-        return False, None
+        return None
     
     try:
         user = session.query(User).filter(User.username == username).first()
         
         if user and user.check_password(password):
-            result = True, user.id
-        else:
-            result = False, None
+            # Persist a hash upgraded by check_password
+            if session.dirty:
+                session.commit()
+            return user.to_dict()
         
-        session.close()
-        return result
-    except Exception as e:
-        if session:
-            session.close()
-        return False, None
+        return None
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return None
+
+def authenticate_user(username, password):
+    """Authenticate a user by username and password"""
+    user = get_authenticated_user(username, password)
+    if user:
+        return True, user['id'], user['is_admin']
+    return False, None, False
 
 def save_prediction(user_id, risk_level, probability, user_data, prescription=None):
     """Save a prediction to the user's history with optional prescription data"""
@@ -201,15 +344,48 @@ def save_prediction(user_id, risk_level, probability, user_data, prescription=No
         # Get the prediction ID
         prediction_id = prediction.id
         
-        session.close()
-        
         return True, prediction_id
-    except Exception as e:
-        if session:
-            session.rollback()
-            session.close()
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
         return False, None
 
+def save_predictions_batch(records):
+    """Save several predictions in a single transaction
+    
+    Each record is a dict with the save_prediction arguments:
+    user_id, risk_level, probability, user_data and optionally prescription.
+    """
+    # Demo predictions are never stored
+    records = [r for r in records if r['user_id'] != 999]
+    if not db_connected or not records:
+        return True, 0
+    
+    session = get_db_session()
+    if not session:
+        return False, 0
+    
+    try:
+        rows = [
+            {
+                'user_id': r['user_id'],
+                'risk_level': r['risk_level'],
+                'probability': float(r['probability']),
+                'prediction_date': datetime.utcnow(),
+                'user_data': json.dumps(r['user_data']),
+                'prescription': json.dumps(r['prescription']) if r.get('prescription') else None
+            }
+            for r in records
+        ]
+        
+        # Core executemany insert avoids building one ORM object per row
+        session.execute(PredictionHistory.__table__.insert(), rows)
+        session.commit()
+        
+        return True, len(rows)
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return False, 0
+
 def get_user_predictions(user_id, limit=10):
     """Get a user's prediction history including prescription data"""
     if not db_connected:
@@ -221,34 +397,142 @@ def get_user_predictions(user_id, limit=10):
         return []
     
     try:
-        predictions = session.query(PredictionHistory).filter(
+        rows = session.query(*PREDICTION_COLUMNS).filter(
             PredictionHistory.user_id == user_id
         ).order_by(PredictionHistory.prediction_date.desc()).limit(limit).all()
         
-        result = []
-        for p in predictions:
-            prediction_data = {
-                'id': p.id,
-                'date': p.prediction_date,
-                'risk_level': p.risk_level,
-                'probability': p.probability,
-                'user_data': p.get_user_data(),
-                'prescription': p.get_prescription()
-            }
-            result.append(prediction_data)
-        
-        session.close()
-        return result
-    except Exception as e:
-        if session:
-            session.close()
+        return [prediction_row_to_dict(row) for row in rows]
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
         return []
 
+def json_number(column, key):
+    """SQL expression for a numeric field of a JSON text column"""
+    if engine.dialect.name == "sqlite":
+        return db.func.json_extract(column, f'$.{key}')
+    return db.cast(column, db.JSON)[key].as_float()
+
+def get_user_trends(user_id, window=5, limit=500):
+    """
+    Risk trend for one user, computed with window functions in the database.
+    
+    Every prediction gets the average risk probability over it and the
+    `window - 1` before it, and the change in cholesterol, blood pressure and
+    max heart rate since the previous prediction. Only the latest `limit`
+    points and the first prediction are returned, however long the history is.
+    
+    Returns:
+        Dictionary with the prediction 'total', 'first' and 'latest' snapshots
+        and the recent 'points' in chronological order
+    """
+    if not db_connected or user_id == demo_user["id"]:
+        return build_trends([], limit)
+    
+    session = get_db_session()
+    if not session:
+        return build_trends([], limit)
+    
+    try:
+        history = session.query(
+            PredictionHistory.id,
+            PredictionHistory.prediction_date.label('date'),
+            PredictionHistory.risk_level,
+            db.case(
+                (PredictionHistory.risk_level == 'High', PredictionHistory.probability),
+                else_=1 - PredictionHistory.probability
+            ).label('risk_probability'),
+            json_number(PredictionHistory.user_data, 'age').label('age'),
+            json_number(PredictionHistory.user_data, 'chol').label('chol'),
+            json_number(PredictionHistory.user_data, 'trestbps').label('trestbps'),
+            json_number(PredictionHistory.user_data, 'thalach').label('thalach')
+        ).filter(PredictionHistory.user_id == user_id).subquery()
+        
+        h = history.c
+        order = (h.date, h.id)
+        trends = session.query(
+            history,
+            db.func.avg(h.risk_probability).over(
+                order_by=order, rows=(-(max(int(window), 1) - 1), 0)
+            ).label('rolling_risk'),
+            (h.chol - db.func.lag(h.chol).over(order_by=order)).label('chol_delta'),
+            (h.trestbps - db.func.lag(h.trestbps).over(order_by=order)).label('trestbps_delta'),
+            (h.thalach - db.func.lag(h.thalach).over(order_by=order)).label('thalach_delta'),
+            db.func.row_number().over(order_by=order).label('position'),
+            db.func.row_number().over(order_by=(h.date.desc(), h.id.desc())).label('recency')
+        ).subquery()
+        
+        rows = session.query(trends).filter(
+            (trends.c.recency <= limit) | (trends.c.position == 1)
+        ).order_by(trends.c.position).all()
+        
+        return build_trends([row._mapping for row in rows], limit)
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return build_trends([], limit)
+
+def get_user_history(user_id, limit=20, offset=0):
+    """
+    One page of a user's prediction history for the profile list, newest first.
+    
+    Only the list columns are read: the prescription is left in the database and
+    user_data is cut down to SUMMARY_FEATURES. Open a single prediction with
+    get_prediction_by_id for everything else.
+    
+    Returns:
+        Dictionary with the user's 'total', 'high' and 'low' prediction counts and
+        a 'predictions' list of summary dicts
+    """
+    history = {'total': 0, 'high': 0, 'low': 0, 'predictions': []}
+    
+    if not db_connected or user_id == demo_user["id"]:
+        return history
+    
+    session = get_db_session()
+    if not session:
+        return history
+    
+    try:
+        counts = session.query(
+            db.func.count(PredictionHistory.id),
+            db.func.sum(db.case((PredictionHistory.risk_level == 'High', 1), else_=0)),
+            db.func.sum(db.case((PredictionHistory.risk_level == 'Low', 1), else_=0))
+        ).filter(PredictionHistory.user_id == user_id).one()
+        history['total'] = counts[0]
+        history['high'] = int(counts[1] or 0)
+        history['low'] = int(counts[2] or 0)
+        
+        rows = session.query(
+            PredictionHistory.id,
+            PredictionHistory.prediction_date,
+            PredictionHistory.risk_level,
+            PredictionHistory.probability,
+            PredictionHistory.user_data,
+            PredictionHistory.prescription.isnot(None).label('has_prescription')
+        ).filter(PredictionHistory.user_id == user_id).order_by(
+            PredictionHistory.prediction_date.desc(), PredictionHistory.id.desc()
+        ).limit(limit).offset(offset).all()
+        
+        for row in rows:
+            user_data = json.loads(row.user_data) if isinstance(row.user_data, str) else {}
+            history['predictions'].append({
+                'id': row.id,
+                'date': row.prediction_date,
+                'risk_level': row.risk_level,
+                'probability': row.probability,
+                'user_data': {key: user_data[key] for key in SUMMARY_FEATURES if key in user_data},
+                'has_prescription': bool(row.has_prescription)
+            })
+        
+        return history
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return history
+
 def get_user_by_id(user_id):
     """Get user by ID"""
     if not db_connected:
         # Return demo user in offline mode
-        if user_id == 1:
+        if user_id == 999:
             return demo_user
         return None
     
@@ -258,13 +542,28 @@ def get_user_by_id(user_id):
     
     try:
         user = session.query(User).filter(User.id == user_id).first()
-        session.close()
-        return user
-    except Exception as e:
-        if session:
-            session.close()
+        return user.to_dict() if user else None
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
         return None
 
+def get_users_by_ids(user_ids):
+    """Get several users in one query, returned as a dict keyed by user ID"""
+    user_ids = list(set(user_ids))
+    if not db_connected or not user_ids:
+        return {}
+    
+    session = get_db_session()
+    if not session:
+        return {}
+    
+    try:
+        users = session.query(User).filter(User.id.in_(user_ids)).all()
+        return {user.id: user.to_dict() for user in users}
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return {}
+
 def get_prediction_by_id(prediction_id):
     """Get a single prediction by ID"""
     if not db_connected:
@@ -276,25 +575,317 @@ def get_prediction_by_id(prediction_id):
         return None
     
     try:
-        prediction = session.query(PredictionHistory).filter(
+        row = session.query(*PREDICTION_COLUMNS).filter(
             PredictionHistory.id == prediction_id
         ).first()
         
-        if prediction:
-            prediction_data = {
-                'id': prediction.id,
-                'date': prediction.prediction_date,
-                'risk_level': prediction.risk_level,
-                'probability': prediction.probability,
-                'user_data': prediction.get_user_data(),
-                'prescription': prediction.get_prescription()
-            }
-            session.close()
-            return prediction_data
-        else:
-            session.close()
+        return prediction_row_to_dict(row) if row else None
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return None
+
+def get_all_users():
+    """Get all users (for admin panel)"""
+    if not db_connected:
+        return [dict(demo_user, created_at=datetime.now())]
+    
+    session = get_db_session()
+    if not session:
+        return []
+    
+    try:
+        users = session.query(User).order_by(User.id).all()
+        return [dict(user.to_dict(), created_at=user.created_at) for user in users]
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return []
+
+def get_all_predictions():
+    """Get all predictions (for admin panel)"""
+    if not db_connected:
+        return []
+    
+    session = get_db_session()
+    if not session:
+        return []
+    
+    try:
+        rows = session.query(
+            PredictionHistory.id,
+            PredictionHistory.user_id,
+            User.username,
+            PredictionHistory.prediction_date,
+            PredictionHistory.risk_level,
+            PredictionHistory.probability
+        ).join(User, PredictionHistory.user_id == User.id).order_by(
+            PredictionHistory.prediction_date.desc()
+        ).all()
+        
+        result = []
+        for p in rows:
+            result.append({
+                'id': p.id,
+                'user_id': p.user_id,
+                'username': p.username,
+                'prediction_date': p.prediction_date,
+                'risk_level': p.risk_level,
+                'probability': p.probability
+            })
+        
+        return result
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return []
+
+def filter_predictions(query, search=None, risk_level=None):
+    """
+    Apply the admin prediction filters to a query joined with User.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    """
+    if risk_level:
+        query = query.filter(PredictionHistory.risk_level == risk_level)
+    
+    search = (search or "").strip()
+    if search:
+        match = User.username.contains(search, autoescape=True)
+        if search.isdigit():
+            match = match | (PredictionHistory.id == int(search))
+        query = query.filter(match)
+    
+    return query
+
+def search_predictions(search=None, risk_level=None, limit=50, offset=0):
+    """
+    Find predictions for the admin view one page at a time.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    
+    Returns:
+        Tuple of (page of prediction summary dicts, total number of matches)
+    """
+    if not db_connected:
+        return [], 0
+    
+    session = get_db_session()
+    if not session:
+        return [], 0
+    
+    try:
+        query = session.query(
+            PredictionHistory.id,
+            PredictionHistory.user_id,
+            User.username,
+            PredictionHistory.prediction_date,
+            PredictionHistory.risk_level,
+            PredictionHistory.probability
+        ).join(User, PredictionHistory.user_id == User.id)
+        query = filter_predictions(query, search, risk_level)
+        
+        total = query.order_by(None).count()
+        rows = query.order_by(
+            PredictionHistory.prediction_date.desc(), PredictionHistory.id.desc()
+        ).limit(limit).offset(offset).all()
+        
+        result = []
+        for p in rows:
+            result.append({
+                'id': p.id,
+                'user_id': p.user_id,
+                'username': p.username,
+                'prediction_date': p.prediction_date,
+                'risk_level': p.risk_level,
+                'probability': p.probability
+            })
+        
+        return result, total
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return [], 0
+
+def iter_predictions(search=None, risk_level=None, chunk_size=1000):
+    """
+    Stream predictions matching the admin filters, oldest first, for exports.
+    
+    Results are fetched `chunk_size` rows at a time (a server-side cursor on
+    PostgreSQL), so memory use does not depend on how many predictions match.
+    
+    Yields:
+        Lists of prediction dicts with username and decoded user_data
+    """
+    if not db_connected:
+        return
+    
+    session = get_db_session()
+    if not session:
+        return
+    
+    query = session.query(
+        PredictionHistory.id,
+        PredictionHistory.user_id,
+        User.username,
+        PredictionHistory.prediction_date,
+        PredictionHistory.risk_level,
+        PredictionHistory.probability,
+        PredictionHistory.user_data
+    ).join(User, PredictionHistory.user_id == User.id)
+    query = filter_predictions(query, search, risk_level).order_by(PredictionHistory.id)
+    
+    result = session.execute(query.statement.execution_options(yield_per=chunk_size))
+    try:
+        for rows in result.partitions():
+            yield [
+                {
+                    'id': p.id,
+                    'user_id': p.user_id,
+                    'username': p.username,
+                    'prediction_date': p.prediction_date,
+                    'risk_level': p.risk_level,
+                    'probability': p.probability,
+                    'user_data': json.loads(p.user_data) if isinstance(p.user_data, str) else {}
+                }
+                for p in rows
+            ]
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        result.close()
+
+# Timeline bucket sizes for the admin analytics
+PERIOD_BUCKETS = ('hour', 'day', 'week', 'month')
+
+def period_start(bucket, column):
+    """SQL expression for the start of the bucket containing `column`"""
+    if engine.dialect.name == "sqlite":
+        return {
+            'hour': db.func.strftime('%Y-%m-%d %H:00', column),
+            'day': db.func.date(column),
+            'week': db.func.date(column, 'weekday 0', '-6 days'),
+            'month': db.func.strftime('%Y-%m-01', column)
+        }[bucket]
+    # PostgreSQL weeks start on Monday
+    return db.func.date_trunc(bucket, column)
+
+def get_prediction_date_range():
+    """First and last prediction dates, or (None, None) when there are none"""
+    if not db_connected:
+        return None, None
+    
+    session = get_db_session()
+    if not session:
+        return None, None
+    
+    try:
+        # Both ends come from the prediction_date index
+        first, last = session.query(
+            db.func.min(PredictionHistory.prediction_date),
+            db.func.max(PredictionHistory.prediction_date)
+        ).one()
+        return first, last
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return None, None
+
+def get_prediction_analytics(since=None, bucket='day', top_users=20):
+    """
+    Aggregate prediction counts for the admin analytics, grouped in the database.
+    
+    Args:
+        since: Only count predictions made at or after this UTC datetime (None for all)
+        bucket: Timeline bucket size, one of PERIOD_BUCKETS, or None to skip the timeline
+        top_users: Number of most active users to break down; 0 skips the breakdown
+    
+    Returns:
+        Dictionary with overall counts, a timeline of (period, risk_level, count)
+        rows and per-user High/Low counts
+    """
+    analytics = {'total': 0, 'high': 0, 'low': 0, 'unique_users': 0, 'timeline': [], 'by_user': []}
+    
+    if bucket is not None and bucket not in PERIOD_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Choose one of: {', '.join(PERIOD_BUCKETS)}")
+    
+    if not db_connected:
+        return analytics
+    
+    session = get_db_session()
+    if not session:
+        return analytics
+    
+    try:
+        conditions = []
+        if since is not None:
+            conditions.append(PredictionHistory.prediction_date >= since)
+        
+        high = db.func.sum(db.case((PredictionHistory.risk_level == 'High', 1), else_=0))
+        low = db.func.sum(db.case((PredictionHistory.risk_level == 'Low', 1), else_=0))
+        
+        totals = session.query(
+            db.func.count(PredictionHistory.id),
+            high,
+            low,
+            db.func.count(db.distinct(PredictionHistory.user_id))
+        ).filter(*conditions).one()
+        analytics['total'] = totals[0]
+        analytics['high'] = int(totals[1] or 0)
+        analytics['low'] = int(totals[2] or 0)
+        analytics['unique_users'] = totals[3]
+        
+        if bucket is not None:
+            period = period_start(bucket, PredictionHistory.prediction_date).label('period')
+            period_format = '%Y-%m-%d %H:00' if bucket == 'hour' else '%Y-%m-%d'
+            rows = session.query(
+                period, PredictionHistory.risk_level, db.func.count(PredictionHistory.id)
+            ).filter(*conditions).group_by(period, PredictionHistory.risk_level).order_by(period).all()
+            analytics['timeline'] = [
+                {
+                    # date_trunc returns a timestamp, SQLite a string
+                    'period': row[0].strftime(period_format) if hasattr(row[0], 'strftime') else row[0],
+                    'risk_level': row[1],
+                    'count': row[2]
+                }
+                for row in rows
+            ]
+        
+        if top_users > 0:
+            total = db.func.count(PredictionHistory.id).label('total')
+            rows = session.query(
+                PredictionHistory.user_id, User.username, high, low, total
+            ).join(User, PredictionHistory.user_id == User.id).filter(*conditions).group_by(
+                PredictionHistory.user_id, User.username
+            ).order_by(total.desc(), User.username).limit(top_users).all()
+            analytics['by_user'] = [
+                {'user_id': row[0], 'username': row[1], 'high': int(row[2]), 'low': int(row[3]), 'total': row[4]}
+                for row in rows
+            ]
+        
+        return analytics
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return analytics
+
+def get_prediction_details(prediction_id):
+    """Get detailed prediction data for admin view"""
+    if not db_connected:
+        return None
+    
+    session = get_db_session()
+    if not session:
+        return None
+    
+    try:
+        # Prediction and its user in a single joined query
+        row = session.query(*PREDICTION_COLUMNS, User.username, User.email).join(
+            User, PredictionHistory.user_id == User.id
+        ).filter(PredictionHistory.id == prediction_id).first()
+        
+        if not row:
             return None
-    except Exception as e:
-        if session:
-            session.close()
-        return None
\ No newline at end of file
+        
+        prediction = prediction_row_to_dict(row)
+        prediction['username'] = row.username
+        prediction['email'] = row.email
+        return prediction
+    except db.exc.SQLAlchemyError as e:
+        session.rollback()
+        return None
@@ -0,0 +1,141 @@
+"""
+Prediction history export for CardioPredict admins.
+
+Predictions are streamed from the storage backend in chunks and written to
+CSV or Parquet as they arrive, with each prediction's inputs decoded into
+their own columns. Memory use stays flat however many rows are exported.
+
+Exports can also be run from the command line:
+    python export.py predictions.parquet --format parquet --risk High
+"""
+
+import io
+import os
+import csv
+import sys
+import time
+import argparse
+from storage import iter_predictions
+
+# Rows read from the database and written per chunk
+EXPORT_CHUNK_SIZE = int(os.environ.get("CARDIOPREDICT_EXPORT_CHUNK_SIZE", "5000"))
+
+# Export formats and their file extensions
+EXPORT_FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+# Prediction inputs saved with every prediction, exported as their own columns
+FEATURE_COLUMNS = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs',
+    'restecg', 'thalach', 'exang', 'oldpeak', 'slope'
+]
+
+EXPORT_COLUMNS = ['id', 'user_id', 'username', 'prediction_date', 'risk_level', 'probability'] + FEATURE_COLUMNS
+
+def flatten(prediction):
+    """One export row for a prediction, with its inputs as separate values"""
+    row = [prediction[column] for column in EXPORT_COLUMNS[:6]]
+    row.extend(prediction['user_data'].get(feature) for feature in FEATURE_COLUMNS)
+    return row
+
+def write_csv(chunks, out):
+    """Write chunks of predictions to a binary file as UTF-8 CSV, returning the row count"""
+    rows = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for chunk in chunks:
+        writer.writerows(flatten(p) for p in chunk)
+        rows += len(chunk)
+        out.write(buffer.getvalue().encode('utf-8'))
+        buffer.seek(0)
+        buffer.truncate()
+
+    out.write(buffer.getvalue().encode('utf-8'))
+    return rows
+
+def write_parquet(chunks, out):
+    """Write chunks of predictions to a binary file as Parquet, one row group per chunk"""
+    # pyarrow is only needed for Parquet exports, so it is not a hard dependency
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow. Install it with: pip install pyarrow")
+
+    schema = pa.schema(
+        [
+            ('id', pa.int64()),
+            ('user_id', pa.int64()),
+            ('username', pa.string()),
+            ('prediction_date', pa.string()),
+            ('risk_level', pa.string()),
+            ('probability', pa.float64())
+        ] + [
+            # Inputs are stored as JSON numbers, which may be ints or floats
+            (feature, pa.float64()) for feature in FEATURE_COLUMNS
+        ]
+    )
+
+    rows = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            columns = list(zip(*(flatten(p) for p in chunk)))
+            # SQLite returns dates as text and the other backends as datetimes
+            columns[3] = [str(value) if value is not None else None for value in columns[3]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows += len(chunk)
+
+    return rows
+
+def export_predictions(out, fmt='csv', search=None, risk_level=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream predictions matching the admin filters into a binary file.
+
+    Args:
+        out: Seekable binary file to write to
+        fmt: One of EXPORT_FORMATS
+        search: Username fragment or prediction ID, as in the admin search
+        risk_level: "High", "Low" or None for both
+        chunk_size: Rows fetched and written at a time
+
+    Returns:
+        Tuple of (rows written, bytes written)
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose one of: {', '.join(EXPORT_FORMATS)}")
+
+    start = out.tell()
+    chunks = iter_predictions(search=search, risk_level=risk_level, chunk_size=chunk_size)
+
+    if fmt == 'csv':
+        rows = write_csv(chunks, out)
+    else:
+        rows = write_parquet(chunks, out)
+
+    out.flush()
+    return rows, out.tell() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export CardioPredict prediction history")
+    parser.add_argument("path", help="File to write")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="Defaults to the file extension")
+    parser.add_argument("--search", help="Username fragment or prediction ID")
+    parser.add_argument("--risk", choices=["High", "Low"], help="Only export this risk level")
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.path.endswith('.parquet') else 'csv')
+
+    started = time.perf_counter()
+    try:
+        with open(args.path, 'wb') as out:
+            rows, size = export_predictions(out, fmt, search=args.search, risk_level=args.risk)
+    except (RuntimeError, ValueError) as e:
+        print(f"Export failed: {e}")
+        sys.exit(1)
+
+    print(f"Exported {rows} predictions ({size / 1024:.1f} KiB) to {args.path} "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,35 @@
+"""
+Fragment-scoped page rendering for CardioPredict.
+
+Each page renders inside a Streamlit fragment, so a widget on that page reruns
+only the page function rather than the whole app script (navigation, sidebar
+and footer). Changing pages still reruns the full script.
+"""
+
+import functools
+import streamlit as st
+from storage import end_script_run
+from profiling import begin_run, end_run
+from memory import account_session
+
+def page_fragment(render):
+    """
+    Render a page as a fragment.
+
+    A fragment-only rerun never reaches the end of app.py, so the page releases
+    its storage session itself when it finishes. It also does its own memory
+    accounting, and saves its own profile if one is being captured.
+    """
+    @st.fragment
+    @functools.wraps(render)
+    def render_page(*args, **kwargs):
+        profiled = begin_run("fragment")
+        try:
+            return render(*args, **kwargs)
+        finally:
+            account_session()
+            if profiled:
+                end_run()
+            end_script_run()
+
+    return render_page
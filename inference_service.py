@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+"""
+HTTP JSON inference service for CardioPredict.
+
+Lets systems that cannot drive the Streamlit UI, such as EHR integrations,
+score patients with the same model and the same 11 inputs as the Prediction
+page. The server is plain asyncio with no dependencies beyond the model's.
+Scoring runs in a pool of worker processes, and each worker loads the model
+once when it starts. Concurrent requests are micro-batched (see batching.py),
+so each worker scores many patients per model call.
+
+Endpoints:
+    POST /predict        one patient object          -> one result
+    POST /predict/batch  {"patients": [patient, ...]} -> {"predictions": [result, ...]}
+    GET  /health         service status
+
+A patient is a JSON object with the keys of FEATURE_SCHEMA. A result looks
+like {"risk_level": "High", "probability": 0.83}, where probability is the
+model's confidence in that risk level, as shown in the app.
+
+Usage:
+    python inference_service.py [--host 127.0.0.1] [--port 8600] [--workers 2]
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from model import load_model, predict_heart_disease
+from batching import MicroBatcher
+
+# Address the service listens on
+SERVICE_HOST = os.environ.get("CARDIOPREDICT_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("CARDIOPREDICT_SERVICE_PORT", "8600"))
+
+# Worker processes that score requests; 0 scores on a thread of the server process
+SERVICE_WORKERS = int(os.environ.get("CARDIOPREDICT_SERVICE_WORKERS", "2"))
+
+# Seconds a request may take to arrive and be scored before it fails
+SERVICE_REQUEST_TIMEOUT = float(os.environ.get("CARDIOPREDICT_SERVICE_REQUEST_TIMEOUT", "10"))
+
+# Seconds an idle keep-alive connection stays open
+SERVICE_IDLE_TIMEOUT = float(os.environ.get("CARDIOPREDICT_SERVICE_IDLE_TIMEOUT", "30"))
+
+# Largest request body in bytes, and most patients in one batch
+SERVICE_MAX_BODY = int(os.environ.get("CARDIOPREDICT_SERVICE_MAX_BODY", str(1024 * 1024)))
+SERVICE_MAX_BATCH = int(os.environ.get("CARDIOPREDICT_SERVICE_MAX_BATCH", "1000"))
+
+# Model inputs with the ranges the Prediction page accepts
+FEATURE_SCHEMA = {
+    'age': (1, 120),         # years
+    'sex': (0, 1),           # 1 = male, 0 = female
+    'cp': (0, 3),            # chest pain type
+    'trestbps': (80, 200),   # resting blood pressure, mm Hg
+    'chol': (100, 600),      # serum cholesterol, mg/dl
+    'fbs': (0, 1),           # fasting blood sugar > 120 mg/dl
+    'restecg': (0, 2),       # resting ECG result
+    'thalach': (60, 220),    # maximum heart rate achieved
+    'exang': (0, 1),         # exercise induced angina
+    'oldpeak': (0.0, 10.0),  # ST depression induced by exercise
+    'slope': (0, 2),         # slope of peak exercise ST segment
+}
+
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable", 504: "Gateway Timeout"
+}
+
+class RequestError(Exception):
+    """A request the service cannot serve, answered with this HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# Model held by this process, loaded once
+_model_data = None
+
+def load_worker_model():
+    """Load the model into this process; runs once as each worker starts"""
+    global _model_data
+    if _model_data is None:
+        _model_data = load_model()
+
+def score_patients(patients):
+    """Score validated patients with the model held by this process"""
+    load_worker_model()
+    predictions, probabilities = predict_heart_disease(_model_data, pd.DataFrame(patients))
+    return [
+        {
+            'risk_level': "High" if prediction == 1 else "Low",
+            'probability': float(probability[1] if prediction == 1 else probability[0])
+        }
+        for prediction, probability in zip(predictions, probabilities)
+    ]
+
+def validate_patient(patient, where="patient"):
+    """Check one patient against FEATURE_SCHEMA, returning the model row"""
+    if not isinstance(patient, dict):
+        raise RequestError(400, f"{where} must be a JSON object")
+
+    missing = [name for name in FEATURE_SCHEMA if name not in patient]
+    if missing:
+        raise RequestError(400, f"{where} is missing: {', '.join(missing)}")
+
+    row = {}
+    for name, (low, high) in FEATURE_SCHEMA.items():
+        value = patient[name]
+        # bool is an int subclass, but true/false is never a valid reading
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise RequestError(400, f"{where}.{name} must be a number")
+        if not low <= value <= high:
+            raise RequestError(400, f"{where}.{name} must be between {low} and {high}")
+        row[name] = value
+    return row
+
+class InferenceService:
+    """Routes requests and runs scoring in the worker pool"""
+
+    def __init__(self, workers=SERVICE_WORKERS, timeout=SERVICE_REQUEST_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = None
+        # One dispatcher per worker keeps every worker busy with its own batch
+        self.batcher = MicroBatcher("service", self.score_batch, dispatchers=max(workers, 1))
+        self.started = time.time()
+        self.requests = 0
+
+    def start(self):
+        """Start the workers and wait until each one has loaded the model"""
+        if self.workers <= 0:
+            load_worker_model()
+            return
+        # spawn gives each worker a clean interpreter, like the password pool
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_worker_model
+        )
+        # ProcessPoolExecutor starts workers lazily; warm every one up front
+        for future in [self.executor.submit(load_worker_model) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        """Stop the workers"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def score_batch(self, patients):
+        """Score one micro-batch; runs on a batcher dispatcher thread"""
+        if self.executor is None:
+            return score_patients(patients)
+        return self.executor.submit(score_patients, patients).result()
+
+    async def score(self, patients):
+        """Score patients with the next micro-batch, bounded by the request timeout"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.batcher.submit(patients)), self.timeout)
+        except asyncio.TimeoutError:
+            raise RequestError(504, f"Scoring took longer than {self.timeout:g}s")
+        except BrokenProcessPool:
+            # A worker died; later requests get a fresh pool
+            self.shutdown()
+            await loop.run_in_executor(None, self.start)
+            raise RequestError(503, "Scoring worker restarted, please retry")
+
+    async def handle(self, method, path, body):
+        """Answer one request with (status, JSON-serialisable payload)"""
+        self.requests += 1
+
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Use GET")
+            return 200, {
+                'status': "ok",
+                'workers': self.workers,
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'requests': self.requests,
+                'batching': self.batcher.stats()
+            }
+
+        if path not in ("/predict", "/predict/batch"):
+            raise RequestError(404, f"No endpoint at {path}")
+        if method != "POST":
+            raise RequestError(405, "Use POST")
+
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise RequestError(400, "Request body is not valid JSON")
+
+        if path == "/predict":
+            return 200, (await self.score([validate_patient(payload)]))[0]
+
+        patients = payload.get('patients') if isinstance(payload, dict) else None
+        if not isinstance(patients, list) or not patients:
+            raise RequestError(400, "Body must be {\"patients\": [...]} with at least one patient")
+        if len(patients) > SERVICE_MAX_BATCH:
+            raise RequestError(413, f"At most {SERVICE_MAX_BATCH} patients per batch")
+
+        rows = [validate_patient(patient, f"patients[{i}]") for i, patient in enumerate(patients)]
+        return 200, {'predictions': await self.score(rows)}
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Returns:
+        Tuple of (method, path, headers, body), or None if the client closed the connection
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(413, "Request headers are too large")
+
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', "0"))
+    except ValueError:
+        raise RequestError(400, "Invalid Content-Length")
+    if length > SERVICE_MAX_BODY:
+        raise RequestError(413, f"Request body is larger than {SERVICE_MAX_BODY} bytes")
+
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+def write_response(writer, status, payload, keep_alive):
+    """Send a JSON response"""
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+    )
+
+async def serve_connection(service, reader, writer):
+    """Serve requests on one connection until the client closes it or it idles out"""
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await asyncio.wait_for(read_request(reader), SERVICE_IDLE_TIMEOUT)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', "").lower() != "close"
+                status, payload = await service.handle(method, path, body)
+            except asyncio.TimeoutError:
+                break
+            except RequestError as e:
+                status, payload = e.status, {'error': str(e)}
+            except Exception as e:
+                print(f"Error serving request: {e}")
+                status, payload = 500, {'error': "Internal error"}
+
+            write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def run_service(host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS):
+    """Start the workers and serve until cancelled"""
+    service = InferenceService(workers=workers)
+    started = time.perf_counter()
+    service.start()
+
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_connection(service, reader, writer),
+        host, port, limit=64 * 1024
+    )
+    print(f"CardioPredict inference service on http://{host}:{port} "
+          f"({workers} workers, ready in {time.perf_counter() - started:.1f}s)")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve CardioPredict predictions over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Scoring processes; 0 scores in-process")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_service(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -1,36 +1,10 @@
 import streamlit as st
-import os
-import base64
+from assets import use_stylesheets
 
 def inject_custom_css():
     """Inject custom CSS into the Streamlit app."""
-    custom_css_path = os.path.join(".streamlit", "static", "css", "custom.css")
-    bootstrap_css_path = os.path.join(".streamlit", "static", "css", "bootstrap.min.css")
-    fa_css_path = os.path.join(".streamlit", "static", "css", "font-awesome.min.css")
-    
-    with open(custom_css_path, "r") as f:
-        custom_css = f.read()
-        
-    try:
-        with open(bootstrap_css_path, "r") as f:
-            bootstrap_css = f.read()
-    except:
-        bootstrap_css = ""
-        
-    try:
-        with open(fa_css_path, "r") as f:
-            fa_css = f.read()
-    except:
-        fa_css = ""
-
-    # Combine the CSS files
-    all_css = f"""
-    <style>
-        {custom_css}
-    </style>
-    """
-    
-    st.markdown(all_css, unsafe_allow_html=True)
+    # Served as cached static files; only the link tags are sent on each rerun
+    use_stylesheets("css/custom.css", "css/app.css")
 
 def add_font_awesome():
     """Add Font Awesome Icons CSS"""
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Load test for the CardioPredict inference service.
+
+Opens --concurrency keep-alive connections to a running inference_service.py
+and sends random valid patients as fast as the service answers. Reports
+throughput and latency percentiles.
+
+Usage:
+    python inference_service.py &
+    python load_test.py [--requests 2000] [--concurrency 32] [--batch 1]
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from inference_service import SERVICE_HOST, SERVICE_PORT, FEATURE_SCHEMA
+
+def random_patient(rng):
+    """A patient with every input drawn from its valid range"""
+    patient = {}
+    for name, (low, high) in FEATURE_SCHEMA.items():
+        if isinstance(low, float):
+            patient[name] = round(rng.uniform(low, high), 1)
+        else:
+            patient[name] = rng.randint(low, high)
+    return patient
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def post(reader, writer, host, path, payload):
+    """Send one JSON POST on an open connection and return (status, response body)"""
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+    head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1')
+    status = int(head.split(" ", 2)[1])
+    length = 0
+    for line in head.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def client(host, port, path, payloads, latencies, errors):
+    """Send payloads one after another on a single connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while payloads:
+            payload = payloads.pop()
+            start = time.perf_counter()
+            try:
+                status, _ = await post(reader, writer, host, path, payload)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors['connection'] = errors.get('connection', 0) + 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_load_test(host, port, requests, concurrency, batch, seed=0):
+    """
+    Drive the service and collect results.
+
+    Returns:
+        Tuple of (sorted latencies of successful requests, error counts, elapsed seconds)
+    """
+    rng = random.Random(seed)
+    if batch > 1:
+        path = "/predict/batch"
+        payloads = [{'patients': [random_patient(rng) for _ in range(batch)]} for _ in range(requests)]
+    else:
+        path = "/predict"
+        payloads = [random_patient(rng) for _ in range(requests)]
+
+    latencies = []
+    errors = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, path, payloads, latencies, errors) for _ in range(concurrency)
+    ))
+    return sorted(latencies), errors, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the CardioPredict inference service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests to send")
+    parser.add_argument("--concurrency", type=int, default=32, help="Connections sending at once")
+    parser.add_argument("--batch", type=int, default=1, help="Patients per request; above 1 uses /predict/batch")
+    args = parser.parse_args()
+
+    try:
+        latencies, errors, elapsed = asyncio.run(
+            run_load_test(args.host, args.port, args.requests, args.concurrency, args.batch)
+        )
+    except OSError as e:
+        print(f"Cannot reach the inference service at {args.host}:{args.port}: {e}")
+        sys.exit(1)
+
+    succeeded = len(latencies)
+    print(f"Requests:    {succeeded} succeeded, {sum(errors.values())} failed {errors or ''}")
+    print(f"Throughput:  {succeeded / elapsed:.1f} requests/s, {succeeded * args.batch / elapsed:.1f} patients/s")
+    print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"Latency p95: {percentile(latencies, 0.95) * 1000:.1f} ms")
+    print(f"Latency p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
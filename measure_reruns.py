@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Measure the Streamlit reruns and server CPU that one completed prediction costs.
+
+Drives the Prediction page with Streamlit's AppTest the way a browser would:
+every input is changed once, then the prediction is submitted. A widget outside
+an st.form reruns the script as soon as it changes; a widget inside a form only
+sends its value with the form's submit, so no rerun is counted for it.
+
+Usage:
+    python measure_reruns.py [--repeat 5]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs app.py with the navigation menu fixed on the Prediction page
+APP_WRAPPER = f"""
+import sys
+sys.path.insert(0, {APP_DIR!r})
+import runpy
+import streamlit_option_menu
+streamlit_option_menu.option_menu = lambda *args, **kwargs: "Prediction"
+runpy.run_path({os.path.join(APP_DIR, "app.py")!r}, run_name="__main__")
+"""
+
+# A new value for each prediction input, by widget label
+INPUT_CHANGES = {
+    "Age": 58,
+    "Gender": "Female",
+    "Chest Pain Type": "Asymptomatic",
+    "Resting Blood Pressure (mm Hg)": 140,
+    "Serum Cholesterol (mg/dl)": 260,
+    "Fasting Blood Sugar > 120 mg/dl": "Yes",
+    "Resting ECG Results": "ST-T Wave Abnormality",
+    "Maximum Heart Rate Achieved": 120,
+    "Exercise Induced Angina": "Yes",
+    "ST Depression Induced by Exercise": 2.0,
+    "Slope of Peak Exercise ST Segment": "Flat",
+}
+
+SUBMIT_LABEL = "Predict Heart Disease Risk"
+
+def find_widget(at, label):
+    """The number input or selectbox with the given label"""
+    for widget in list(at.number_input) + list(at.selectbox):
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No input labelled '{label}' on the Prediction page")
+
+def find_submit(at):
+    """The prediction button, whether it is a plain button or a form submit button"""
+    for button in at.button:
+        if button.label == SUBMIT_LABEL:
+            return button
+    raise LookupError(f"No '{SUBMIT_LABEL}' button on the Prediction page")
+
+def measure_prediction(script_path):
+    """
+    Fill in and submit one prediction.
+
+    Returns:
+        Tuple of (script runs, CPU seconds) spent after the page first loaded
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(script_path, default_timeout=120)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    runs = 0
+    cpu = 0.0
+
+    for label, value in INPUT_CHANGES.items():
+        widget = find_widget(at, label)
+        widget.set_value(value)
+        if widget.proto.form_id:
+            # Held by the browser until the form is submitted
+            continue
+        start = time.process_time()
+        at.run()
+        cpu += time.process_time() - start
+        runs += 1
+
+    start = time.process_time()
+    find_submit(at).click().run()
+    cpu += time.process_time() - start
+    runs += 1
+
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if not any(element.value == "Prediction Result" for element in at.subheader):
+        raise RuntimeError("The prediction result was not shown")
+
+    return runs, cpu
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reruns and CPU per completed prediction")
+    parser.add_argument("--repeat", type=int, default=5, help="Predictions to measure")
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as wrapper:
+        wrapper.write(APP_WRAPPER)
+
+    try:
+        results = [measure_prediction(wrapper.name) for _ in range(args.repeat)]
+    finally:
+        os.remove(wrapper.name)
+
+    runs = results[-1][0]
+    cpu = sorted(result[1] for result in results)[len(results) // 2]
+    print(f"Script reruns per prediction: {runs}")
+    print(f"Server CPU per prediction:    {cpu * 1000:.0f} ms (median of {len(results)})")
@@ -0,0 +1,269 @@
+"""
+Memory accounting for CardioPredict.
+
+Every Streamlit session shares one server process. This module estimates what
+each part holds: each session's st.session_state, the DataFrames its pages
+build on every rerun, and the process-wide caches (user records, the loaded
+model, the dataset statistics).
+
+At the end of each run, account_session() measures the current session. If
+the session's state plus the DataFrames its last rerun built exceed
+SESSION_MEMORY_CAP, its largest keys are evicted until it fits. Keys that keep
+the user signed in are never evicted. A page that builds a DataFrame whose
+size depends on a session key, such as how much history to show, names that
+key in track_frame(). The DataFrame's size then counts towards evicting that
+key.
+
+Sizes are estimates: pandas and numpy report their own buffers, and other
+objects are walked recursively with sys.getsizeof.
+"""
+
+import os
+import sys
+import pickle
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from metrics import Counter, collectors
+
+# Most memory one session may hold, in KiB, counting its state and last rerun's DataFrames; 0 disables eviction
+SESSION_MEMORY_CAP = int(os.environ.get("CARDIOPREDICT_SESSION_MEMORY_CAP_KB", "4096")) * 1024
+
+# Session keys that are never evicted: who is signed in, and the messages they are shown
+PROTECTED_KEYS = {
+    'user_id', 'username', 'is_authenticated', 'is_admin',
+    'show_login', 'show_signup', 'login_message', 'signup_message'
+}
+
+# Session key -> function called with the key's value before it is evicted, e.g. to delete a file
+evict_hooks = {}
+
+session_evictions = Counter(
+    "cardiopredict_session_evictions_total",
+    "Session keys evicted to keep a session under the memory cap"
+)
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by an object and everything it references"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def peak_rss():
+    """Largest resident set size this process has reached, in bytes, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class SessionMemory:
+    """What one session was holding at the end of its last run"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.username = None
+        self.key_bytes = {}  # session_state key -> bytes
+        self.frames = {}  # DataFrame name -> (session key deciding its size or None, bytes)
+        self.evictions = 0
+
+    @property
+    def state_bytes(self):
+        return sum(self.key_bytes.values())
+
+    @property
+    def frame_bytes(self):
+        return sum(size for _, size in self.frames.values())
+
+    def total(self):
+        return self.state_bytes + self.frame_bytes
+
+# Session key each session keeps its own accounting under. Streamlit wraps the
+# session's state in a new object every run, so the state itself is the only
+# thing that lives exactly as long as the session.
+ACCOUNTING_KEY = '_memory_accounting'
+
+# Every session's accounting; entries go when Streamlit drops the session
+_sessions = weakref.WeakSet()
+_lock = threading.Lock()
+
+def _current_session():
+    """Accounting for the session running this thread's script, or None outside a script run"""
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    entry = st.session_state.get(ACCOUNTING_KEY)
+    if entry is None:
+        entry = st.session_state[ACCOUNTING_KEY] = SessionMemory(ctx.session_id)
+        with _lock:
+            _sessions.add(entry)
+    return entry
+
+def track_frame(name, frame, key=None):
+    """
+    Record a DataFrame built for the current session in this run.
+
+    Args:
+        name: Stable name for what the frame shows, e.g. "profile.history"
+        frame: The DataFrame
+        key: session_state key that decides how big the frame is, if any
+    """
+    entry = _current_session()
+    if entry is not None:
+        entry.frames[name] = (key, int(frame.memory_usage(deep=True).sum()))
+
+def account_session():
+    """Measure the current session's state and evict from it if it is over SESSION_MEMORY_CAP"""
+    import streamlit as st
+
+    entry = _current_session()
+    if entry is None:
+        return
+    state = st.session_state.to_dict()
+    state.pop(ACCOUNTING_KEY, None)
+    entry.key_bytes = {key: deep_sizeof(value) for key, value in state.items()}
+    entry.username = state.get('username')
+
+    if SESSION_MEMORY_CAP > 0 and entry.total() > SESSION_MEMORY_CAP:
+        _evict(entry, state)
+
+def _evict(entry, state):
+    """Drop the session's costliest keys until it fits under the cap"""
+    import streamlit as st
+
+    # A key costs its own size plus the DataFrames it makes each rerun build
+    costs = dict(entry.key_bytes)
+    for key, size in entry.frames.values():
+        if key in costs:
+            costs[key] += size
+
+    for key in sorted(costs, key=costs.get, reverse=True):
+        if entry.total() <= SESSION_MEMORY_CAP:
+            break
+        if key in PROTECTED_KEYS:
+            continue
+        hook = evict_hooks.get(key)
+        if hook is not None:
+            try:
+                hook(state[key])
+            except Exception as e:
+                print(f"Error evicting session key {key}: {e}")
+        del st.session_state[key]
+        entry.key_bytes.pop(key, None)
+        entry.frames = {name: frame for name, frame in entry.frames.items() if frame[0] != key}
+        entry.evictions += 1
+        session_evictions.inc()
+
+def session_memory():
+    """Accounting for every session still open, largest first"""
+    with _lock:
+        entries = list(_sessions)
+    return sorted(entries, key=lambda entry: -entry.total())
+
+# Model object id -> pickled size; the model never changes once loaded
+_model_sizes = {}
+
+def cache_memory():
+    """
+    Approximate bytes held by each process-wide cache.
+
+    Returns:
+        List of (name, entries, bytes)
+    """
+    from cache import caches
+
+    rows = [(f"cache:{name}", len(cache), deep_sizeof(cache.values())) for name, cache in caches.items()]
+
+    # Only present once this process has loaded them
+    batching = sys.modules.get('batching')
+    model_data = batching._model_data if batching else None
+    if model_data is not None:
+        # Fitted trees keep their arrays out of reach of getsizeof, so use the pickled size
+        if id(model_data) not in _model_sizes:
+            _model_sizes[id(model_data)] = len(pickle.dumps(model_data, protocol=pickle.HIGHEST_PROTOCOL))
+        rows.append(("model", 1, _model_sizes[id(model_data)]))
+
+    data_processor = sys.modules.get('data_processor')
+    stats = data_processor._stats_cache['stats'] if data_processor else None
+    if stats is not None:
+        rows.append(("dataset_stats", 1, deep_sizeof(stats)))
+
+    return rows
+
+def memory_report():
+    """Process, cache and per-session memory in one dict"""
+    sessions = session_memory()
+    return {
+        'rss': current_rss(),
+        'peak_rss': peak_rss(),
+        'caches': cache_memory(),
+        'sessions': [{
+            'session': entry.session_id[:8],
+            'username': entry.username,
+            'state_bytes': entry.state_bytes,
+            'frame_bytes': entry.frame_bytes,
+            'evictions': entry.evictions,
+            'largest_key': max(entry.key_bytes, key=entry.key_bytes.get, default=None)
+        } for entry in sessions]
+    }
+
+def collect_memory_stats():
+    """Scrape-time metric families for process, cache and session memory"""
+    families = []
+    for name, value, help in (
+        ("cardiopredict_resident_memory_bytes", current_rss(), "Resident set size of the server process"),
+        ("cardiopredict_peak_resident_memory_bytes", peak_rss(), "Largest resident set size the server process has reached"),
+    ):
+        if value is not None:
+            families.append((name, "gauge", help, [(name, (), value)]))
+
+    families.append((
+        "cardiopredict_cache_memory_bytes", "gauge", "Approximate bytes held by each process-wide cache",
+        [("cardiopredict_cache_memory_bytes", (('cache', name),), size) for name, _, size in cache_memory()]
+    ))
+
+    sessions = session_memory()
+    families += [
+        ("cardiopredict_session_memory_bytes", "gauge", "Approximate bytes held by open sessions, by kind", [
+            ("cardiopredict_session_memory_bytes", (('kind', 'state'),), sum(s.state_bytes for s in sessions)),
+            ("cardiopredict_session_memory_bytes", (('kind', 'frames'),), sum(s.frame_bytes for s in sessions)),
+        ]),
+        ("cardiopredict_sessions_tracked", "gauge", "Open sessions with memory accounting",
+         [("cardiopredict_sessions_tracked", (), len(sessions))]),
+    ]
+    return families
+
+collectors.append(collect_memory_stats)
@@ -0,0 +1,342 @@
+"""
+Prometheus-style metrics for CardioPredict.
+
+Counters and histograms are kept in process memory. Recording one is a lock
+and a bisect, so instrumenting hot paths costs microseconds. A scrape endpoint
+serves them, together with the app's existing statistics (caches, password
+hashing, admission limits, micro-batches), in the Prometheus text exposition
+format:
+
+    curl http://127.0.0.1:9464/metrics
+
+The endpoint listens on localhost only and is started by app.py. Set
+CARDIOPREDICT_METRICS_PORT=0 to turn it off.
+"""
+
+import os
+import sys
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Local port the scrape endpoint listens on; 0 disables it
+METRICS_PORT = int(os.environ.get("CARDIOPREDICT_METRICS_PORT", "9464"))
+METRICS_HOST = os.environ.get("CARDIOPREDICT_METRICS_HOST", "127.0.0.1")
+
+# A session counts as active if it ran the script within this many seconds
+SESSION_ACTIVE_WINDOW = float(os.environ.get("CARDIOPREDICT_SESSION_ACTIVE_WINDOW", "300"))
+
+# Histogram bounds, in seconds, for everything timed here
+LATENCY_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Metrics defined in this process, by name, in definition order
+registry = {}
+
+# Functions returning extra (name, type, help, samples) families at scrape time
+collectors = []
+
+def format_labels(labels):
+    """Prometheus label set, e.g. {stage="load"}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+def format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(float(bound))
+
+def histogram_samples(name, labels, snapshot):
+    """Bucket, sum and count samples of a LatencyHistogram snapshot"""
+    samples = []
+    for bound, count in snapshot['buckets'].items():
+        samples.append((f"{name}_bucket", labels + (('le', format_bound(bound)),), count))
+    samples.append((f"{name}_sum", labels, snapshot['sum']))
+    samples.append((f"{name}_count", labels, snapshot['count']))
+    return samples
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with fixed bucket bounds in seconds"""
+
+    def __init__(self, bounds=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Record one measurement"""
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """Cumulative bucket counts keyed by upper bound, plus sum and count"""
+        with self._lock:
+            buckets = {}
+            running = 0
+            for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+                running += count
+                buckets[bound] = running
+            return {'buckets': buckets, 'sum': self.total, 'count': self.count}
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[label] for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def family(self):
+        with self._lock:
+            values = dict(self._values)
+        samples = [(self.name, tuple(zip(self.labelnames, key)), value) for key, value in values.items()]
+        return self.name, "counter", self.help, samples
+
+class Histogram:
+    """Latency histogram, optionally split by label values"""
+
+    def __init__(self, name, help, labelnames=(), bounds=LATENCY_BOUNDS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.bounds = bounds
+        self._children = {}
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def child(self, **labels):
+        """The histogram for one set of label values"""
+        key = tuple(labels[label] for label in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, LatencyHistogram(self.bounds))
+        return child
+
+    def observe(self, seconds, **labels):
+        self.child(**labels).observe(seconds)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the body of a with block takes"""
+        child = self.child(**labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            child.observe(time.perf_counter() - start)
+
+    def family(self):
+        with self._lock:
+            children = dict(self._children)
+        samples = []
+        for key, child in children.items():
+            samples.extend(histogram_samples(self.name, tuple(zip(self.labelnames, key)), child.snapshot()))
+        return self.name, "histogram", self.help, samples
+
+prediction_stage_seconds = Histogram(
+    "cardiopredict_prediction_stage_seconds",
+    "Time spent in each stage of a prediction: load, scale, predict, persist",
+    labelnames=("stage",)
+)
+
+db_query_seconds = Histogram(
+    "cardiopredict_db_query_seconds",
+    "Storage backend call latency per function",
+    labelnames=("backend", "function")
+)
+
+db_query_errors = Counter(
+    "cardiopredict_db_query_errors_total",
+    "Storage backend calls that raised an exception",
+    labelnames=("backend", "function")
+)
+
+auth_seconds = Histogram(
+    "cardiopredict_auth_seconds",
+    "Sign-in latency including the password check, by result",
+    labelnames=("result",)
+)
+
+script_runs = Counter(
+    "cardiopredict_script_runs_total",
+    "Full Streamlit script runs"
+)
+
+def timed_query(backend_name, func):
+    """Wrap a storage backend function so each call is timed into db_query_seconds"""
+    # Generators return at once and do their work while iterated, so they are left alone
+    if inspect.isgeneratorfunction(func):
+        return func
+
+    child = db_query_seconds.child(backend=backend_name, function=func.__name__)
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            db_query_errors.inc(backend=backend_name, function=func.__name__)
+            raise
+        finally:
+            child.observe(time.perf_counter() - start)
+
+    return timed
+
+# Session ID -> time of its last script run
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def record_session_run():
+    """Note that the current Streamlit session ran the script; call once per run"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    script_runs.inc()
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        with _sessions_lock:
+            _sessions[ctx.session_id] = time.monotonic()
+
+def active_sessions():
+    """Sessions that ran the script within SESSION_ACTIVE_WINDOW, forgetting older ones"""
+    cutoff = time.monotonic() - SESSION_ACTIVE_WINDOW
+    with _sessions_lock:
+        for session_id in [s for s, last_run in _sessions.items() if last_run < cutoff]:
+            del _sessions[session_id]
+        return len(_sessions)
+
+def collect_app_stats():
+    """Families built from statistics other modules already keep"""
+    from cache import caches
+    from passwords import hash_latency, verify_latency
+    from admission import limiters
+
+    # Only report batchers if this process uses them; importing batching loads the model code
+    batching = sys.modules.get('batching')
+    batchers = batching.batchers if batching else {}
+
+    families = [(
+        "cardiopredict_active_sessions", "gauge",
+        f"Sessions that ran the script in the last {SESSION_ACTIVE_WINDOW:g}s",
+        [("cardiopredict_active_sessions", (), active_sessions())]
+    )]
+
+    cache_stats = [(name, cache.hits, cache.misses, len(cache)) for name, cache in caches.items()]
+    families += [
+        ("cardiopredict_cache_hits_total", "counter", "Cache lookups that found a live entry",
+         [("cardiopredict_cache_hits_total", (('cache', name),), hits) for name, hits, _, _ in cache_stats]),
+        ("cardiopredict_cache_misses_total", "counter", "Cache lookups that missed or found an expired entry",
+         [("cardiopredict_cache_misses_total", (('cache', name),), misses) for name, _, misses, _ in cache_stats]),
+        ("cardiopredict_cache_entries", "gauge", "Entries held by each cache",
+         [("cardiopredict_cache_entries", (('cache', name),), size) for name, _, _, size in cache_stats]),
+    ]
+
+    families += [
+        ("cardiopredict_password_hash_seconds", "histogram", "bcrypt hashing latency including pool wait",
+         histogram_samples("cardiopredict_password_hash_seconds", (), hash_latency.snapshot())),
+        ("cardiopredict_password_verify_seconds", "histogram", "bcrypt verification latency including pool wait",
+         histogram_samples("cardiopredict_password_verify_seconds", (), verify_latency.snapshot())),
+    ]
+
+    stage_stats = [(name, limiter.stats()) for name, limiter in limiters.items()]
+    for field, kind, help in (
+        ('running', "gauge", "Callers currently inside each admission-controlled stage"),
+        ('waiting', "gauge", "Callers queued for a slot in each stage"),
+        ('concurrency', "gauge", "Most callers allowed inside each stage at once"),
+        ('queue_size', "gauge", "Most callers allowed to queue for each stage"),
+        ('admitted', "counter", "Callers admitted to each stage"),
+        ('rejected', "counter", "Callers turned away because the stage queue was full"),
+        ('timed_out', "counter", "Callers turned away after waiting too long for a slot"),
+    ):
+        name = f"cardiopredict_stage_{field}" + ("_total" if kind == "counter" else "")
+        families.append((name, kind, help, [(name, (('stage', stage),), stats[field]) for stage, stats in stage_stats]))
+
+    wait_samples = []
+    for stage, stats in stage_stats:
+        wait_samples += histogram_samples("cardiopredict_stage_wait_seconds", (('stage', stage),), stats['wait_time'])
+    families.append(("cardiopredict_stage_wait_seconds", "histogram", "Time spent waiting for a stage slot", wait_samples))
+
+    size_samples = []
+    for name, batcher in batchers.items():
+        size_samples += histogram_samples("cardiopredict_batch_rows", (('batcher', name),), batcher.batch_sizes.snapshot())
+    families.append(("cardiopredict_batch_rows", "histogram", "Rows scored per micro-batch", size_samples))
+
+    return families
+
+collectors.append(collect_app_stats)
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    families = [metric.family() for metric in list(registry.values())]
+    for collect in collectors:
+        families.extend(collect())
+
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{sample_name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def metrics_handler():
+    """Request handler class for the scrape endpoint; http.server is only imported when it starts"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serves GET /metrics"""
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the Streamlit log
+            pass
+
+    return MetricsHandler
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a background thread, once per process. Returns True if it is running."""
+    global _server
+
+    if port <= 0:
+        return False
+
+    with _server_lock:
+        if _server is None:
+            try:
+                from http.server import ThreadingHTTPServer
+                _server = ThreadingHTTPServer((host, port), metrics_handler())
+            except OSError as e:
+                # Probably another server process has the port; don't retry on every run
+                print(f"Metrics endpoint not started on {host}:{port}: {e}")
+                _server = False
+                return False
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return bool(_server)
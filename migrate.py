@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""
+Database migrations for CardioPredict.
+
+Creates or upgrades the schema of the configured storage backend and, for the
+local backends, the default admin account. Run it once per deployment before
+starting the app; the app itself only checks the schema version at startup.
+
+Usage:
+    python migrate.py           # apply pending migrations
+    python migrate.py --check   # report the schema version, exit 1 if migrations are pending
+"""
+
+import sys
+import argparse
+import storage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or upgrade the CardioPredict database schema")
+    parser.add_argument("--check", action="store_true", help="Only report whether migrations are pending")
+    args = parser.parse_args()
+
+    if args.check:
+        version = storage.backend.get_schema_version()
+        if version is None:
+            print(f"Storage backend '{storage.backend_name}' is not reachable.")
+            sys.exit(1)
+        print(f"Storage backend '{storage.backend_name}': schema version {version} of {storage.SCHEMA_VERSION}")
+        sys.exit(0 if version == storage.SCHEMA_VERSION else 1)
+
+    success, message = storage.backend.migrate()
+    print(f"Storage backend '{storage.backend_name}': {message}")
+    if not success:
+        sys.exit(1)
@@ -2,11 +2,9 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 from data_processor import load_data, preprocess_data
+from metrics import prediction_stage_seconds
+from tracing import span
 
 # Path to save trained model
 MODEL_PATH = "heart_disease_model.pkl"
@@ -16,6 +14,13 @@ def train_model():
     Train a heart disease prediction model and save it to disk.
     Returns the trained model.
     """
+    # scikit-learn takes over a second to import, so it is only loaded when
+    # a model is trained or unpickled rather than at app startup
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import accuracy_score, classification_report
+
     # Load and preprocess data
     df = load_data()
     X, y = preprocess_data(df)
@@ -64,7 +69,8 @@ def load_model():
     """
     if os.path.exists(MODEL_PATH):
         try:
-            model_data = joblib.load(MODEL_PATH)
+            with prediction_stage_seconds.time(stage="load"), span("load_model"):
+                model_data = joblib.load(MODEL_PATH)
             return model_data
         except Exception as e:
             print(f"Error loading model: {e}")
@@ -93,11 +99,13 @@ def predict_heart_disease(model_data, user_data):
     user_data = user_data[features]
     
     # Preprocess the user data
-    user_data_scaled = scaler.transform(user_data)
+    with prediction_stage_seconds.time(stage="scale"), span("scaler.transform"):
+        user_data_scaled = scaler.transform(user_data)
     
     # Make prediction
-    prediction = model.predict(user_data_scaled)
-    probability = model.predict_proba(user_data_scaled)
+    with prediction_stage_seconds.time(stage="predict"), span("predict_proba", rows=len(user_data)):
+        prediction = model.predict(user_data_scaled)
+        probability = model.predict_proba(user_data_scaled)
     
     return prediction, probability
 
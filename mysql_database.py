@@ -1,38 +1,185 @@
 import os
+import time
+import threading
 import mysql.connector
 from mysql.connector import Error
-import bcrypt
+from mysql.connector.errors import PoolError
+from passwords import hash_password, verify_password, needs_rehash
+from storage_common import SUMMARY_FEATURES, TREND_COLUMNS, build_trends
 import json
 import streamlit as st
 from datetime import datetime
 
-# Database connection information - update these values with your MySQL credentials
+# Database connection information, from MYSQL_* environment variables
 DB_CONFIG = {
-    'host': 'localhost',  # Change this to your MySQL host if needed
-    'user': 'root',       # Change this to your MySQL username
-    'password': '',       # Add your MySQL password here
-    'database': 'cardiopredict'
+    'host': os.environ.get("MYSQL_HOST", "localhost"),
+    'port': int(os.environ.get("MYSQL_PORT", "3306")),
+    'user': os.environ.get("MYSQL_USER", "root"),
+    'password': os.environ.get("MYSQL_PASSWORD", ""),
+    'database': os.environ.get("MYSQL_DATABASE", "cardiopredict")
 }
 
+# Connection pool settings
+POOL_SIZE = int(os.environ.get("CARDIOPREDICT_MYSQL_POOL_SIZE", "5"))  # Idle connections kept open
+POOL_MAX_OVERFLOW = int(os.environ.get("CARDIOPREDICT_MYSQL_MAX_OVERFLOW", "10"))  # Extra connections allowed under load
+POOL_TIMEOUT = float(os.environ.get("CARDIOPREDICT_MYSQL_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+POOL_RECYCLE = float(os.environ.get("CARDIOPREDICT_MYSQL_POOL_RECYCLE", "1800"))  # Max connection lifetime in seconds
+
 # Global connection flag
 db_connected = False
-connection = None
 
-# Try to establish connection
-try:
-    connection = mysql.connector.connect(**DB_CONFIG)
-    if connection.is_connected():
+class PooledConnection:
+    """Checked-out pool connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def close(self):
+        """Return the connection to the pool"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, self._created_at)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections.
+
+    Each request checks out its own connection, so Streamlit sessions never
+    share a socket. Idle connections are pinged before reuse and replaced once
+    they are older than `recycle` seconds. Up to `max_overflow` connections
+    beyond `size` are opened under load and closed again when returned.
+    """
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=10.0, recycle=1800.0):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = []  # (connection, created_at), most recently used last
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def checkout(self):
+        """Get a live connection, waiting up to `timeout` seconds if the pool is exhausted"""
+        deadline = time.monotonic() + self.timeout
+        raw = None
+        
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    # Reserve a slot; the connection is opened outside the lock
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"No MySQL connection available after {self.timeout}s "
+                                    f"({self._open} open)")
+                self._cond.wait(remaining)
+        
+        try:
+            if raw is not None and (time.monotonic() - created_at > self.recycle or not self._ping(raw)):
+                self._close_quietly(raw)
+                raw = None
+            if raw is None:
+                raw = mysql.connector.connect(**self.config)
+                created_at = time.monotonic()
+        except Exception:
+            self._forget()
+            raise
+        
+        return PooledConnection(self, raw, created_at)
+
+    def release(self, raw, created_at):
+        """Take a connection back; overflow connections are closed"""
+        try:
+            # Never hand out a connection with a transaction still open
+            raw.rollback()
+        except Exception:
+            self._close_quietly(raw)
+            self._forget()
+            return
+        
+        with self._cond:
+            if len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+                self._cond.notify()
+                return
+        
+        self._close_quietly(raw)
+        self._forget()
+
+    def stats(self):
+        """Current pool occupancy"""
+        with self._cond:
+            return {
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'max': self.size + self.max_overflow
+            }
+
+    def _forget(self):
+        """Free the slot of a connection that was closed or never opened"""
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _ping(raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+pool = ConnectionPool(
+    DB_CONFIG,
+    size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    timeout=POOL_TIMEOUT,
+    recycle=POOL_RECYCLE
+)
+
+def get_connection():
+    """Check out a database connection from the pool; close() returns it"""
+    global db_connected
+    
+    try:
+        conn = pool.checkout()
         db_connected = True
-        print("Connected to MySQL database")
-except Error as e:
-    print(f"Error connecting to MySQL database: {e}")
+        return conn
+    except PoolError as e:
+        # Pool exhausted, the server itself is fine
+        print(f"MySQL connection pool exhausted: {e}")
+        return None
+    except Error as e:
+        print(f"Error connecting to MySQL database: {e}")
+        db_connected = False
+        return None
 
 def create_tables():
     """Create tables if they don't exist"""
-    if not db_connected or not connection:
+    conn = get_connection()
+    if not conn:
         return False
     
-    cursor = connection.cursor()
+    cursor = conn.cursor()
     
     # Create users table
     users_table = """
@@ -63,24 +210,80 @@ def create_tables():
     try:
         cursor.execute(users_table)
         cursor.execute(predictions_table)
-        connection.commit()
-        
-        # Create admin user if it doesn't exist
-        create_admin_user()
-        
-        return True
+        conn.commit()
     except Error as e:
         print(f"Error creating tables: {e}")
         return False
     finally:
         cursor.close()
+        conn.close()
+    
+    return True
+
+def add_admin_column():
+    """Add users.is_admin to a users table created before it existed"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'users' AND column_name = 'is_admin'
+        """)
+        if not cursor.fetchone()[0]:
+            cursor.execute("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE")
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error adding is_admin column: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+# Indexes for newest-first listings and per-user history: name -> columns
+PREDICTION_INDEXES = {
+    'idx_prediction_history_date': "prediction_date",
+    'idx_prediction_history_user': "user_id, prediction_date",
+}
+
+def create_prediction_indexes():
+    """Create the prediction_history indexes on a table created before them"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        # MySQL has no CREATE INDEX IF NOT EXISTS
+        cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'prediction_history'
+        """)
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, columns in PREDICTION_INDEXES.items():
+            if name not in existing:
+                cursor.execute(f"CREATE INDEX {name} ON prediction_history ({columns})")
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error creating indexes: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
 
 def create_admin_user():
     """Create admin user if it doesn't exist"""
-    if not db_connected or not connection:
+    conn = get_connection()
+    if not conn:
         return False
     
-    cursor = connection.cursor()
+    cursor = conn.cursor()
     
     # Check if admin user exists
     check_admin = "SELECT * FROM users WHERE username = 'admin'"
@@ -92,9 +295,7 @@ def create_admin_user():
         if not admin:
             # Create admin user with fixed credentials
             admin_password = "admin123"  # Fixed admin password
-            password_bytes = admin_password.encode('utf-8')
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+            hashed_password = hash_password(admin_password)
             
             insert_admin = """
             INSERT INTO users (username, email, password_hash, is_admin)
@@ -102,7 +303,7 @@ def create_admin_user():
             """
             
             cursor.execute(insert_admin, ('admin', 'admin@cardiopredict.com', hashed_password, True))
-            connection.commit()
+            conn.commit()
             print("Admin user created successfully")
         
         return True
@@ -111,24 +312,84 @@ def create_admin_user():
         return False
     finally:
         cursor.close()
+        conn.close()
 
-def get_connection():
-    """Get database connection"""
-    global connection, db_connected
+# Schema changes in order; a database at version N has had the first N applied.
+# Each one must be safe to re-run on a database that already has its changes.
+MIGRATIONS = [
+    create_tables,  # 1: users and prediction_history
+    add_admin_column,  # 2: users.is_admin
+    create_prediction_indexes,  # 3: prediction_history indexes
+]
+
+def get_schema_version():
+    """
+    Schema version recorded in the database, read with a single query.
+
+    Returns:
+        Number of migrations applied (0 for a database never migrated), or None if unreachable
+    """
+    conn = get_connection()
+    if not conn:
+        return None
     
-    # If connection is lost, try to reconnect
-    if not db_connected or not connection or not connection.is_connected():
-        try:
-            connection = mysql.connector.connect(**DB_CONFIG)
-            if connection.is_connected():
-                db_connected = True
-                return connection
-        except Error as e:
-            print(f"Error reconnecting to MySQL database: {e}")
-            db_connected = False
-            return None
+    cursor = conn.cursor()
     
-    return connection
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+    except Error:
+        # No schema_version table yet
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def migrate():
+    """
+    Apply pending migrations and make sure the admin account exists.
+
+    Idempotent: migrations already recorded in schema_version are skipped.
+
+    Returns:
+        Tuple of (success, message)
+    """
+    version = get_schema_version()
+    if version is None:
+        return False, f"Cannot connect to MySQL at {DB_CONFIG['host']}"
+    if version > len(MIGRATIONS):
+        return False, f"Database schema version {version} is newer than this code ({len(MIGRATIONS)})"
+    
+    conn = get_connection()
+    if not conn:
+        return False, f"Cannot connect to MySQL at {DB_CONFIG['host']}"
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        conn.commit()
+        
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            if not migration():
+                return False, f"Migration {number} ({migration.__name__}) failed"
+            cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (number,))
+            conn.commit()
+    except Error as e:
+        return False, f"Error migrating database: {e}"
+    finally:
+        cursor.close()
+        conn.close()
+    
+    if not create_admin_user():
+        return False, "Error creating admin user"
+    
+    return True, f"Schema at version {len(MIGRATIONS)} ({len(MIGRATIONS) - version} migrations applied)"
 
 def create_user(username, email, password):
     """Create a new user account"""
@@ -151,9 +412,7 @@ def create_user(username, email, password):
             return False, "Username or email already exists"
         
         # Hash password
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+        hashed_password = hash_password(password)
         
         # Create new user
         insert_query = """
@@ -170,45 +429,58 @@ def create_user(username, email, password):
         return False, f"Error creating user: {str(e)}"
     finally:
         cursor.close()
+        conn.close()
 
-def authenticate_user(username, password):
-    """Authenticate a user by username and password"""
+def get_authenticated_user(username, password):
+    """Authenticate a user and return their user record, or None if the login fails"""
     if not db_connected:
         # Demo login for testing
         if username == "demo" and password == "demo":
-            return True, 999, False
+            return {'id': 999, 'username': 'demo', 'email': 'demo@example.com', 'is_admin': False}
         
         # Admin login
         if username == "admin" and password == "admin123":
-            return True, 1, True
+            return {'id': 1, 'username': 'admin', 'email': 'admin@cardiopredict.com', 'is_admin': True}
             
-        return False, None, False
+        return None
     
     conn = get_connection()
     if not conn:
-        return False, None, False
+        return None
     
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Get user by username
-        query = "SELECT id, password_hash, is_admin FROM users WHERE username = %s"
+        # Get the user record and password hash in one query
+        query = "SELECT id, username, email, is_admin, password_hash FROM users WHERE username = %s"
         cursor.execute(query, (username,))
         user = cursor.fetchone()
         
         if user:
-            password_bytes = password.encode('utf-8')
-            hash_bytes = user['password_hash'].encode('utf-8')
-            
-            if bcrypt.checkpw(password_bytes, hash_bytes):
-                return True, user['id'], user['is_admin']
+            stored_hash = user.pop('password_hash')
+            if verify_password(password, stored_hash):
+                # Upgrade hashes made with an older cost factor
+                if needs_rehash(stored_hash):
+                    cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s",
+                                   (hash_password(password), user['id']))
+                    conn.commit()
+                user['is_admin'] = bool(user['is_admin'])
+                return user
         
-        return False, None, False
+        return None
     except Error as e:
         print(f"Authentication error: {e}")
-        return False, None, False
+        return None
     finally:
         cursor.close()
+        conn.close()
+
+def authenticate_user(username, password):
+    """Authenticate a user by username and password"""
+    user = get_authenticated_user(username, password)
+    if user:
+        return True, user['id'], user['is_admin']
+    return False, None, False
 
 def save_prediction(user_id, risk_level, probability, user_data, prescription=None):
     """Save a prediction to the user's history with optional prescription data"""
@@ -245,6 +517,53 @@ def save_prediction(user_id, risk_level, probability, user_data, prescription=No
         return False, None
     finally:
         cursor.close()
+        conn.close()
+
+def save_predictions_batch(records):
+    """Save several predictions in a single transaction
+    
+    Each record is a dict with the save_prediction arguments:
+    user_id, risk_level, probability, user_data and optionally prescription.
+    """
+    # Demo predictions are never stored
+    records = [r for r in records if r['user_id'] != 999]
+    if not db_connected or not records:
+        return True, 0
+    
+    conn = get_connection()
+    if not conn:
+        return False, 0
+    
+    cursor = conn.cursor()
+    
+    try:
+        rows = [
+            (
+                r['user_id'],
+                r['risk_level'],
+                float(r['probability']),
+                json.dumps(r['user_data']),
+                json.dumps(r['prescription']) if r.get('prescription') else None
+            )
+            for r in records
+        ]
+        
+        insert_query = """
+        INSERT INTO prediction_history (user_id, risk_level, probability, user_data, prescription)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        
+        cursor.executemany(insert_query, rows)
+        conn.commit()
+        
+        return True, len(rows)
+    except Error as e:
+        conn.rollback()
+        print(f"Error saving predictions: {e}")
+        return False, 0
+    finally:
+        cursor.close()
+        conn.close()
 
 def get_user_predictions(user_id, limit=10):
     """Get a user's prediction history including prescription data"""
@@ -292,6 +611,132 @@ def get_user_predictions(user_id, limit=10):
         return []
     finally:
         cursor.close()
+        conn.close()
+
+def get_user_trends(user_id, window=5, limit=500):
+    """
+    Risk trend for one user, computed with window functions in the database.
+    
+    Every prediction gets the average risk probability over it and the
+    `window - 1` before it, and the change in cholesterol, blood pressure and
+    max heart rate since the previous prediction. Only the latest `limit`
+    points and the first prediction are returned, however long the history is.
+    
+    Returns:
+        Dictionary with the prediction 'total', 'first' and 'latest' snapshots
+        and the recent 'points' in chronological order
+    """
+    if not db_connected or user_id == 999:
+        return build_trends([], limit)
+    
+    conn = get_connection()
+    if not conn:
+        return build_trends([], limit)
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Window frame sizes cannot be query parameters. Each window is written out
+        # because MariaDB has no named WINDOW clause.
+        query = """
+        WITH history AS (
+            SELECT id, prediction_date, risk_level,
+                   CASE WHEN risk_level = 'High' THEN probability ELSE 1 - probability END AS risk_probability,
+                   CAST(JSON_UNQUOTE(JSON_EXTRACT(user_data, '$.age')) AS DOUBLE) AS age,
+                   CAST(JSON_UNQUOTE(JSON_EXTRACT(user_data, '$.chol')) AS DOUBLE) AS chol,
+                   CAST(JSON_UNQUOTE(JSON_EXTRACT(user_data, '$.trestbps')) AS DOUBLE) AS trestbps,
+                   CAST(JSON_UNQUOTE(JSON_EXTRACT(user_data, '$.thalach')) AS DOUBLE) AS thalach
+            FROM prediction_history
+            WHERE user_id = %s
+        ),
+        trends AS (
+            SELECT history.*,
+                   AVG(risk_probability) OVER (ORDER BY prediction_date, id
+                                               ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW) AS rolling_risk,
+                   chol - LAG(chol) OVER (ORDER BY prediction_date, id) AS chol_delta,
+                   trestbps - LAG(trestbps) OVER (ORDER BY prediction_date, id) AS trestbps_delta,
+                   thalach - LAG(thalach) OVER (ORDER BY prediction_date, id) AS thalach_delta,
+                   ROW_NUMBER() OVER (ORDER BY prediction_date, id) AS position,
+                   ROW_NUMBER() OVER (ORDER BY prediction_date DESC, id DESC) AS recency
+            FROM history
+        )
+        SELECT id, prediction_date, risk_level, risk_probability, age, chol, trestbps, thalach,
+               rolling_risk, chol_delta, trestbps_delta, thalach_delta, position, recency
+        FROM trends
+        WHERE recency <= %s OR position = 1
+        ORDER BY position
+        """.format(preceding=max(int(window), 1) - 1)
+        cursor.execute(query, (user_id, limit))
+        
+        rows = [dict(zip(TREND_COLUMNS, row)) for row in cursor.fetchall()]
+        return build_trends(rows, limit)
+    except Error as e:
+        print(f"Error getting user trends: {e}")
+        return build_trends([], limit)
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_user_history(user_id, limit=20, offset=0):
+    """
+    One page of a user's prediction history for the profile list, newest first.
+    
+    Only the list columns are read: the prescription is left in the database and
+    user_data is cut down to SUMMARY_FEATURES. Open a single prediction with
+    get_prediction_by_id for everything else.
+    
+    Returns:
+        Dictionary with the user's 'total', 'high' and 'low' prediction counts and
+        a 'predictions' list of summary dicts
+    """
+    history = {'total': 0, 'high': 0, 'low': 0, 'predictions': []}
+    
+    if not db_connected or user_id == 999:  # 999 is demo user ID
+        return history
+    
+    conn = get_connection()
+    if not conn:
+        return history
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN risk_level = 'High' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN risk_level = 'Low' THEN 1 ELSE 0 END), 0)
+        FROM prediction_history
+        WHERE user_id = %s
+        """, (user_id,))
+        # MySQL returns SUM() as Decimal
+        history['total'], history['high'], history['low'] = (int(value) for value in cursor.fetchone())
+        
+        cursor.execute("""
+        SELECT id, prediction_date, risk_level, probability, user_data, prescription IS NOT NULL
+        FROM prediction_history
+        WHERE user_id = %s
+        ORDER BY prediction_date DESC, id DESC
+        LIMIT %s OFFSET %s
+        """, (user_id, limit, offset))
+        
+        for p_id, p_date, p_risk, p_prob, p_data, has_prescription in cursor.fetchall():
+            user_data = json.loads(p_data) if p_data else {}
+            history['predictions'].append({
+                'id': p_id,
+                'date': p_date,
+                'risk_level': p_risk,
+                'probability': p_prob,
+                'user_data': {key: user_data[key] for key in SUMMARY_FEATURES if key in user_data},
+                'has_prescription': bool(has_prescription)
+            })
+        
+        return history
+    except Error as e:
+        print(f"Error getting user history: {e}")
+        return history
+    finally:
+        cursor.close()
+        conn.close()
 
 def get_user_by_id(user_id):
     """Get user by ID"""
@@ -315,12 +760,44 @@ def get_user_by_id(user_id):
         cursor.execute(query, (user_id,))
         user = cursor.fetchone()
         
+        if user:
+            user['is_admin'] = bool(user['is_admin'])
         return user
     except Error as e:
         print(f"Error getting user: {e}")
         return None
     finally:
         cursor.close()
+        conn.close()
+
+def get_users_by_ids(user_ids):
+    """Get several users in one query, returned as a dict keyed by user ID"""
+    user_ids = list(set(user_ids))
+    if not db_connected or not user_ids:
+        return {}
+    
+    conn = get_connection()
+    if not conn:
+        return {}
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        placeholders = ", ".join("%s" for _ in user_ids)
+        query = f"SELECT id, username, email, is_admin FROM users WHERE id IN ({placeholders})"
+        cursor.execute(query, user_ids)
+        
+        result = {}
+        for user in cursor.fetchall():
+            user['is_admin'] = bool(user['is_admin'])
+            result[user['id']] = user
+        return result
+    except Error as e:
+        print(f"Error getting users: {e}")
+        return {}
+    finally:
+        cursor.close()
+        conn.close()
 
 def get_prediction_by_id(prediction_id):
     """Get a single prediction by ID"""
@@ -345,6 +822,7 @@ def get_prediction_by_id(prediction_id):
             
             prediction_data = {
                 'id': prediction['id'],
+                'user_id': prediction['user_id'],
                 'date': prediction['prediction_date'],
                 'risk_level': prediction['risk_level'],
                 'probability': prediction['probability'],
@@ -360,6 +838,7 @@ def get_prediction_by_id(prediction_id):
         return None
     finally:
         cursor.close()
+        conn.close()
 
 def get_all_users():
     """Get all users (for admin panel)"""
@@ -382,12 +861,15 @@ def get_all_users():
         cursor.execute(query)
         users = cursor.fetchall()
         
+        for user in users:
+            user['is_admin'] = bool(user['is_admin'])
         return users
     except Error as e:
         print(f"Error getting all users: {e}")
         return []
     finally:
         cursor.close()
+        conn.close()
 
 def get_all_predictions():
     """Get all predictions (for admin panel)"""
@@ -435,37 +917,305 @@ def get_all_predictions():
         return []
     finally:
         cursor.close()
+        conn.close()
+
+def prediction_filters(search=None, risk_level=None):
+    """
+    WHERE clause and parameters for the admin prediction filters.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    """
+    conditions = []
+    params = []
+    
+    if risk_level:
+        conditions.append("p.risk_level = %s")
+        params.append(risk_level)
+    
+    search = (search or "").strip()
+    if search:
+        # Escape LIKE wildcards (backslash is MySQL's default escape) so the text matches literally
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        if search.isdigit():
+            conditions.append("(u.username LIKE %s OR p.id = %s)")
+            params.extend([pattern, int(search)])
+        else:
+            conditions.append("u.username LIKE %s")
+            params.append(pattern)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def search_predictions(search=None, risk_level=None, limit=50, offset=0):
+    """
+    Find predictions for the admin view one page at a time.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    
+    Returns:
+        Tuple of (page of prediction summary dicts, total number of matches)
+    """
+    if not db_connected:
+        return [], 0
+    
+    conn = get_connection()
+    if not conn:
+        return [], 0
+    
+    cursor = conn.cursor()
+    
+    try:
+        where, params = prediction_filters(search, risk_level)
+        
+        count_query = f"""
+        SELECT COUNT(*)
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        """
+        cursor.execute(count_query, params)
+        total = cursor.fetchone()[0]
+        
+        page_query = f"""
+        SELECT p.id, p.user_id, u.username, p.prediction_date, p.risk_level, p.probability
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        ORDER BY p.prediction_date DESC, p.id DESC
+        LIMIT %s OFFSET %s
+        """
+        cursor.execute(page_query, params + [limit, offset])
+        
+        result = []
+        for p in cursor.fetchall():
+            result.append({
+                'id': p[0],
+                'user_id': p[1],
+                'username': p[2],
+                'prediction_date': p[3],
+                'risk_level': p[4],
+                'probability': p[5]
+            })
+        
+        return result, total
+    except Error as e:
+        print(f"Error searching predictions: {e}")
+        return [], 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def iter_predictions(search=None, risk_level=None, chunk_size=1000):
+    """
+    Stream predictions matching the admin filters, oldest first, for exports.
+    
+    The cursor is unbuffered, so rows come from the server `chunk_size` at a time
+    and memory use does not depend on how many predictions match.
+    
+    Yields:
+        Lists of prediction dicts with username and decoded user_data
+    """
+    if not db_connected:
+        return
+    
+    conn = get_connection()
+    if not conn:
+        return
+    
+    cursor = conn.cursor(buffered=False)
+    
+    try:
+        where, params = prediction_filters(search, risk_level)
+        cursor.execute(f"""
+        SELECT p.id, p.user_id, u.username, p.prediction_date, p.risk_level, p.probability, p.user_data
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        ORDER BY p.id
+        """, params)
+        
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [
+                {
+                    'id': p[0],
+                    'user_id': p[1],
+                    'username': p[2],
+                    'prediction_date': p[3],
+                    'risk_level': p[4],
+                    'probability': p[5],
+                    'user_data': json.loads(p[6]) if p[6] else {}
+                }
+                for p in rows
+            ]
+    finally:
+        cursor.close()
+        conn.close()
+
+# SQL expression for the start of each analytics bucket
+PERIOD_BUCKETS = {
+    'hour': "DATE_ADD(DATE(p.prediction_date), INTERVAL HOUR(p.prediction_date) HOUR)",
+    'day': "DATE(p.prediction_date)",
+    'week': "DATE_SUB(DATE(p.prediction_date), INTERVAL WEEKDAY(p.prediction_date) DAY)",  # Monday of the week
+    'month': "DATE_SUB(DATE(p.prediction_date), INTERVAL DAYOFMONTH(p.prediction_date) - 1 DAY)"
+}
+
+def get_prediction_date_range():
+    """First and last prediction dates, or (None, None) when there are none"""
+    if not db_connected:
+        return None, None
+    
+    conn = get_connection()
+    if not conn:
+        return None, None
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Both ends come from the prediction_date index
+        cursor.execute("SELECT MIN(prediction_date), MAX(prediction_date) FROM prediction_history")
+        return cursor.fetchone()
+    except Error as e:
+        print(f"Error getting prediction date range: {e}")
+        return None, None
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_prediction_analytics(since=None, bucket='day', top_users=20):
+    """
+    Aggregate prediction counts for the admin analytics, grouped in the database.
+    
+    Args:
+        since: Only count predictions made at or after this datetime (None for all)
+        bucket: Timeline bucket size, one of PERIOD_BUCKETS, or None to skip the timeline
+        top_users: Number of most active users to break down; 0 skips the breakdown
+    
+    Returns:
+        Dictionary with overall counts, a timeline of (period, risk_level, count)
+        rows and per-user High/Low counts
+    """
+    analytics = {'total': 0, 'high': 0, 'low': 0, 'unique_users': 0, 'timeline': [], 'by_user': []}
+    
+    if bucket is not None and bucket not in PERIOD_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Choose one of: {', '.join(PERIOD_BUCKETS)}")
+    
+    if not db_connected:
+        return analytics
+    
+    conn = get_connection()
+    if not conn:
+        return analytics
+    
+    cursor = conn.cursor()
+    
+    try:
+        where = ""
+        params = []
+        if since is not None:
+            where = "WHERE p.prediction_date >= %s"
+            params.append(since)
+        
+        cursor.execute(f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN p.risk_level = 'High' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN p.risk_level = 'Low' THEN 1 ELSE 0 END), 0),
+               COUNT(DISTINCT p.user_id)
+        FROM prediction_history p
+        {where}
+        """, params)
+        # MySQL returns SUM() as Decimal
+        analytics['total'], analytics['high'], analytics['low'], analytics['unique_users'] = (
+            int(value) for value in cursor.fetchone()
+        )
+        
+        if bucket is not None:
+            period = PERIOD_BUCKETS[bucket]
+            period_format = '%Y-%m-%d %H:00' if bucket == 'hour' else '%Y-%m-%d'
+            cursor.execute(f"""
+            SELECT {period} AS period, p.risk_level, COUNT(*)
+            FROM prediction_history p
+            {where}
+            GROUP BY period, p.risk_level
+            ORDER BY period
+            """, params)
+            analytics['timeline'] = [
+                {'period': row[0].strftime(period_format), 'risk_level': row[1], 'count': row[2]}
+                for row in cursor.fetchall()
+            ]
+        
+        if top_users > 0:
+            cursor.execute(f"""
+            SELECT p.user_id, u.username,
+                   SUM(CASE WHEN p.risk_level = 'High' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN p.risk_level = 'Low' THEN 1 ELSE 0 END),
+                   COUNT(*) AS total
+            FROM prediction_history p
+            JOIN users u ON p.user_id = u.id
+            {where}
+            GROUP BY p.user_id, u.username
+            ORDER BY total DESC, u.username
+            LIMIT %s
+            """, params + [top_users])
+            analytics['by_user'] = [
+                {'user_id': row[0], 'username': row[1], 'high': int(row[2]), 'low': int(row[3]), 'total': row[4]}
+                for row in cursor.fetchall()
+            ]
+        
+        return analytics
+    except Error as e:
+        print(f"Error getting prediction analytics: {e}")
+        return analytics
+    finally:
+        cursor.close()
+        conn.close()
 
 def get_prediction_details(prediction_id):
     """Get detailed prediction data for admin view"""
-    prediction = get_prediction_by_id(prediction_id)
+    if not db_connected:
+        return None
+    
+    conn = get_connection()
+    if not conn:
+        return None
     
-    if prediction:
-        # Get the user who made this prediction
-        conn = get_connection()
-        if not conn:
-            return prediction
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        # Prediction and the user who made it in a single query, on one pooled connection
+        query = """
+        SELECT p.id, p.user_id, p.prediction_date, p.risk_level, p.probability,
+               p.user_data, p.prescription, u.username, u.email
+        FROM prediction_history p
+        LEFT JOIN users u ON p.user_id = u.id
+        WHERE p.id = %s
+        """
+        cursor.execute(query, (prediction_id,))
+        row = cursor.fetchone()
         
-        cursor = conn.cursor(dictionary=True)
+        if not row:
+            return None
         
-        try:
-            query = "SELECT username, email FROM users WHERE id = (SELECT user_id FROM prediction_history WHERE id = %s)"
-            cursor.execute(query, (prediction_id,))
-            user = cursor.fetchone()
-            
-            if user:
-                prediction['username'] = user['username']
-                prediction['email'] = user['email']
-            
-            return prediction
-        except Error as e:
-            print(f"Error getting prediction details: {e}")
-            return prediction
-        finally:
-            cursor.close()
-    
-    return None
-
-# Create tables when module is imported
-if db_connected:
-    create_tables()
\ No newline at end of file
+        prediction = {
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'date': row['prediction_date'],
+            'risk_level': row['risk_level'],
+            'probability': row['probability'],
+            'user_data': json.loads(row['user_data']) if row['user_data'] else {},
+            'prescription': json.loads(row['prescription']) if row['prescription'] else None
+        }
+        
+        if row['username'] is not None:
+            prediction['username'] = row['username']
+            prediction['email'] = row['email']
+        
+        return prediction
+    except Error as e:
+        print(f"Error getting prediction details: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
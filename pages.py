@@ -1,11 +1,62 @@
 import streamlit as st
 from streamlit_extras.colored_header import colored_header
-import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 from model import load_model
-from data_processor import load_data
+from data_processor import load_dataset_stats
 import json
+import threading
+from fragments import page_fragment
 
+# Home page figures as Plotly JSON, built once per statistics object and shared by all sessions
+_home_figures = {'stats': None, 'figures': None}
+_home_figures_lock = threading.Lock()
+
+def get_home_figures(stats):
+    """
+    Home page charts from precomputed statistics, as Plotly figure dicts.
+
+    Every call gets its own copy, decoded from the shared JSON, so no session
+    changes a figure another session is rendering.
+    """
+    with _home_figures_lock:
+        if _home_figures['stats'] is not stats:
+            _home_figures['figures'] = tuple(fig.to_json() for fig in build_home_figures(stats))
+            _home_figures['stats'] = stats
+        figures = _home_figures['figures']
+    return tuple(json.loads(figure) for figure in figures)
+
+def build_home_figures(stats):
+    """Build the home page charts as Plotly figures"""
+    target_names = {'0': "No Heart Disease", '1': "Heart Disease"}
+    target_colors = {'0': "green", '1': "red"}
+    
+    age_fig = go.Figure([
+        go.Bar(x=stats['age_groups'], y=stats['age_group_target'][t], name=target_names[t], marker_color=target_colors[t])
+        for t in ('0', '1')
+    ])
+    age_fig.update_layout(
+        title="Heart Disease by Age Group",
+        barmode="group",
+        xaxis_title="Age Group",
+        yaxis_title="Number of Patients",
+        legend_title="Heart Disease"
+    )
+    
+    sex_fig = go.Figure([
+        go.Bar(x=stats['sexes'], y=stats['sex_target'][t], name=target_names[t], marker_color=target_colors[t])
+        for t in ('0', '1')
+    ])
+    sex_fig.update_layout(
+        title="Heart Disease by Gender",
+        barmode="group",
+        xaxis_title="Gender",
+        yaxis_title="Number of Patients",
+        legend_title="Heart Disease"
+    )
+    
+    return age_fig, sex_fig
+
+@page_fragment
 def render_home_page():
     """Render the home page with app introduction and key features"""
     # Create hero section with professional styling
@@ -98,7 +149,9 @@ def render_home_page():
     
     # Add some statistics or visualizations
     try:
-        df = load_data()
+        # Precomputed once per dataset version; no pandas work on a normal render
+        stats = load_dataset_stats()
+        age_fig, sex_fig = get_home_figures(stats)
         
         # Show some statistics about heart disease
         colored_header(
@@ -110,26 +163,13 @@ def render_home_page():
         col1, col2 = st.columns(2)
         
         with col1:
-            # Create age groups
-            df['age_group'] = pd.cut(df['age'], bins=[0, 40, 50, 60, 100], labels=['<40', '40-50', '50-60', '>60'])
-            
             # Plot heart disease by age group
-            fig = px.histogram(
-                df, 
-                x="age_group", 
-                color="target",
-                barmode="group",
-                labels={"target": "Heart Disease", "age_group": "Age Group"},
-                category_orders={"target": ["No Heart Disease", "Heart Disease"]},
-                color_discrete_map={0: "green", 1: "red"}
-            )
-            fig.update_layout(title="Heart Disease by Age Group")
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(age_fig, use_container_width=True)
         
         with col2:
-            # Calculate some key statistics
-            total_patients = len(df)
-            heart_disease_count = df['target'].sum()
+            # Key statistics
+            total_patients = stats['total_patients']
+            heart_disease_count = stats['heart_disease_count']
             heart_disease_percent = round((heart_disease_count / total_patients) * 100, 1)
             
             # Display statistics
@@ -137,20 +177,7 @@ def render_home_page():
             st.metric("Heart Disease Cases", f"{heart_disease_count} ({heart_disease_percent}%)")
             
             # Gender distribution with heart disease
-            gender_heart = df.groupby(['sex', 'target']).size().reset_index(name='count')
-            gender_heart['sex'] = gender_heart['sex'].replace({'Male': 'Male', 'Female': 'Female'})
-            
-            fig = px.bar(
-                gender_heart,
-                x="sex",
-                y="count",
-                color="target",
-                barmode="group",
-                labels={'count': 'Number of Patients', 'sex': 'Gender', 'target': 'Heart Disease'},
-                color_discrete_map={0: "green", 1: "red"}
-            )
-            fig.update_layout(title="Heart Disease by Gender")
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(sex_fig, use_container_width=True)
     
     except Exception as e:
         st.info("Statistical visualizations could not be loaded. Please try again later.")
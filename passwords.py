@@ -0,0 +1,127 @@
+"""
+Password hashing for CardioPredict.
+
+bcrypt work is CPU-heavy, so it runs in a small process pool instead of on the
+Streamlit script thread. The pool has a bounded number of pending jobs and a
+timeout; when it is full, callers get PasswordWorkBusy straight away.
+
+This module imports nothing from the app except metrics, which needs only the
+standard library, so pool workers start fast.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from metrics import LatencyHistogram
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.environ.get("CARDIOPREDICT_BCRYPT_ROUNDS", "12"))
+
+# Worker processes for hashing; 0 hashes inline on the calling thread
+HASH_WORKERS = int(os.environ.get("CARDIOPREDICT_HASH_WORKERS", "2"))
+
+# Jobs allowed to wait or run at once before new ones are rejected
+HASH_MAX_PENDING = int(os.environ.get("CARDIOPREDICT_HASH_MAX_PENDING", "16"))
+
+# Seconds to wait for a hash before giving up
+HASH_TIMEOUT = float(os.environ.get("CARDIOPREDICT_HASH_TIMEOUT", "5"))
+
+class PasswordWorkBusy(Exception):
+    """Raised when the hashing pool is full or a hash takes too long"""
+
+# Time spent per operation, including any wait for a free worker
+hash_latency = LatencyHistogram()
+verify_latency = LatencyHistogram()
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _checkpw(password, stored_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+
+def _get_executor():
+    """Start the worker pool on first use"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # spawn avoids forking a process that is running Streamlit's threads
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def _run(func, *args):
+    """Run a hashing function in the pool, bounded by HASH_MAX_PENDING and HASH_TIMEOUT"""
+    if HASH_WORKERS <= 0:
+        return func(*args)
+
+    if not _pending.acquire(blocking=False):
+        raise PasswordWorkBusy("Too many sign-ins in progress. Please try again in a moment.")
+
+    try:
+        future = _get_executor().submit(func, *args)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and finish this job inline
+        _pending.release()
+        shutdown()
+        return func(*args)
+    except BaseException:
+        _pending.release()
+        raise
+    # The job keeps its slot until it finishes or is cancelled, even after the
+    # caller gives up waiting, so slow hashes cannot pile up past HASH_MAX_PENDING
+    future.add_done_callback(lambda _: _pending.release())
+
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeout:
+        # Only a job still queued can be cancelled; a running one finishes in the background
+        future.cancel()
+        raise PasswordWorkBusy("Sign-in is taking too long. Please try again in a moment.")
+    except BrokenProcessPool:
+        # A worker died while running it; the done callback has freed its slot
+        shutdown()
+        return func(*args)
+
+def hash_password(password, rounds=None):
+    """Hash a password with the configured bcrypt cost"""
+    start = time.perf_counter()
+    try:
+        return _run(_hashpw, password, rounds or BCRYPT_ROUNDS)
+    finally:
+        hash_latency.observe(time.perf_counter() - start)
+
+def verify_password(password, stored_hash):
+    """Check a password against a stored bcrypt hash"""
+    start = time.perf_counter()
+    try:
+        return _run(_checkpw, password, stored_hash)
+    finally:
+        verify_latency.observe(time.perf_counter() - start)
+
+def needs_rehash(stored_hash):
+    """True if a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    try:
+        return int(stored_hash.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def shutdown():
+    """Stop the worker pool"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,291 @@
+"""
+Heart disease prediction page for CardioPredict.
+"""
+
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from batching import predict_heart_disease_batched
+from admission import StageBusy
+from storage import save_prediction
+from session_state import is_authenticated, get_current_user_id
+from doctor_advice import get_personalized_doctor_prescription, display_health_recommendations_detailed
+from layout import render_prediction_result, render_health_recommendation
+from assets import use_stylesheets
+from fragments import page_fragment
+from tracing import trace, span
+from profiling import mark_run
+
+@page_fragment
+def render_prediction_page():
+    """Render the prediction form and, once submitted, the result and recommendations"""
+    # Check if user is authenticated, if not, show option to continue as guest or sign in
+    if not is_authenticated():
+        st.warning("⚠️ You are not logged in. Your prediction data will not be saved.")
+        st.info("Create an account or log in to track your heart health over time.")
+        
+        auth_col1, auth_col2, auth_col3 = st.columns([2, 3, 2])
+        with auth_col2:
+            if st.button("Continue as Guest", use_container_width=True):
+                pass  # Continue to prediction content
+    
+    # Prediction content
+    st.title("Heart Disease Prediction Tool")
+    st.markdown("### Enter your health information below for a personalized risk assessment")
+    
+    # Inputs are collected in a form, so editing them does not rerun the script;
+    # the values are sent together when the prediction is requested
+    with st.form("prediction_form", border=False):
+        # Create two columns for input form
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age = st.number_input("Age", min_value=1, max_value=120, value=45)
+            gender = st.selectbox("Gender", ["Male", "Female"])
+            gender_encoded = 1 if gender == "Male" else 0
+        
+            chest_pain_type = st.selectbox(
+                "Chest Pain Type",
+                [
+                    "Typical Angina",
+                    "Atypical Angina",
+                    "Non-anginal Pain",
+                    "Asymptomatic"
+                ]
+            )
+            # Encode chest pain type (0-3)
+            cp_dict = {
+                "Typical Angina": 0,
+                "Atypical Angina": 1,
+                "Non-anginal Pain": 2,
+                "Asymptomatic": 3
+            }
+            cp_encoded = cp_dict[chest_pain_type]
+        
+            resting_bp = st.number_input("Resting Blood Pressure (mm Hg)", min_value=80, max_value=200, value=120)
+            cholesterol = st.number_input("Serum Cholesterol (mg/dl)", min_value=100, max_value=600, value=200)
+        
+        with col2:
+            fasting_bs = st.selectbox("Fasting Blood Sugar > 120 mg/dl", ["No", "Yes"])
+            fbs_encoded = 1 if fasting_bs == "Yes" else 0
+        
+            rest_ecg = st.selectbox(
+                "Resting ECG Results",
+                [
+                    "Normal",
+                    "ST-T Wave Abnormality",
+                    "Left Ventricular Hypertrophy"
+                ]
+            )
+            # Encode resting ECG (0-2)
+            ecg_dict = {
+                "Normal": 0,
+                "ST-T Wave Abnormality": 1,
+                "Left Ventricular Hypertrophy": 2
+            }
+            rest_ecg_encoded = ecg_dict[rest_ecg]
+        
+            max_hr = st.number_input("Maximum Heart Rate Achieved", min_value=60, max_value=220, value=150)
+        
+            exercise_angina = st.selectbox("Exercise Induced Angina", ["No", "Yes"])
+            exang_encoded = 1 if exercise_angina == "Yes" else 0
+        
+            st_depression = st.number_input("ST Depression Induced by Exercise", min_value=0.0, max_value=10.0, value=0.0)
+        
+            st_slope = st.selectbox(
+                "Slope of Peak Exercise ST Segment",
+                ["Upsloping", "Flat", "Downsloping"]
+            )
+            # Encode ST slope (0-2)
+            slope_dict = {
+                "Upsloping": 0,
+                "Flat": 1,
+                "Downsloping": 2
+            }
+            st_slope_encoded = slope_dict[st_slope]
+        
+        # Create custom styled prediction button
+        use_stylesheets("css/prediction.css")
+        
+        submitted = st.form_submit_button("Predict Heart Disease Risk", use_container_width=True)
+    
+    # Collect user input into a dictionary
+    user_data = {
+        'age': age,
+        'sex': gender_encoded,
+        'cp': cp_encoded,
+        'trestbps': resting_bp,
+        'chol': cholesterol,
+        'fbs': fbs_encoded,
+        'restecg': rest_ecg_encoded,
+        'thalach': max_hr,
+        'exang': exang_encoded,
+        'oldpeak': st_depression,
+        'slope': st_slope_encoded
+    }
+    
+    # Convert dictionary to DataFrame for prediction
+    user_df = pd.DataFrame([user_data])
+    
+    if submitted:
+        mark_run("prediction")
+        # Sampled traces of the handler go to the trace file; see tracing.py
+        with trace("prediction", authenticated=is_authenticated()), st.spinner("Analyzing your data..."):
+            # Scored together with any other sessions predicting at the same moment
+            try:
+                with span("inference"):
+                    prediction, probability = predict_heart_disease_batched(user_df)
+            except StageBusy as e:
+                st.warning(str(e))
+                return
+            
+            # Display styled prediction result
+            st.subheader("Prediction Result")
+            
+            if prediction[0] == 1:
+                risk_level = "High"
+                risk_prob = probability[0][1]
+                
+                # Use custom styled result display
+                st.markdown(render_prediction_result(risk_level, risk_prob), unsafe_allow_html=True)
+                
+                # Add styled risk explanation card
+                st.markdown("""
+                <div class="card" style="border-left: 4px solid #e74c3c; margin-top: 20px;">
+                    <h3 class="card-title">Risk Explanation</h3>
+                    <p>Your health metrics indicate an elevated risk of heart disease. This assessment is based on 
+                    multiple factors including your age, gender, blood pressure, cholesterol levels, and other clinical indicators.</p>
+                    <p>Please consider discussing these results with your healthcare provider for a comprehensive evaluation.</p>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                risk_level = "Low"
+                risk_prob = probability[0][0]
+                
+                # Use custom styled result display
+                st.markdown(render_prediction_result(risk_level, risk_prob), unsafe_allow_html=True)
+                
+                # Add styled risk explanation card
+                st.markdown("""
+                <div class="card" style="border-left: 4px solid #2ecc71; margin-top: 20px;">
+                    <h3 class="card-title">Risk Explanation</h3>
+                    <p>Your health metrics indicate a lower risk of heart disease. This is a positive sign, but maintaining 
+                    heart-healthy habits is still important for long-term cardiovascular health.</p>
+                    <p>Regular check-ups and a healthy lifestyle will help maintain your heart health.</p>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            # Create enhanced visualization of prediction probability
+            st.markdown("<div class='custom-chart'>", unsafe_allow_html=True)
+            with span("plotly_figure"):
+                fig = go.Figure()
+            
+                fig.add_trace(go.Bar(
+                    x=["Heart Disease Risk", "Normal Heart"],
+                    y=[probability[0][1], probability[0][0]],
+                    marker_color=["#e74c3c", "#2ecc71"],
+                    text=[f"{probability[0][1]:.2%}", f"{probability[0][0]:.2%}"],
+                    textposition="auto"
+                ))
+            
+                fig.update_layout(
+                    title={
+                        'text': "Prediction Probability",
+                        'font': {'size': 22, 'color': '#325C6A'}
+                    },
+                    xaxis={'title': 'Outcome'},
+                    yaxis={'title': 'Probability', 'range': [0, 1]},
+                    plot_bgcolor='rgba(245, 249, 250, 0.8)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=20, r=20, t=40, b=20),
+                    height=350
+                )
+            
+                st.plotly_chart(fig, use_container_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # Generate prescription or recommendations based on risk level
+            st.markdown("<h3 style='color: #325C6A; margin-top: 30px;'>Personalized Health Recommendations</h3>", unsafe_allow_html=True)
+            
+            if risk_level == "High":
+                # Generate doctor's prescription for high risk
+                with span("prescription"):
+                    prescription_data = get_personalized_doctor_prescription(user_df, risk_level)
+                
+                # Display in styled recommendation cards
+                st.markdown("""
+                <div class="card" style="border-left: 4px solid #e74c3c;">
+                    <h3 class="card-title"><i class="fas fa-user-md"></i> Medical Consultation Advised</h3>
+                    <p>Based on your risk factors, we recommend consulting with a healthcare provider for a more thorough evaluation.</p>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                # Generate detailed health recommendations for low risk
+                with span("prescription"):
+                    prescription_data = display_health_recommendations_detailed(user_df, risk_level)
+                
+                # Display in styled recommendation cards
+                st.markdown("""
+                <div class="card" style="border-left: 4px solid #2ecc71;">
+                    <h3 class="card-title"><i class="fas fa-heart"></i> Continue Healthy Habits</h3>
+                    <p>Your current metrics show good heart health. Continue maintaining healthy lifestyle choices to preserve your cardiovascular health.</p>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            # Show specific health recommendations
+            st.markdown("<div style='margin-top: 20px;'>", unsafe_allow_html=True)
+            
+            rec_col1, rec_col2 = st.columns(2)
+            
+            with rec_col1:
+                st.markdown(render_health_recommendation(
+                    "Diet Recommendations", 
+                    "Focus on a heart-healthy diet rich in fruits, vegetables, whole grains, and lean proteins. Limit saturated fats, trans fats, sodium, and added sugars.",
+                    "fa-utensils"
+                ), unsafe_allow_html=True)
+                
+                st.markdown(render_health_recommendation(
+                    "Exercise Guidance", 
+                    "Aim for at least 150 minutes of moderate-intensity aerobic activity or 75 minutes of vigorous activity each week, plus muscle-strengthening activities twice a week.",
+                    "fa-dumbbell"
+                ), unsafe_allow_html=True)
+            
+            with rec_col2:
+                st.markdown(render_health_recommendation(
+                    "Stress Management", 
+                    "Practice stress reduction techniques such as mindfulness, meditation, deep breathing, or yoga to help manage stress levels.",
+                    "fa-brain"
+                ), unsafe_allow_html=True)
+                
+                st.markdown(render_health_recommendation(
+                    "Regular Check-ups", 
+                    "Schedule regular check-ups with your healthcare provider to monitor your blood pressure, cholesterol, and overall heart health.",
+                    "fa-calendar-check"
+                ), unsafe_allow_html=True)
+            
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # Add account creation prompt with custom styling
+            if is_authenticated():
+                user_id = get_current_user_id()
+                try:
+                    success, prediction_id = save_prediction(user_id, risk_level, risk_prob, user_data, prescription_data)
+                except StageBusy as e:
+                    st.warning(str(e))
+                    return
+                if success:
+                    st.markdown("""
+                    <div style="background-color: rgba(46, 204, 113, 0.1); padding: 15px; border-radius: 5px; border-left: 4px solid #2ecc71; margin-top: 20px;">
+                        <p style="margin: 0;"><i class="fas fa-check-circle" style="color: #2ecc71;"></i> This prediction and prescription have been saved to your profile.</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.warning("Could not save prediction to your profile.")
+            else:
+                st.markdown("""
+                <div style="background-color: rgba(52, 152, 219, 0.1); padding: 20px; border-radius: 5px; border-left: 4px solid #3498db; margin-top: 20px;">
+                    <h4 style="color: #3498db; margin-top: 0;"><i class="fas fa-user-plus"></i> Track Your Heart Health Journey</h4>
+                    <p>Create an account to save your prediction history, track changes in your health metrics over time, and receive personalized recommendations.</p>
+                    <p>Having a complete history helps you and your healthcare provider monitor your cardiovascular health progress.</p>
+                </div>
+                """, unsafe_allow_html=True)
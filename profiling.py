@@ -0,0 +1,297 @@
+"""
+On-demand profiling of live CardioPredict script runs.
+
+An administrator arms a capture from the admin panel. The next N script runs
+are then profiled, from any session in this server process. The target can
+instead be the next N runs that made a prediction. Each run is recorded in two
+ways:
+
+- cProfile, for the script thread, saved as a .pstats file
+  (python -m pstats, snakeviz)
+- a sampler thread that reads the script thread's stack every
+  PROFILE_SAMPLE_INTERVAL seconds, saved as a .collapsed file of folded stacks
+  (flamegraph.pl, speedscope)
+
+When the capture finishes, summary.txt is written next to those files. It
+holds the slowest functions and hottest stacks over all the runs.
+
+app.py calls begin_run("script") and end_run() around each full run. Pages call
+them through page_fragment, so fragment-only reruns are profiled too.
+"""
+
+import os
+import io
+import sys
+import time
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Directory each capture gets a subdirectory in
+PROFILE_DIR = os.environ.get("CARDIOPREDICT_PROFILE_DIR", "profiles")
+
+# Seconds between stack samples of a profiled run
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("CARDIOPREDICT_PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Most runs one capture may cover
+PROFILE_MAX_RUNS = int(os.environ.get("CARDIOPREDICT_PROFILE_MAX_RUNS", "50"))
+
+# What a capture can profile: every script run, or only runs that made a prediction
+PROFILE_TARGETS = {
+    'runs': "script runs",
+    'predictions': "predictions"
+}
+
+class RunProfile:
+    """Profiler and stack samples for one script run on one thread"""
+
+    def __init__(self, capture, kind):
+        self.capture = capture
+        self.kind = kind
+        self.labels = set()
+        self.samples = Counter()
+        self.thread_id = threading.get_ident()
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+class ProfileCapture:
+    """One armed profiling request: which runs to profile, and the runs profiled so far"""
+
+    def __init__(self, target, runs, requested_by):
+        self.target = target
+        self.runs = runs
+        self.requested_by = requested_by
+        self.started_at = datetime.now()
+        self.id = self.started_at.strftime("%Y%m%d-%H%M%S")
+        self.directory = os.path.join(PROFILE_DIR, self.id)
+        self.completed = []  # One dict per saved run
+        self.finished_at = None
+        self.summary_path = None
+
+    def describe(self):
+        return f"next {self.runs} {PROFILE_TARGETS[self.target]}, requested by {self.requested_by}"
+
+    def save_run(self, run):
+        """Write a finished run's pstats and collapsed-stack files, returning its record"""
+        number = len(self.completed) + 1
+        base = os.path.join(self.directory, f"run-{number:02d}-{run.kind}")
+        run.profiler.dump_stats(base + ".pstats")
+        # The sampler may still be adding to run.samples, so work from a copy
+        samples = dict(run.samples)
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in sorted(samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+        record = {
+            'number': number,
+            'kind': run.kind,
+            'labels': sorted(run.labels),
+            'duration_ms': run.duration * 1000,
+            'samples': sum(samples.values()),
+            'pstats': base + ".pstats",
+            'collapsed': base + ".collapsed",
+            'finished_at': datetime.now()
+        }
+        self.completed.append(record)
+        return record
+
+    def write_summary(self):
+        """Write summary.txt covering every saved run"""
+        import pstats
+
+        out = io.StringIO()
+        out.write(f"CardioPredict profile {self.id}\n")
+        out.write(f"Capture: {self.describe()}\n")
+        out.write(f"Started {self.started_at:%Y-%m-%d %H:%M:%S}, finished {self.finished_at:%Y-%m-%d %H:%M:%S}\n")
+        out.write(f"Runs profiled: {len(self.completed)} of {self.runs}\n\n")
+
+        for record in self.completed:
+            labels = f" [{', '.join(record['labels'])}]" if record['labels'] else ""
+            out.write(f"  run {record['number']:>2}  {record['kind']:<8} {record['duration_ms']:9.1f} ms  "
+                      f"{record['samples']:>5} samples{labels}\n")
+
+        if self.completed:
+            stats = pstats.Stats(self.completed[0]['pstats'], stream=out)
+            for record in self.completed[1:]:
+                stats.add(record['pstats'])
+            out.write("\nSlowest functions by cumulative time, all runs:\n")
+            stats.sort_stats("cumulative").print_stats(30)
+            out.write("\nSlowest functions by own time, all runs:\n")
+            stats.sort_stats("tottime").print_stats(20)
+
+            stacks = Counter()
+            for record in self.completed:
+                with open(record['collapsed'], encoding="utf-8") as f:
+                    for line in f:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        stacks[stack] += int(count)
+            total = sum(stacks.values()) or 1
+            out.write("Hottest sampled stacks, innermost 6 frames:\n")
+            for stack, count in stacks.most_common(15):
+                frames = stack.split(";")[-6:]
+                out.write(f"  {count / total:6.1%}  {' <- '.join(reversed(frames))}\n")
+
+        self.summary_path = os.path.join(self.directory, "summary.txt")
+        with open(self.summary_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+# The armed capture, if any, and the last one to finish
+_capture = None
+_last_capture = None
+_lock = threading.Lock()
+
+# Runs being profiled, by thread ID, for the sampler
+_active = {}
+_local = threading.local()
+
+def start_capture(target, runs, requested_by):
+    """
+    Arm a capture of the next `runs` script runs or predictions.
+
+    Returns:
+        Tuple of (success, message)
+    """
+    global _capture
+
+    if target not in PROFILE_TARGETS:
+        return False, f"Unknown profiling target: {target}"
+    if not 1 <= runs <= PROFILE_MAX_RUNS:
+        return False, f"Choose between 1 and {PROFILE_MAX_RUNS} runs."
+
+    with _lock:
+        if _capture is not None:
+            return False, "A profile is already being captured."
+        capture = ProfileCapture(target, runs, requested_by)
+        try:
+            # Fails if a capture started within the same second, rather than overwriting it
+            os.makedirs(capture.directory)
+        except OSError as e:
+            return False, f"Cannot create {capture.directory}: {e}"
+        _capture = capture
+
+    threading.Thread(target=_sample, args=(capture,), name="profile-sampler", daemon=True).start()
+    return True, f"Profiling the {capture.describe()}."
+
+def stop_capture():
+    """Finish the armed capture now, keeping the runs profiled so far"""
+    with _lock:
+        capture = _capture
+    if capture is not None:
+        _finish(capture)
+
+def capture_status():
+    """The armed capture, or None"""
+    return _capture
+
+def last_capture():
+    """The most recently finished capture, or None"""
+    return _last_capture
+
+def begin_run(kind):
+    """
+    Start profiling this thread's run if a capture is armed.
+
+    A fragment-only rerun calls this too; inside a full run it does nothing.
+    Returns True if this call started a profile, in which case call end_run().
+    """
+    capture = _capture
+    current = getattr(_local, 'run', None)
+    if current is not None:
+        if kind != "script":
+            return False
+        # A run left open on this thread; app.py ends every run in a finally block, so this is only a safeguard
+        _discard(current)
+    if capture is None:
+        return False
+
+    run = RunProfile(capture, kind)
+    try:
+        run.profiler.enable()
+    except ValueError:
+        # Another profiler is active on this interpreter
+        return False
+    _local.run = run
+    with _lock:
+        _active[run.thread_id] = run
+    return True
+
+def mark_run(label):
+    """Label the run being profiled on this thread, e.g. "prediction" """
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.labels.add(label)
+
+def end_run():
+    """Stop profiling this thread's run and save it if the capture still wants it"""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return
+    _discard(run)
+
+    capture = run.capture
+    if capture.target == 'predictions' and "prediction" not in run.labels:
+        return
+
+    with _lock:
+        if _capture is not capture or len(capture.completed) >= capture.runs:
+            return
+        try:
+            capture.save_run(run)
+        except OSError as e:
+            print(f"Error saving profile: {e}")
+            return
+        done = len(capture.completed) >= capture.runs
+
+    if done:
+        _finish(capture)
+
+def _discard(run):
+    """Stop a run's profiler and forget it"""
+    run.stop()
+    _local.run = None
+    with _lock:
+        _active.pop(run.thread_id, None)
+
+def _finish(capture):
+    """Disarm a capture and write its summary"""
+    global _capture, _last_capture
+
+    with _lock:
+        if _capture is not capture:
+            return
+        _capture = None
+        capture.finished_at = datetime.now()
+    try:
+        capture.write_summary()
+    except Exception as e:
+        print(f"Error writing profile summary: {e}")
+    _last_capture = capture
+
+def fold_stack(frame):
+    """A frame and its callers as one collapsed-stack line, outermost first"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+        frames.append(f"{code.co_name} ({path}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+def _sample(capture):
+    """Sample the stacks of profiled runs until the capture finishes"""
+    while _capture is capture:
+        frames = sys._current_frames()
+        with _lock:
+            runs = list(_active.values())
+        for run in runs:
+            frame = frames.get(run.thread_id)
+            if frame is not None and run.capture is capture:
+                run.samples[fold_stack(frame)] += 1
+        del frames
+        time.sleep(PROFILE_SAMPLE_INTERVAL)
@@ -49,6 +49,7 @@ def create_streamlit_config():
 headless = false
 address = "0.0.0.0"
 runOnSave = true
+enableStaticServing = true
 
 [browser]
 gatherUsageStats = false
@@ -73,6 +74,12 @@ def check_environment():
         print("pip install streamlit pandas numpy scikit-learn plotly matplotlib streamlit-extras")
         return False
 
+def migrate_database():
+    """Create or upgrade the database schema; the app only checks its version at startup"""
+    print("🗄️  Migrating the database...")
+    result = subprocess.run([sys.executable, "migrate.py"])
+    return result.returncode == 0
+
 def launch_app(port):
     """Launch the Streamlit application on the specified port"""
     print(f"🚀 Starting CardioPredict on port {port}...")
@@ -89,7 +96,9 @@ def launch_app(port):
     threading.Thread(target=open_browser).start()
     
     # Start the Streamlit app
-    cmd = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port)]
+    # Static serving delivers the app stylesheets; it is enabled here for existing config files too
+    cmd = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port),
+           "--server.enableStaticServing", "true"]
     subprocess.run(cmd)
 
 def main():
@@ -106,6 +115,11 @@ def main():
     # Create Streamlit config if needed
     create_streamlit_config()
     
+    # Bring the database schema up to date
+    if not migrate_database():
+        print("❌ Database migration failed. Fix the error above and try again.")
+        return
+    
     # Find an available port
     port = find_available_port()
     if port is None:
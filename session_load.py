@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+"""
+Session-load simulator for the CardioPredict Streamlit app.
+
+Drives many simulated users through the real app.py at once, each in its own
+Streamlit session run headlessly by AppTest. No browser is needed, and nothing
+goes over the network. Each user:
+
+    signs up through the sign-up form (storage.create_user)
+    signs in through the login form (session_state.login_user)
+    submits --predictions predictions
+    opens their profile (render_user_profile)
+
+One user in every --admin-every instead signs in as the administrator and
+opens the admin dashboard. Sessions are kept open until the end of the run, as
+a real server keeps them.
+
+The report gives throughput, latency percentiles per step, failed steps and
+"database is locked" errors. The backends print rather than raise database
+errors, so lock errors are counted from the printed output. For memory it
+gives the resident memory the open sessions added, the peak reached while they
+ran, and what memory.py accounts to each session and each cache. Set
+CARDIOPREDICT_SESSION_MEMORY_CAP_KB to see how a cap changes them.
+
+By default the simulation runs against a new scratch SQLite database. Pass
+--configured-database to use the database the environment points at, which
+must already be migrated.
+
+Usage:
+    python session_load.py [--users 40] [--concurrency 8] [--predictions 2]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs app.py with the navigation menu following st.session_state.sim_page
+APP_WRAPPER = f"""
+import sys
+sys.path.insert(0, {APP_DIR!r})
+import runpy
+import streamlit as st
+import streamlit_option_menu
+streamlit_option_menu.option_menu = lambda *args, **kwargs: st.session_state.get("sim_page", "Home")
+runpy.run_path({os.path.join(APP_DIR, "app.py")!r}, run_name="__main__")
+"""
+
+# Seeded by migrate.py on the local backends
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin123"
+
+# Printed database errors that mean a writer or reader could not get a lock
+LOCK_ERROR = re.compile(r"database is locked|database table is locked|Lock wait timeout|Deadlock found", re.I)
+
+class LockErrorCounter:
+    """Passes printed output through, counting lines that report a database lock error"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        if LOCK_ERROR.search(text):
+            with self._lock:
+                self.count += 1
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class RssSampler:
+    """Highest resident set size seen while running, sampled every `interval` seconds"""
+
+    def __init__(self, interval=0.05):
+        from memory import current_rss
+
+        self.current_rss = current_rss
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.current_rss()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class StepFailed(Exception):
+    """A simulated user could not complete a step"""
+
+class SimulatedUser:
+    """One browser session working through the app, timing each step"""
+
+    def __init__(self, index, run_id, script_path, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.username = f"loadsim_{run_id}_{index}"
+        self.password = f"Sim-{run_id}-{index}!"
+        self.at = AppTest.from_file(script_path, default_timeout=timeout)
+        self.timings = []  # (step, seconds)
+        self.failures = []  # (step, reason)
+
+    def step(self, name, action):
+        """Run one step, recording its latency or why it failed"""
+        start = time.perf_counter()
+        try:
+            action()
+            if self.at.exception:
+                raise StepFailed(self.at.exception[0].message)
+        except Exception as e:
+            self.failures.append((name, str(e).splitlines()[0] if str(e) else type(e).__name__))
+            return False
+        self.timings.append((name, time.perf_counter() - start))
+        return True
+
+    def open_page(self, page):
+        self.at.session_state["sim_page"] = page
+        self.at.run()
+
+    def submit_form(self, label):
+        for button in self.at.get("form_submit_button"):
+            if button.label == label:
+                button.click().run()
+                return
+        raise StepFailed(f"No '{label}' button")
+
+    def sign_up(self):
+        self.at.session_state["show_login"] = False
+        self.at.session_state["show_signup"] = True
+        self.open_page("Login/Register")
+        self.at.text_input(key="signup_username").input(self.username)
+        self.at.text_input(key="signup_email").input(f"{self.username}@loadsim.invalid")
+        self.at.text_input(key="signup_password").input(self.password)
+        self.at.text_input(key="signup_confirm_password").input(self.password)
+        self.submit_form("Create Account")
+        if self.at.error:
+            raise StepFailed(self.at.error[0].value)
+        if self.at.session_state["show_signup"]:
+            # Still on the form: a busy sign-up explains itself in a warning
+            raise StepFailed(self.at.warning[-1].value if self.at.warning else "Sign-up failed")
+
+    def sign_in(self, username, password):
+        self.at.session_state["show_login"] = True
+        self.at.session_state["show_signup"] = False
+        self.open_page("Login/Register")
+        self.at.text_input(key="login_username").input(username)
+        self.at.text_input(key="login_password").input(password)
+        self.submit_form("Sign In")
+        if not self.at.session_state["is_authenticated"]:
+            busy = self.at.warning[-1].value if self.at.warning else None
+            raise StepFailed(self.at.session_state["login_message"] or busy or "Sign-in failed")
+
+    def predict(self, rng):
+        from measure_reruns import find_widget, find_submit
+
+        self.open_page("Prediction")
+        find_widget(self.at, "Age").set_value(rng.randint(30, 80))
+        find_widget(self.at, "Resting Blood Pressure (mm Hg)").set_value(rng.randint(90, 180))
+        find_widget(self.at, "Serum Cholesterol (mg/dl)").set_value(rng.randint(150, 350))
+        find_widget(self.at, "Maximum Heart Rate Achieved").set_value(rng.randint(90, 200))
+        find_submit(self.at).click().run()
+        if not any(element.value == "Prediction Result" for element in self.at.subheader):
+            # A busy stage explains itself in a warning
+            raise StepFailed(self.at.warning[-1].value if self.at.warning else "The prediction result was not shown")
+
+    def run_user_flow(self, predictions, rng):
+        self.step("home", self.at.run)
+        if not self.step("sign_up", self.sign_up):
+            return
+        if not self.step("sign_in", lambda: self.sign_in(self.username, self.password)):
+            return
+        for _ in range(predictions):
+            self.step("predict", lambda: self.predict(rng))
+        self.step("profile", lambda: self.open_page("Profile"))
+
+    def run_admin_flow(self):
+        self.step("home", self.at.run)
+        if not self.step("admin_sign_in", lambda: self.sign_in(ADMIN_USERNAME, ADMIN_PASSWORD)):
+            return
+        self.step("admin_dashboard", lambda: self.open_page("Admin Panel"))
+
+def allow_parallel_apptests():
+    """
+    Let AppTest sessions run their scripts at the same time.
+
+    AppTest expects one run at a time. While a run is going it installs a mock
+    Runtime and turns on the global.appTest option, and it undoes both when the
+    run ends. Done in parallel, one session's cleanup would pull them out from
+    under a script still running in another session. So the option is left
+    on, and the last mock Runtime stays in place between runs.
+    """
+    from streamlit import config, logger
+    from streamlit.runtime.runtime import Runtime
+
+    config.set_option("global.appTest", True)
+    # Streamlit warns, with a stack, about every empty widget label on every run,
+    # and about session state set from outside a script run
+    logger.set_log_level("error")
+    latest = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest['runtime'] = cls._instance
+            return cls._instance
+        if 'runtime' in latest:
+            return latest['runtime']
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or 'runtime' in latest
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+def prepare_scratch_database():
+    """Point the app at a new SQLite file and migrate it, returning its path"""
+    fd, path = tempfile.mkstemp(prefix="cardiopredict_load_", suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    os.environ["CARDIOPREDICT_DB_BACKEND"] = "sqlite"
+    os.environ["CARDIOPREDICT_SQLITE_PATH"] = path
+    # Migrate in a subprocess, so that storage is first imported here against the migrated schema
+    subprocess.run([sys.executable, os.path.join(APP_DIR, "migrate.py")], check=True, cwd=APP_DIR)
+    return path
+
+def run_simulation(users, concurrency, predictions, admin_every, timeout, seed=0):
+    """
+    Run every simulated user, keeping their sessions open until all have finished.
+
+    Returns:
+        Dict of results for print_report
+    """
+    from memory import current_rss, peak_rss, session_memory, cache_memory
+
+    run_id = f"{int(time.time()) % 100000}"
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as wrapper:
+        wrapper.write(APP_WRAPPER)
+
+    allow_parallel_apptests()
+    counter = LockErrorCounter(sys.stdout)
+    sys.stdout = counter
+    try:
+        # One session first, so imports and the model load are not charged to the simulated sessions
+        warmup = SimulatedUser("warmup", run_id, wrapper.name, timeout)
+        warmup.run_user_flow(1, random.Random(seed))
+        warmup_username = warmup.username
+        del warmup
+        baseline_rss = current_rss()
+
+        sessions = [SimulatedUser(i, run_id, wrapper.name, timeout) for i in range(users)]
+
+        def simulate(user):
+            if admin_every and user.index % admin_every == admin_every - 1:
+                user.run_admin_flow()
+            else:
+                user.run_user_flow(predictions, random.Random(seed + user.index))
+
+        start = time.perf_counter()
+        with RssSampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(simulate, sessions))
+        elapsed = time.perf_counter() - start
+        end_rss = current_rss()
+        # What the app accounted to each simulated session as it finished its last run
+        accounted = [entry for entry in session_memory() if entry.username != warmup_username]
+    finally:
+        sys.stdout = counter.stream
+        os.remove(wrapper.name)
+
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'sessions': sessions,
+        'lock_errors': counter.count,
+        'baseline_rss': baseline_rss,
+        'end_rss': end_rss,
+        'run_peak_rss': sampler.peak,
+        'process_peak_rss': peak_rss(),
+        'session_memory': accounted,
+        'cache_memory': cache_memory()
+    }
+
+def print_report(results):
+    """Print throughput, per-step latency, failures, lock errors and memory"""
+    sessions = results['sessions']
+    elapsed = results['elapsed']
+    steps = {}
+    for user in sessions:
+        for name, seconds in user.timings:
+            steps.setdefault(name, []).append(seconds)
+    failures = [failure for user in sessions for failure in user.failures]
+    completed = sum(1 for user in sessions if not user.failures)
+
+    print(f"Simulated {results['users']} sessions, {results['concurrency']} at a time, in {elapsed:.1f}s")
+    print(f"Throughput:  {completed / elapsed:.2f} completed sessions/s, "
+          f"{sum(len(v) for v in steps.values()) / elapsed:.1f} steps/s")
+    print(f"\n{'step':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, values in steps.items():
+        values.sort()
+        print(f"{name:<16} {len(values):>6} {percentile(values, 0.50) * 1000:>9.0f} "
+              f"{percentile(values, 0.95) * 1000:>9.0f} {percentile(values, 0.99) * 1000:>9.0f} "
+              f"{values[-1] * 1000:>9.0f}")
+
+    print(f"\nFailed steps:          {len(failures)}")
+    reasons = {}
+    for name, reason in failures:
+        reasons[(name, reason)] = reasons.get((name, reason), 0) + 1
+    for (name, reason), count in sorted(reasons.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {count:>4} x {name}: {reason}")
+    print(f"Database lock errors:  {results['lock_errors']}")
+
+    if results['baseline_rss'] and results['end_rss']:
+        added = results['end_rss'] - results['baseline_rss']
+        print(f"Resident memory:       {results['end_rss'] / 2**20:.0f} MiB, "
+              f"{added / 2**20:+.0f} MiB for {len(sessions)} open sessions, "
+              f"{added / len(sessions) / 2**10:.0f} KiB per session")
+    if results['run_peak_rss']:
+        print(f"Peak resident memory:  {results['run_peak_rss'] / 2**20:.0f} MiB while sessions ran"
+              + (f", {results['process_peak_rss'] / 2**20:.0f} MiB for the whole process"
+                 if results['process_peak_rss'] else ""))
+
+    accounted = results['session_memory']
+    if accounted:
+        state = sorted(entry.state_bytes for entry in accounted)
+        frames = sorted(entry.frame_bytes for entry in accounted)
+        evictions = sum(entry.evictions for entry in accounted)
+        print(f"\nAccounted per session ({len(accounted)} sessions):")
+        print(f"  session state         mean {sum(state) / len(state) / 2**10:7.1f} KiB, max {state[-1] / 2**10:7.1f} KiB")
+        print(f"  last rerun DataFrames mean {sum(frames) / len(frames) / 2**10:7.1f} KiB, max {frames[-1] / 2**10:7.1f} KiB")
+        print(f"  keys evicted          {evictions}")
+    if results['cache_memory']:
+        print("Process-wide caches:")
+        for name, entries, size in results['cache_memory']:
+            print(f"  {name:<22} {entries:>6} entries {size / 2**10:9.1f} KiB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent CardioPredict sessions without a browser")
+    parser.add_argument("--users", type=int, default=40, help="Simulated sessions")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions active at once")
+    parser.add_argument("--predictions", type=int, default=2, help="Predictions per regular user")
+    parser.add_argument("--admin-every", type=int, default=10, help="Every Nth session is an admin; 0 for none")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds one script run may take")
+    parser.add_argument("--configured-database", action="store_true",
+                        help="Use the database the environment points at instead of a scratch SQLite file")
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    # Keep the simulation from taking the live app's metrics port or filling its trace file
+    os.environ.setdefault("CARDIOPREDICT_METRICS_PORT", "0")
+    os.environ.setdefault("CARDIOPREDICT_TRACE_SAMPLE_RATE", "0")
+
+    scratch = None if args.configured_database else prepare_scratch_database()
+    try:
+        results = run_simulation(args.users, args.concurrency, args.predictions, args.admin_every, args.timeout)
+        print_report(results)
+    finally:
+        if scratch:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(scratch + suffix):
+                    os.remove(scratch + suffix)
@@ -1,5 +1,6 @@
 import streamlit as st
-from sqlite_database import authenticate_user, get_user_by_id, db_connected
+from storage import get_authenticated_user, db_connected
+from admission import StageBusy
 
 def initialize_session_state():
     """Initialize session state variables if they don't exist"""
@@ -28,20 +29,23 @@ def initialize_session_state():
         st.session_state.signup_message = None
 
 def login_user(username, password):
-    """Try to log in a user and set session state accordingly"""
-    success, user_id, is_admin = authenticate_user(username, password)
+    """
+    Try to log in a user and set session state accordingly.
+
+    Raises StageBusy when the password could not be checked because sign-in is busy.
+    """
+    # One query returns the user record along with the password check
+    try:
+        user = get_authenticated_user(username, password)
+    except StageBusy:
+        # Not a failed login, so clear any earlier "Invalid username or password"
+        st.session_state.login_message = None
+        raise
     
-    if success:
-        user = get_user_by_id(user_id)
-        st.session_state.user_id = user_id
-        
-        # Handle both regular User object and dictionary (for offline mode)
-        if isinstance(user, dict):
-            st.session_state.username = user.get('username', 'Guest')
-            st.session_state.is_admin = user.get('is_admin', False)
-        else:
-            st.session_state.username = user.username
-            st.session_state.is_admin = getattr(user, 'is_admin', False)
+    if user:
+        st.session_state.user_id = user['id']
+        st.session_state.username = user.get('username', 'Guest')
+        st.session_state.is_admin = user.get('is_admin', False)
             
         st.session_state.is_authenticated = True
         st.session_state.login_message = None
@@ -1,23 +1,67 @@
 import os
+import queue
 import sqlite3
-import bcrypt
+from passwords import hash_password, verify_password, needs_rehash, PasswordWorkBusy
+from storage_common import SUMMARY_FEATURES, TREND_COLUMNS, build_trends
 import json
 import streamlit as st
 from datetime import datetime
 
 # Database file
-DB_FILE = 'cardiopredict.db'
+DB_FILE = os.environ.get("CARDIOPREDICT_SQLITE_PATH", 'cardiopredict.db')
+
+# Maximum number of idle connections kept open for reuse
+POOL_SIZE = int(os.environ.get("CARDIOPREDICT_SQLITE_POOL_SIZE", "8"))
+
+# Seconds a write waits for another connection's lock before failing
+BUSY_TIMEOUT = float(os.environ.get("CARDIOPREDICT_SQLITE_BUSY_TIMEOUT", "5"))
 
 # Global connection flag
 db_connected = False
 
+# Idle connections waiting to be checked out again
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that goes back to the pool instead of closing"""
+    _in_pool = False
+
+    def close(self):
+        """Return the connection to the pool, or close it if the pool is full"""
+        if self._in_pool:
+            return
+        try:
+            # Never hand out a connection with a transaction still open
+            self.rollback()
+            self._in_pool = True
+            _pool.put_nowait(self)
+        except (queue.Full, sqlite3.Error):
+            self._in_pool = False
+            super().close()
+
+def parse_timestamp(value):
+    """SQLite returns timestamps as text; convert them to datetime like the other backends"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
 # Make the database connection thread-safe for Streamlit
 def get_connection():
-    """Get a new database connection for the current thread"""
+    """Check out a database connection from the pool, opening a new one if none are idle"""
+    try:
+        conn = _pool.get_nowait()
+        conn._in_pool = False
+        return conn
+    except queue.Empty:
+        pass
+    
     try:
-        # Use check_same_thread=False to allow access from multiple threads
-        # This is safe for read operations and limited concurrent writes
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        # Use check_same_thread=False so pooled connections can move between threads
+        # A connection is only ever used by one thread between checkout and close()
+        conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=PooledConnection)
+        # WAL lets a long read, such as an export, run while predictions are saved
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
         return conn
     except Exception as e:
         print(f"Error connecting to SQLite database: {e}")
@@ -69,6 +113,53 @@ def create_tables():
         cursor.close()
         conn.close()
 
+def add_admin_column():
+    """Add users.is_admin to a users table created before it existed"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("PRAGMA table_info(users)")
+        if 'is_admin' not in {column[1] for column in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
+            conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error adding is_admin column: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+# Indexes for newest-first listings and per-user history: name -> columns
+PREDICTION_INDEXES = {
+    'idx_prediction_history_date': "prediction_date",
+    'idx_prediction_history_user': "user_id, prediction_date",
+}
+
+def create_prediction_indexes():
+    """Create the prediction_history indexes on a table created before them"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        for name, columns in PREDICTION_INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON prediction_history ({columns})")
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error creating indexes: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
 def create_admin_user():
     """Create admin user if it doesn't exist"""
     conn = get_connection()
@@ -87,9 +178,7 @@ def create_admin_user():
         if not admin:
             # Create admin user with fixed credentials
             admin_password = "admin123"  # Fixed admin password
-            password_bytes = admin_password.encode('utf-8')
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+            hashed_password = hash_password(admin_password)
             
             insert_admin = """
             INSERT INTO users (username, email, password_hash, is_admin)
@@ -108,6 +197,84 @@ def create_admin_user():
         cursor.close()
         conn.close()
 
+# Schema changes in order; a database at version N has had the first N applied.
+# Each one must be safe to re-run on a database that already has its changes.
+MIGRATIONS = [
+    create_tables,  # 1: users and prediction_history
+    add_admin_column,  # 2: users.is_admin
+    create_prediction_indexes,  # 3: prediction_history indexes
+]
+
+def get_schema_version():
+    """
+    Schema version recorded in the database, read with a single query.
+
+    Returns:
+        Number of migrations applied (0 for a database never migrated), or None if unreachable
+    """
+    global db_connected
+    conn = get_connection()
+    if not conn:
+        db_connected = False
+        return None
+    
+    db_connected = True
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        # No schema_version table yet
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def migrate():
+    """
+    Apply pending migrations and make sure the admin account exists.
+
+    Idempotent: migrations already recorded in schema_version are skipped.
+
+    Returns:
+        Tuple of (success, message)
+    """
+    version = get_schema_version()
+    if version is None:
+        return False, f"Cannot open SQLite database {DB_FILE}"
+    
+    if version > len(MIGRATIONS):
+        return False, f"Database schema version {version} is newer than this code ({len(MIGRATIONS)})"
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        conn.commit()
+        
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            if not migration():
+                return False, f"Migration {number} ({migration.__name__}) failed"
+            cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (number,))
+            conn.commit()
+    except sqlite3.Error as e:
+        return False, f"Error migrating database: {e}"
+    finally:
+        cursor.close()
+        conn.close()
+    
+    if not create_admin_user():
+        return False, "Error creating admin user"
+    
+    return True, f"Schema at version {len(MIGRATIONS)} ({len(MIGRATIONS) - version} migrations applied)"
+
 def create_user(username, email, password):
     """Create a new user account"""
     conn = get_connection()
@@ -126,9 +293,7 @@ def create_user(username, email, password):
             return False, "Username or email already exists"
         
         # Hash password
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+        hashed_password = hash_password(password)
         
         # Create new user
         insert_query = """
@@ -140,6 +305,9 @@ def create_user(username, email, password):
         conn.commit()
         
         return True, "User created successfully"
+    except PasswordWorkBusy:
+        # The hashing pool is full; storage turns this into a busy message
+        raise
     except Exception as e:
         conn.rollback()
         return False, f"Error creating user: {str(e)}"
@@ -147,44 +315,57 @@ def create_user(username, email, password):
         cursor.close()
         conn.close()
 
-def authenticate_user(username, password):
-    """Authenticate a user by username and password"""
+def get_authenticated_user(username, password):
+    """Authenticate a user and return their user record, or None if the login fails"""
     # Demo login for testing
     if username == "demo" and password == "demo":
-        return True, 999, False
+        return {'id': 999, 'username': 'demo', 'email': 'demo@example.com', 'is_admin': False}
     
     # Admin login for offline testing
     if username == "admin" and password == "admin123":
-        return True, 1, True
+        return {'id': 1, 'username': 'admin', 'email': 'admin@cardiopredict.com', 'is_admin': True}
     
     conn = get_connection()
     if not conn:
-        return False, None, False
+        return None
     
     cursor = conn.cursor()
     
     try:
-        # Get user by username
-        query = "SELECT id, password_hash, is_admin FROM users WHERE username = ?"
+        # Get the user record and password hash in one query
+        query = "SELECT id, username, email, is_admin, password_hash FROM users WHERE username = ?"
         cursor.execute(query, (username,))
         user = cursor.fetchone()
         
         if user:
-            user_id, stored_hash, is_admin = user
-            password_bytes = password.encode('utf-8')
-            hash_bytes = stored_hash.encode('utf-8')
+            user_id, user_name, email, is_admin, stored_hash = user
             
-            if bcrypt.checkpw(password_bytes, hash_bytes):
-                return True, user_id, bool(is_admin)
+            if verify_password(password, stored_hash):
+                # Upgrade hashes made with an older cost factor
+                if needs_rehash(stored_hash):
+                    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?",
+                                   (hash_password(password), user_id))
+                    conn.commit()
+                return {'id': user_id, 'username': user_name, 'email': email, 'is_admin': bool(is_admin)}
         
-        return False, None, False
+        return None
+    except PasswordWorkBusy:
+        # Not a failed login: the password was never checked
+        raise
     except Exception as e:
         print(f"Authentication error: {e}")
-        return False, None, False
+        return None
     finally:
         cursor.close()
         conn.close()
 
+def authenticate_user(username, password):
+    """Authenticate a user by username and password"""
+    user = get_authenticated_user(username, password)
+    if user:
+        return True, user['id'], user['is_admin']
+    return False, None, False
+
 def save_prediction(user_id, risk_level, probability, user_data, prescription=None):
     """Save a prediction to the user's history with optional prescription data"""
     if user_id == 999:  # 999 is demo user ID
@@ -222,6 +403,52 @@ def save_prediction(user_id, risk_level, probability, user_data, prescription=No
         cursor.close()
         conn.close()
 
+def save_predictions_batch(records):
+    """Save several predictions in a single transaction
+    
+    Each record is a dict with the save_prediction arguments:
+    user_id, risk_level, probability, user_data and optionally prescription.
+    """
+    # Demo predictions are never stored
+    records = [r for r in records if r['user_id'] != 999]
+    if not records:
+        return True, 0
+    
+    conn = get_connection()
+    if not conn:
+        return False, 0
+    
+    cursor = conn.cursor()
+    
+    try:
+        rows = [
+            (
+                r['user_id'],
+                r['risk_level'],
+                float(r['probability']),
+                json.dumps(r['user_data']),
+                json.dumps(r['prescription']) if r.get('prescription') else None
+            )
+            for r in records
+        ]
+        
+        insert_query = """
+        INSERT INTO prediction_history (user_id, risk_level, probability, user_data, prescription)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        
+        cursor.executemany(insert_query, rows)
+        conn.commit()
+        
+        return True, len(rows)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error saving predictions: {e}")
+        return False, 0
+    finally:
+        cursor.close()
+        conn.close()
+
 def get_user_predictions(user_id, limit=10):
     """Get a user's prediction history including prescription data"""
     if user_id == 999:  # 999 is demo user ID
@@ -256,7 +483,7 @@ def get_user_predictions(user_id, limit=10):
             
             prediction_data = {
                 'id': p_id,
-                'date': p_date,
+                'date': parse_timestamp(p_date),
                 'risk_level': p_risk,
                 'probability': p_prob,
                 'user_data': user_data,
@@ -272,6 +499,135 @@ def get_user_predictions(user_id, limit=10):
         cursor.close()
         conn.close()
 
+def get_user_history(user_id, limit=20, offset=0):
+    """
+    One page of a user's prediction history for the profile list, newest first.
+    
+    Only the list columns are read: the prescription is left in the database and
+    user_data is cut down to SUMMARY_FEATURES. Open a single prediction with
+    get_prediction_by_id for everything else.
+    
+    Returns:
+        Dictionary with the user's 'total', 'high' and 'low' prediction counts and
+        a 'predictions' list of summary dicts
+    """
+    history = {'total': 0, 'high': 0, 'low': 0, 'predictions': []}
+    
+    if user_id == 999:  # 999 is demo user ID
+        return history
+    
+    conn = get_connection()
+    if not conn:
+        return history
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN risk_level = 'High' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN risk_level = 'Low' THEN 1 ELSE 0 END), 0)
+        FROM prediction_history
+        WHERE user_id = ?
+        """, (user_id,))
+        history['total'], history['high'], history['low'] = cursor.fetchone()
+        
+        cursor.execute("""
+        SELECT id, prediction_date, risk_level, probability, user_data, prescription IS NOT NULL
+        FROM prediction_history
+        WHERE user_id = ?
+        ORDER BY prediction_date DESC, id DESC
+        LIMIT ? OFFSET ?
+        """, (user_id, limit, offset))
+        
+        for p_id, p_date, p_risk, p_prob, p_data, has_prescription in cursor.fetchall():
+            user_data = json.loads(p_data) if p_data else {}
+            history['predictions'].append({
+                'id': p_id,
+                'date': parse_timestamp(p_date),
+                'risk_level': p_risk,
+                'probability': p_prob,
+                'user_data': {key: user_data[key] for key in SUMMARY_FEATURES if key in user_data},
+                'has_prescription': bool(has_prescription)
+            })
+        
+        return history
+    except Exception as e:
+        print(f"Error getting user history: {e}")
+        return history
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_user_trends(user_id, window=5, limit=500):
+    """
+    Risk trend for one user, computed with window functions in the database.
+    
+    Every prediction gets the average risk probability over it and the
+    `window - 1` before it, and the change in cholesterol, blood pressure and
+    max heart rate since the previous prediction. Only the latest `limit`
+    points and the first prediction are returned, however long the history is.
+    
+    Returns:
+        Dictionary with the prediction 'total', 'first' and 'latest' snapshots
+        and the recent 'points' in chronological order
+    """
+    if user_id == 999:
+        return build_trends([], limit)
+    
+    conn = get_connection()
+    if not conn:
+        return build_trends([], limit)
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Window frame sizes cannot be query parameters
+        query = """
+        WITH history AS (
+            SELECT id, prediction_date, risk_level,
+                   CASE WHEN risk_level = 'High' THEN probability ELSE 1 - probability END AS risk_probability,
+                   json_extract(user_data, '$.age') AS age,
+                   json_extract(user_data, '$.chol') AS chol,
+                   json_extract(user_data, '$.trestbps') AS trestbps,
+                   json_extract(user_data, '$.thalach') AS thalach
+            FROM prediction_history
+            WHERE user_id = ?
+        ),
+        trends AS (
+            SELECT history.*,
+                   AVG(risk_probability) OVER (ORDER BY prediction_date, id
+                                               ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW) AS rolling_risk,
+                   chol - LAG(chol) OVER w AS chol_delta,
+                   trestbps - LAG(trestbps) OVER w AS trestbps_delta,
+                   thalach - LAG(thalach) OVER w AS thalach_delta,
+                   ROW_NUMBER() OVER w AS position,
+                   ROW_NUMBER() OVER (ORDER BY prediction_date DESC, id DESC) AS recency
+            FROM history
+            WINDOW w AS (ORDER BY prediction_date, id)
+        )
+        SELECT id, prediction_date, risk_level, risk_probability, age, chol, trestbps, thalach,
+               rolling_risk, chol_delta, trestbps_delta, thalach_delta, position, recency
+        FROM trends
+        WHERE recency <= ? OR position = 1
+        ORDER BY position
+        """.format(preceding=max(int(window), 1) - 1)
+        cursor.execute(query, (user_id, limit))
+        
+        rows = []
+        for row in cursor.fetchall():
+            row = dict(zip(TREND_COLUMNS, row))
+            row['date'] = parse_timestamp(row['date'])
+            rows.append(row)
+        
+        return build_trends(rows, limit)
+    except Exception as e:
+        print(f"Error getting user trends: {e}")
+        return build_trends([], limit)
+    finally:
+        cursor.close()
+        conn.close()
+
 def get_user_by_id(user_id):
     """Get user by ID"""
     # Demo user
@@ -304,6 +660,39 @@ def get_user_by_id(user_id):
         cursor.close()
         conn.close()
 
+def get_users_by_ids(user_ids):
+    """Get several users in one query, returned as a dict keyed by user ID"""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    
+    conn = get_connection()
+    if not conn:
+        return {}
+    
+    cursor = conn.cursor()
+    
+    try:
+        placeholders = ", ".join("?" for _ in user_ids)
+        query = f"SELECT id, username, email, is_admin FROM users WHERE id IN ({placeholders})"
+        cursor.execute(query, user_ids)
+        
+        return {
+            user[0]: {
+                'id': user[0],
+                'username': user[1],
+                'email': user[2],
+                'is_admin': bool(user[3])
+            }
+            for user in cursor.fetchall()
+        }
+    except Exception as e:
+        print(f"Error getting users: {e}")
+        return {}
+    finally:
+        cursor.close()
+        conn.close()
+
 def get_prediction_by_id(prediction_id):
     """Get a single prediction by ID"""
     conn = get_connection()
@@ -327,7 +716,7 @@ def get_prediction_by_id(prediction_id):
             prediction_data = {
                 'id': p_id,
                 'user_id': p_user_id,
-                'date': p_date,
+                'date': parse_timestamp(p_date),
                 'risk_level': p_risk,
                 'probability': p_prob,
                 'user_data': user_data,
@@ -442,30 +831,290 @@ def get_all_predictions():
         cursor.close()
         conn.close()
 
-def get_prediction_details(prediction_id):
-    """Get detailed prediction data for admin view"""
-    prediction = get_prediction_by_id(prediction_id)
+def prediction_filters(search=None, risk_level=None):
+    """
+    WHERE clause and parameters for the admin prediction filters.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    """
+    conditions = []
+    params = []
+    
+    if risk_level:
+        conditions.append("p.risk_level = ?")
+        params.append(risk_level)
+    
+    search = (search or "").strip()
+    if search:
+        # Escape LIKE wildcards so the search text is matched literally
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        if search.isdigit():
+            conditions.append("(u.username LIKE ? ESCAPE '\\' OR p.id = ?)")
+            params.extend([pattern, int(search)])
+        else:
+            conditions.append("u.username LIKE ? ESCAPE '\\'")
+            params.append(pattern)
     
-    if prediction:
-        # Get the user who made this prediction
-        user = get_user_by_id(prediction['user_id'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def search_predictions(search=None, risk_level=None, limit=50, offset=0):
+    """
+    Find predictions for the admin view one page at a time.
+    
+    `search` matches part of the username, or the exact prediction ID if it is a number.
+    
+    Returns:
+        Tuple of (page of prediction summary dicts, total number of matches)
+    """
+    conn = get_connection()
+    if not conn:
+        return [], 0
+    
+    cursor = conn.cursor()
+    
+    try:
+        where, params = prediction_filters(search, risk_level)
         
-        if user:
-            prediction['username'] = user['username']
-            prediction['email'] = user['email']
+        count_query = f"""
+        SELECT COUNT(*)
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        """
+        cursor.execute(count_query, params)
+        total = cursor.fetchone()[0]
         
-        return prediction
+        page_query = f"""
+        SELECT p.id, p.user_id, u.username, p.prediction_date, p.risk_level, p.probability
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        ORDER BY p.prediction_date DESC, p.id DESC
+        LIMIT ? OFFSET ?
+        """
+        cursor.execute(page_query, params + [limit, offset])
+        
+        result = []
+        for p in cursor.fetchall():
+            result.append({
+                'id': p[0],
+                'user_id': p[1],
+                'username': p[2],
+                'prediction_date': p[3],
+                'risk_level': p[4],
+                'probability': p[5]
+            })
+        
+        return result, total
+    except Exception as e:
+        print(f"Error searching predictions: {e}")
+        return [], 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def iter_predictions(search=None, risk_level=None, chunk_size=1000):
+    """
+    Stream predictions matching the admin filters, oldest first, for exports.
+    
+    Rows are read from the cursor `chunk_size` at a time, so memory use does not
+    depend on how many predictions match.
     
-    return None
+    Yields:
+        Lists of prediction dicts with username and decoded user_data
+    """
+    conn = get_connection()
+    if not conn:
+        return
+    
+    cursor = conn.cursor()
+    
+    try:
+        where, params = prediction_filters(search, risk_level)
+        cursor.execute(f"""
+        SELECT p.id, p.user_id, u.username, p.prediction_date, p.risk_level, p.probability, p.user_data
+        FROM prediction_history p
+        JOIN users u ON p.user_id = u.id
+        {where}
+        ORDER BY p.id
+        """, params)
+        
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [
+                {
+                    'id': p[0],
+                    'user_id': p[1],
+                    'username': p[2],
+                    'prediction_date': p[3],
+                    'risk_level': p[4],
+                    'probability': p[5],
+                    'user_data': json.loads(p[6]) if p[6] else {}
+                }
+                for p in rows
+            ]
+    finally:
+        cursor.close()
+        conn.close()
+
+# SQL expression for the start of each analytics bucket, as a YYYY-MM-DD[ HH:00] string
+PERIOD_BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00', p.prediction_date)",
+    'day': "date(p.prediction_date)",
+    'week': "date(p.prediction_date, 'weekday 0', '-6 days')",  # Monday of the week
+    'month': "strftime('%Y-%m-01', p.prediction_date)"
+}
+
+def get_prediction_date_range():
+    """First and last prediction dates, or (None, None) when there are none"""
+    conn = get_connection()
+    if not conn:
+        return None, None
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Both ends come from the prediction_date index
+        cursor.execute("SELECT MIN(prediction_date), MAX(prediction_date) FROM prediction_history")
+        first, last = cursor.fetchone()
+        if first is None:
+            return None, None
+        return datetime.fromisoformat(first), datetime.fromisoformat(last)
+    except Exception as e:
+        print(f"Error getting prediction date range: {e}")
+        return None, None
+    finally:
+        cursor.close()
+        conn.close()
 
-# Initialize database
-try:
+def get_prediction_analytics(since=None, bucket='day', top_users=20):
+    """
+    Aggregate prediction counts for the admin analytics, grouped in the database.
+    
+    Args:
+        since: Only count predictions made at or after this UTC datetime (None for all)
+        bucket: Timeline bucket size, one of PERIOD_BUCKETS, or None to skip the timeline
+        top_users: Number of most active users to break down; 0 skips the breakdown
+    
+    Returns:
+        Dictionary with overall counts, a timeline of (period, risk_level, count)
+        rows and per-user High/Low counts
+    """
+    analytics = {'total': 0, 'high': 0, 'low': 0, 'unique_users': 0, 'timeline': [], 'by_user': []}
+    
+    if bucket is not None and bucket not in PERIOD_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Choose one of: {', '.join(PERIOD_BUCKETS)}")
+    
     conn = get_connection()
-    if conn:
-        db_connected = True
-        print("Connected to SQLite database")
-        create_tables()
-        create_admin_user()
+    if not conn:
+        return analytics
+    
+    cursor = conn.cursor()
+    
+    try:
+        where = ""
+        params = []
+        if since is not None:
+            # Stored timestamps are UTC text in SQLite's CURRENT_TIMESTAMP format
+            where = "WHERE p.prediction_date >= ?"
+            params.append(since.strftime('%Y-%m-%d %H:%M:%S'))
+        
+        cursor.execute(f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN p.risk_level = 'High' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN p.risk_level = 'Low' THEN 1 ELSE 0 END), 0),
+               COUNT(DISTINCT p.user_id)
+        FROM prediction_history p
+        {where}
+        """, params)
+        analytics['total'], analytics['high'], analytics['low'], analytics['unique_users'] = cursor.fetchone()
+        
+        if bucket is not None:
+            period = PERIOD_BUCKETS[bucket]
+            cursor.execute(f"""
+            SELECT {period} AS period, p.risk_level, COUNT(*)
+            FROM prediction_history p
+            {where}
+            GROUP BY period, p.risk_level
+            ORDER BY period
+            """, params)
+            analytics['timeline'] = [
+                {'period': row[0], 'risk_level': row[1], 'count': row[2]}
+                for row in cursor.fetchall()
+            ]
+        
+        if top_users > 0:
+            cursor.execute(f"""
+            SELECT p.user_id, u.username,
+                   SUM(CASE WHEN p.risk_level = 'High' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN p.risk_level = 'Low' THEN 1 ELSE 0 END),
+                   COUNT(*) AS total
+            FROM prediction_history p
+            JOIN users u ON p.user_id = u.id
+            {where}
+            GROUP BY p.user_id, u.username
+            ORDER BY total DESC, u.username
+            LIMIT ?
+            """, params + [top_users])
+            analytics['by_user'] = [
+                {'user_id': row[0], 'username': row[1], 'high': row[2], 'low': row[3], 'total': row[4]}
+                for row in cursor.fetchall()
+            ]
+        
+        return analytics
+    except Exception as e:
+        print(f"Error getting prediction analytics: {e}")
+        return analytics
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_prediction_details(prediction_id):
+    """Get detailed prediction data for admin view"""
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Prediction and the user who made it in a single query
+        query = """
+        SELECT p.id, p.user_id, p.prediction_date, p.risk_level, p.probability,
+               p.user_data, p.prescription, u.username, u.email
+        FROM prediction_history p
+        LEFT JOIN users u ON p.user_id = u.id
+        WHERE p.id = ?
+        """
+        cursor.execute(query, (prediction_id,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        p_id, p_user_id, p_date, p_risk, p_prob, p_data, p_prescription, username, email = row
+        
+        prediction = {
+            'id': p_id,
+            'user_id': p_user_id,
+            'date': parse_timestamp(p_date),
+            'risk_level': p_risk,
+            'probability': p_prob,
+            'user_data': json.loads(p_data) if p_data else {},
+            'prescription': json.loads(p_prescription) if p_prescription else None
+        }
+        
+        if username is not None:
+            prediction['username'] = username
+            prediction['email'] = email
+        
+        return prediction
+    except Exception as e:
+        print(f"Error getting prediction details: {e}")
+        return None
+    finally:
+        cursor.close()
         conn.close()
-except Exception as e:
-    print(f"Error initializing database: {e}")
\ No newline at end of file
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Audit how long CardioPredict takes to import at startup.
+
+Imports every module app.py imports in a fresh interpreter with Python's
+-X importtime, then reports the slowest imports and the total cold-start time.
+Startup fails the check when it goes over the time budget or when a module
+that should only be imported on demand (LAZY_MODULES) is loaded.
+
+Usage:
+    python startup_audit.py [--top 25] [--runs 5] [--budget 2.0]
+"""
+
+import os
+import re
+import ast
+import sys
+import argparse
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+# Median cold-start seconds app.py's imports may take
+STARTUP_BUDGET = float(os.environ.get("CARDIOPREDICT_STARTUP_BUDGET", "2.0"))
+
+# Packages that are slow to import and only needed on some code paths,
+# so they must not be imported when the app starts
+LAZY_MODULES = ['sklearn', 'matplotlib', 'requests']
+
+# One line of -X importtime output: "import time: self [us] | cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# Prints the wall time of the imports, measured inside the child interpreter
+TIMED_IMPORT = """
+import time
+start = time.perf_counter()
+{imports}
+print(time.perf_counter() - start)
+"""
+
+def app_imports(path=APP_PATH):
+    """Top-level import statements of app.py, as source lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def measure_startup(imports):
+    """
+    Run the imports once in a fresh interpreter.
+
+    Returns:
+        Tuple of (wall seconds, list of (module, self us, cumulative us, depth))
+    """
+    code = TIMED_IMPORT.format(imports="\n".join(imports))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+def lazy_violations(modules):
+    """LAZY_MODULES packages that were imported at startup"""
+    loaded = {name.split('.')[0] for name, _, _, _ in modules}
+    return [package for package in LAZY_MODULES if package in loaded]
+
+def print_report(modules, top):
+    """Print the slowest imports and the cost of each top-level package"""
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, depth in sorted(modules, key=lambda m: -m[2])[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    packages = {}
+    for name, self_us, _, _ in modules:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"\n{'total ms':>14}  package")
+    for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print(f"{self_us / 1000:>14.1f}  {package}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-module import cost of app.py and check the startup budget")
+    parser.add_argument("--top", type=int, default=25, help="Modules and packages to list")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to take the median of")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="Startup budget in seconds")
+    args = parser.parse_args()
+
+    imports = app_imports()
+    try:
+        runs = [measure_startup(imports) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    # Report the run with the median wall time
+    runs.sort(key=lambda run: run[0])
+    startup, modules = runs[len(runs) // 2]
+    print_report(modules, args.top)
+
+    print(f"\nCold-start import time: {startup:.2f}s (median of {len(runs)}, budget {args.budget:.2f}s)")
+
+    failed = False
+    if startup > args.budget:
+        print(f"FAIL: startup is {startup - args.budget:.2f}s over budget")
+        failed = True
+
+    violations = lazy_violations(modules)
+    if violations:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(violations)}")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("Startup is within budget.")
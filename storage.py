@@ -0,0 +1,204 @@
+"""
+Storage backend selection for CardioPredict.
+
+The app talks to persistence only through this module. The backend is picked
+once at startup from the CARDIOPREDICT_DB_BACKEND environment variable and
+every backend module exposes the same functions with the same return shapes.
+
+The schema is created and upgraded by `python migrate.py`, run once per
+deployment. Importing this module only reads the schema version; until the
+database has been migrated the app runs as if it were offline.
+
+Every backend is checked against this interface by tests/test_storage.py:
+    python -m pytest tests/test_storage.py
+"""
+
+import os
+import time
+import importlib
+from cache import TTLCache
+from admission import StageBusy, auth_limit, persist_limit
+from passwords import PasswordWorkBusy
+from metrics import timed_query, prediction_stage_seconds, auth_seconds
+from tracing import span
+
+# Backend used when CARDIOPREDICT_DB_BACKEND is not set
+DEFAULT_BACKEND = "sqlite"
+
+# Schema version this code expects; each backend has this many MIGRATIONS
+SCHEMA_VERSION = 3
+
+# User records kept in memory, and for how many seconds
+USER_CACHE_SIZE = int(os.environ.get("CARDIOPREDICT_USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.environ.get("CARDIOPREDICT_USER_CACHE_TTL", "300"))
+
+# Backend name -> module implementing it
+BACKENDS = {
+    'sqlite': 'sqlite_database',
+    'mysql': 'mysql_database',
+    'postgres': 'database_fallback',
+}
+
+# Functions every backend must provide, with the shape each one returns
+BACKEND_FUNCTIONS = {
+    'create_user': "(success, message)",
+    'authenticate_user': "(success, user_id, is_admin)",
+    'get_authenticated_user': "user dict, or None if the login fails",
+    'save_prediction': "(success, prediction_id)",
+    'save_predictions_batch': "(success, saved_count)",
+    'get_user_predictions': "list of prediction dicts, newest first",
+    'get_user_history': "dict of 'total'/'high'/'low' counts and a 'predictions' page of summary dicts",
+    'get_user_trends': "dict of 'total', 'first'/'latest' snapshots and recent trend 'points', oldest first",
+    'get_user_by_id': "user dict or None",
+    'get_users_by_ids': "dict of user_id -> user dict",
+    'get_prediction_by_id': "prediction dict or None",
+    'get_all_users': "list of user dicts",
+    'get_all_predictions': "list of prediction summary dicts",
+    'search_predictions': "(page of prediction summary dicts, total matching count)",
+    'get_prediction_details': "prediction dict with username/email, or None",
+    'iter_predictions': "generator of lists of prediction dicts with username and user_data, oldest first",
+    'get_prediction_date_range': "(first prediction datetime, last prediction datetime), or (None, None)",
+    'get_prediction_analytics': "dict of overall counts, 'timeline' rows and 'by_user' rows",
+    'get_schema_version': "number of migrations applied, or None if the database is unreachable",
+    'migrate': "(success, message)",
+}
+
+def load_backend(name=None):
+    """Import a backend module by name and verify it implements the interface"""
+    name = name or os.environ.get("CARDIOPREDICT_DB_BACKEND", DEFAULT_BACKEND)
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+
+    module = importlib.import_module(BACKENDS[name])
+
+    missing = [func for func in BACKEND_FUNCTIONS if not hasattr(module, func)]
+    if missing:
+        raise ImportError(f"Storage backend '{name}' is missing: {', '.join(missing)}")
+
+    if len(module.MIGRATIONS) != SCHEMA_VERSION:
+        raise ImportError(f"Storage backend '{name}' has {len(module.MIGRATIONS)} migrations, "
+                          f"expected {SCHEMA_VERSION}")
+
+    return module
+
+# Backend selected for this process
+backend_name = os.environ.get("CARDIOPREDICT_DB_BACKEND", DEFAULT_BACKEND)
+backend = load_backend(backend_name)
+
+# The only database work done at startup: one query for the schema version
+schema_version = backend.get_schema_version()
+if schema_version is not None and schema_version != SCHEMA_VERSION:
+    print(f"Database schema is at version {schema_version}, this code needs {SCHEMA_VERSION}. "
+          f"Run: python migrate.py")
+db_connected = schema_version == SCHEMA_VERSION
+
+# Backend functions, each call timed into the DB query latency metrics
+queries = {name: timed_query(backend_name, getattr(backend, name)) for name in BACKEND_FUNCTIONS}
+
+authenticate_user = queries['authenticate_user']
+save_predictions_batch = queries['save_predictions_batch']
+get_user_predictions = queries['get_user_predictions']
+get_user_history = queries['get_user_history']
+get_user_trends = queries['get_user_trends']
+get_prediction_by_id = queries['get_prediction_by_id']
+get_all_users = queries['get_all_users']
+get_all_predictions = queries['get_all_predictions']
+search_predictions = queries['search_predictions']
+get_prediction_details = queries['get_prediction_details']
+iter_predictions = queries['iter_predictions']
+get_prediction_date_range = queries['get_prediction_date_range']
+get_prediction_analytics = queries['get_prediction_analytics']
+
+# User records by ID, shared by every session in this process
+user_cache = TTLCache("users", maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def invalidate_user(user_id=None):
+    """Drop a cached user after it changes, or every cached user if no ID is given"""
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.invalidate(user_id)
+
+def create_user(username, email, password):
+    """
+    Create a new user account, returning (success, message).
+
+    Raises StageBusy when too many sign-ins or sign-ups are already in progress.
+    """
+    try:
+        with auth_limit.slot():
+            result = queries['create_user'](username, email, password)
+    except PasswordWorkBusy as e:
+        raise StageBusy(str(e)) from e
+    if result[0]:
+        # A new user can reuse the ID of one removed outside the app
+        invalidate_user()
+    return result
+
+def get_authenticated_user(username, password):
+    """
+    Authenticate a user, returning their record from the same query and caching it.
+
+    Raises StageBusy when too many sign-ins are already in progress, whether
+    waiting for a sign-in slot or for the password hashing pool.
+    """
+    start = time.perf_counter()
+    try:
+        with auth_limit.slot():
+            user = queries['get_authenticated_user'](username, password)
+    except StageBusy:
+        auth_seconds.observe(time.perf_counter() - start, result="busy")
+        raise
+    except PasswordWorkBusy as e:
+        auth_seconds.observe(time.perf_counter() - start, result="busy")
+        raise StageBusy(str(e)) from e
+    auth_seconds.observe(time.perf_counter() - start, result="success" if user else "failure")
+    if user:
+        user_cache.set(user['id'], dict(user))
+        return dict(user)
+    return None
+
+def save_prediction(user_id, risk_level, probability, user_data, prescription=None):
+    """
+    Save a prediction, returning (success, prediction_id).
+
+    Raises StageBusy when too many saves are already in progress.
+    """
+    with span("save_prediction"), persist_limit.slot(), prediction_stage_seconds.time(stage="persist"):
+        return queries['save_prediction'](user_id, risk_level, probability, user_data, prescription)
+
+def get_user_by_id(user_id):
+    """Get user by ID, served from the user cache when possible"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = queries['get_user_by_id'](user_id)
+        if user is None:
+            return None
+        user_cache.set(user_id, dict(user))
+    # Callers get a copy so they cannot change the cached record
+    return dict(user)
+
+def get_users_by_ids(user_ids):
+    """Get several users, fetching only the ones missing from the cache"""
+    result = {}
+    missing = []
+    for user_id in set(user_ids):
+        user = user_cache.get(user_id)
+        if user is None:
+            missing.append(user_id)
+        else:
+            result[user_id] = dict(user)
+    
+    if missing:
+        for user_id, user in queries['get_users_by_ids'](missing).items():
+            user_cache.set(user_id, dict(user))
+            result[user_id] = dict(user)
+    
+    return result
+
+def end_script_run():
+    """Release anything the backend holds for the current script run, such as its session"""
+    hook = getattr(backend, 'end_script_run', None)
+    if hook is not None:
+        hook()
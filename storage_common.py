@@ -0,0 +1,29 @@
+"""
+Row shapes shared by every CardioPredict storage backend.
+
+The backends differ in SQL dialect and driver, but hand back the same
+dictionaries; what those dictionaries contain is decided here, once.
+"""
+
+# Prediction inputs included in history summaries
+SUMMARY_FEATURES = ('age', 'sex', 'chol', 'trestbps', 'thalach')
+
+# Columns of a trend row, in query order
+TREND_COLUMNS = ('id', 'date', 'risk_level', 'risk_probability', 'age', 'chol', 'trestbps', 'thalach', 'rolling_risk', 'chol_delta', 'trestbps_delta', 'thalach_delta', 'position', 'recency')
+
+def build_trends(rows, limit):
+    """Split trend rows, ordered by position, into the trend dictionary"""
+    trends = {'total': 0, 'first': None, 'latest': None, 'points': []}
+
+    for row in rows:
+        point = dict(row)
+        recency = point.pop('recency')
+        if point['position'] == 1:
+            trends['first'] = point
+        if recency == 1:
+            trends['latest'] = point
+            trends['total'] = point['position']
+        if recency <= limit:
+            trends['points'].append(point)
+
+    return trends
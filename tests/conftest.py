@@ -0,0 +1,30 @@
+"""
+Shared setup for the CardioPredict tests.
+
+Runs before any app module is imported: puts the repository on the path and
+points every backend at scratch databases, so the tests never touch
+cardiopredict.db or a configured server.
+
+    CARDIOPREDICT_TEST_DATABASE_URL  SQLAlchemy URL for the postgres backend
+                                     (default: a scratch SQLite file)
+    MYSQL_HOST, MYSQL_USER, ...      MySQL-compatible server for the mysql backend
+                                     (its tests are skipped without MYSQL_HOST)
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="cardiopredict_tests_")
+
+os.environ["CARDIOPREDICT_DB_BACKEND"] = "sqlite"
+os.environ["CARDIOPREDICT_SQLITE_PATH"] = os.path.join(SCRATCH_DIR, "sqlite.db")
+os.environ["DATABASE_URL"] = os.environ.get(
+    "CARDIOPREDICT_TEST_DATABASE_URL", f"sqlite:///{os.path.join(SCRATCH_DIR, 'sqlalchemy.db')}"
+)
+# Keep the tests off the live app's metrics port and out of its trace file
+os.environ["CARDIOPREDICT_METRICS_PORT"] = "0"
+os.environ["CARDIOPREDICT_TRACE_SAMPLE_RATE"] = "0"
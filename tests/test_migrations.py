@@ -0,0 +1,99 @@
+"""
+Upgrade checks: migrate() must bring a database created by older code up to
+the current schema, not just create missing tables.
+
+Each backend is pointed at a fresh SQLite file holding the original schema,
+before users.is_admin and the prediction_history indexes existed.
+"""
+
+import os
+import queue
+import sqlite3
+
+import pytest
+
+from conftest import SCRATCH_DIR
+from passwords import hash_password
+from storage import SCHEMA_VERSION, load_backend
+
+# The schema as the first release created it
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password_hash VARCHAR(128) NOT NULL,
+    created_at DATETIME
+);
+CREATE TABLE prediction_history (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    prediction_date DATETIME,
+    risk_level VARCHAR(10) NOT NULL,
+    probability FLOAT NOT NULL,
+    user_data TEXT NOT NULL,
+    prescription TEXT
+);
+"""
+
+def create_legacy_database(path):
+    """A database with LEGACY_SCHEMA and one user, 'legacy', password 'legacy-password'"""
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                 ('legacy', 'legacy@example.com', hash_password('legacy-password')))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def legacy_backend(request, monkeypatch):
+    """A backend pointed at a new legacy database instead of its scratch database"""
+    path = os.path.join(SCRATCH_DIR, f"legacy_{request.param}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    create_legacy_database(path)
+
+    module = load_backend(request.param)
+    monkeypatch.setattr(module, 'db_connected', module.db_connected)
+    if request.param == 'sqlite':
+        monkeypatch.setattr(module, 'DB_FILE', path)
+        monkeypatch.setattr(module, '_pool', queue.LifoQueue(maxsize=module.POOL_SIZE))
+        yield module
+    else:
+        from sqlalchemy.orm import sessionmaker, scoped_session
+
+        url = f"sqlite:///{path}"
+        engine = module.db.create_engine(url, **module.engine_options(url))
+        session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+        monkeypatch.setattr(module, 'engine', engine)
+        monkeypatch.setattr(module, 'ScopedSession', scoped_session(session_factory))
+        yield module
+        module.end_script_run()
+        engine.dispose()
+
+def test_migrate_upgrades_legacy_schema(legacy_backend):
+    assert legacy_backend.get_schema_version() == 0
+
+    success, message = legacy_backend.migrate()
+    assert success, message
+    assert legacy_backend.get_schema_version() == SCHEMA_VERSION
+
+    user = legacy_backend.get_authenticated_user('legacy', 'legacy-password')
+    assert user and user['is_admin'] is False, user
+
+    success, message = legacy_backend.create_user('upgraded', 'upgraded@example.com', 'upgraded-password')
+    assert success, message
+    assert legacy_backend.authenticate_user('upgraded', 'upgraded-password')[0]
+
+def test_migrate_creates_prediction_indexes(legacy_backend):
+    success, message = legacy_backend.migrate()
+    assert success, message
+
+    path = legacy_backend.DB_FILE if hasattr(legacy_backend, 'DB_FILE') else legacy_backend.engine.url.database
+    conn = sqlite3.connect(path)
+    indexes = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                                "AND tbl_name = 'prediction_history' AND sql IS NOT NULL").fetchall())
+    conn.close()
+    # Every backend creates the same named indexes
+    assert set(indexes) == {'idx_prediction_history_date', 'idx_prediction_history_user'}, indexes
+    assert "(user_id, prediction_date)" in indexes['idx_prediction_history_user'].replace('"', ''), indexes
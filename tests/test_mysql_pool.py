@@ -0,0 +1,106 @@
+"""
+Checks for the MySQL backend against a real server: the connection pool under
+concurrency, and queries whose SQL differs between MySQL and MariaDB.
+
+Skipped unless MYSQL_HOST is set. Point MYSQL_HOST, MYSQL_PORT, MYSQL_USER,
+MYSQL_PASSWORD and MYSQL_DATABASE at a throwaway MySQL or MariaDB server,
+for example a mariadb service container in CI.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get("MYSQL_HOST"),
+                                reason="Set MYSQL_HOST to test against a MySQL-compatible server")
+
+@pytest.fixture(scope="module")
+def mysql_database():
+    import mysql_database
+
+    if mysql_database.get_schema_version() is None:
+        pytest.fail(f"MySQL server at {mysql_database.DB_CONFIG['host']} is not reachable")
+    success, message = mysql_database.migrate()
+    assert success, message
+    return mysql_database
+
+def test_pool_stays_bounded_under_concurrency(mysql_database):
+    pool = mysql_database.pool
+    limit = pool.size + pool.max_overflow
+    peak = {'open': 0}
+    lock = threading.Lock()
+
+    def worker(i):
+        conn = mysql_database.get_connection()
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        try:
+            with lock:
+                peak['open'] = max(peak['open'], pool.stats()['open'])
+            cursor.execute("SELECT SLEEP(0.01), %s", (i,))
+            return cursor.fetchone()[1] == i
+        finally:
+            cursor.close()
+            conn.close()
+
+    # Far more threads than connections, so checkouts have to wait for each other
+    with ThreadPoolExecutor(max_workers=limit * 3) as executor:
+        results = list(executor.map(worker, range(1000)))
+
+    assert all(results), f"{results.count(False)} of {len(results)} queries failed"
+    assert peak['open'] <= limit, peak
+    stats = pool.stats()
+    assert stats['in_use'] == 0 and stats['idle'] <= pool.size, stats
+
+def test_dead_connection_is_replaced(mysql_database):
+    pool = mysql_database.pool
+
+    conn = pool.checkout()
+    killer = pool.checkout()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT CONNECTION_ID()")
+        dead_id = cursor.fetchone()[0]
+        cursor.close()
+        # Back in the pool, it is the next connection handed out
+        conn.close()
+
+        # Kill it from another session, as a server restart or idle timeout would
+        cursor = killer.cursor()
+        cursor.execute(f"KILL {int(dead_id)}")
+        cursor.close()
+
+        # The pre-ping notices and opens a fresh connection instead
+        conn = pool.checkout()
+        cursor = conn.cursor()
+        cursor.execute("SELECT CONNECTION_ID()")
+        assert cursor.fetchone()[0] != dead_id
+        cursor.close()
+        conn.close()
+    finally:
+        killer.close()
+
+def test_user_trends_window_functions(mysql_database):
+    # Inline OVER clauses only: MariaDB has no named WINDOW clause
+    username = f"trends_{int(time.time() * 1000)}"
+    success, message = mysql_database.create_user(username, f"{username}@example.com", "trends-password")
+    assert success, message
+    user_id = mysql_database.authenticate_user(username, "trends-password")[1]
+
+    success, count = mysql_database.save_predictions_batch([
+        {'user_id': user_id, 'risk_level': 'High', 'probability': 0.6,
+         'user_data': {'age': 50, 'chol': 200 + i, 'trestbps': 120, 'thalach': 150}}
+        for i in range(10)
+    ])
+    assert success and count == 10, (success, count)
+
+    trends = mysql_database.get_user_trends(user_id, window=3, limit=4)
+    assert trends['total'] == 10 and len(trends['points']) == 4, trends
+    assert trends['first']['position'] == 1 and trends['first']['chol_delta'] is None
+    assert trends['latest']['position'] == 10 and trends['latest']['chol'] == 209
+    assert all(point['chol_delta'] == 1 and point['trestbps_delta'] == 0 for point in trends['points'])
+    assert trends['latest']['rolling_risk'] == pytest.approx(0.6)
@@ -0,0 +1,40 @@
+"""Bounds on the password hashing pool"""
+
+import threading
+
+import pytest
+
+import passwords
+from passwords import PasswordWorkBusy
+
+@pytest.fixture
+def one_slot_pool(monkeypatch):
+    """A started one-worker hashing pool that admits one job at a time"""
+    monkeypatch.setattr(passwords, "HASH_WORKERS", 1)
+    monkeypatch.setattr(passwords, "_pending", threading.BoundedSemaphore(1))
+    passwords.shutdown()
+    # Start the worker now, so the timed jobs below begin running as soon as they are submitted
+    passwords.hash_password("warm-up", rounds=4)
+    yield passwords._pending
+    passwords.shutdown()
+
+def test_full_pool_rejects_at_once(one_slot_pool):
+    one_slot_pool.acquire()
+    try:
+        with pytest.raises(PasswordWorkBusy, match="Too many"):
+            passwords.verify_password("password", passwords._hashpw("password", 4))
+    finally:
+        one_slot_pool.release()
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes(one_slot_pool, monkeypatch):
+    monkeypatch.setattr(passwords, "HASH_TIMEOUT", 0.05)
+
+    # Still running in the worker when the caller stops waiting
+    with pytest.raises(PasswordWorkBusy, match="taking too long"):
+        passwords.hash_password("slow-password", rounds=14)
+    with pytest.raises(PasswordWorkBusy, match="Too many"):
+        passwords.hash_password("next-password", rounds=4)
+
+    # The slot comes back once the abandoned hash is done
+    assert one_slot_pool.acquire(timeout=30)
+    one_slot_pool.release()
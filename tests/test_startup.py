@@ -0,0 +1,32 @@
+"""
+Cold-start checks for app.py's imports, the same ones `python startup_audit.py` reports.
+
+The budget is CARDIOPREDICT_STARTUP_BUDGET seconds, as for the audit.
+"""
+
+import pytest
+
+from startup_audit import STARTUP_BUDGET, app_imports, lazy_violations, measure_startup
+
+# Cold starts to take the median of
+RUNS = 3
+
+@pytest.fixture(scope="module")
+def startup():
+    """Median (wall seconds, imported modules) over RUNS cold starts of the app's imports"""
+    imports = app_imports()
+    runs = sorted((measure_startup(imports) for _ in range(RUNS)), key=lambda run: run[0])
+    return runs[len(runs) // 2]
+
+def test_app_imports_are_found():
+    imports = app_imports()
+    assert any(line.startswith("import streamlit") for line in imports), imports
+
+def test_lazy_modules_are_not_imported(startup):
+    _, modules = startup
+    assert modules, "-X importtime reported no imports"
+    assert lazy_violations(modules) == []
+
+def test_startup_within_budget(startup):
+    seconds, _ = startup
+    assert seconds <= STARTUP_BUDGET, f"Cold start took {seconds:.2f}s, budget {STARTUP_BUDGET:.2f}s"
@@ -0,0 +1,249 @@
+"""
+Conformance and timing checks every storage backend must pass.
+
+Each backend in storage.BACKENDS is migrated and exercised against the scratch
+database conftest.py points it at. A backend whose database cannot be reached
+is skipped.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import passwords
+import storage
+from admission import StageBusy
+from passwords import PasswordWorkBusy
+from storage import BACKENDS, SCHEMA_VERSION, load_backend
+
+# Predictions written for the test user, half one at a time and half in a batch
+N_PREDICTIONS = 200
+
+# Most seconds any one timed backend call may take against the scratch database
+QUERY_BUDGET = float(os.environ.get("CARDIOPREDICT_TEST_QUERY_BUDGET", "2.0"))
+
+USER_DATA = {'age': 50, 'sex': 1, 'cp': 0, 'trestbps': 130, 'chol': 220, 'fbs': 0,
+             'restecg': 0, 'thalach': 150, 'exang': 0, 'oldpeak': 1.0, 'slope': 1}
+
+@pytest.fixture(scope="module", params=list(BACKENDS))
+def backend(request):
+    """A migrated backend module"""
+    if request.param == 'mysql' and not os.environ.get("MYSQL_HOST"):
+        pytest.skip("Set MYSQL_HOST to test against a MySQL-compatible server")
+    module = load_backend(request.param)
+    if module.get_schema_version() is None:
+        pytest.skip(f"Storage backend '{request.param}' is not reachable")
+
+    success, message = module.migrate()
+    assert success, message
+    return module
+
+@pytest.fixture(scope="module")
+def account(backend):
+    """A throwaway user with N_PREDICTIONS predictions, and how long each write took"""
+    timings = {}
+    username = f"conformance_{int(time.time() * 1000)}"
+    password = "conformance-password"
+
+    start = time.perf_counter()
+    success, message = backend.create_user(username, f"{username}@example.com", password)
+    timings['create_user'] = time.perf_counter() - start
+    assert success, message
+
+    success, user_id, is_admin = backend.authenticate_user(username, password)
+    assert success and user_id and is_admin is False
+
+    records = [
+        {'user_id': user_id, 'risk_level': 'High' if i % 2 else 'Low',
+         'probability': 0.5 + (i % 50) / 100, 'user_data': USER_DATA}
+        for i in range(N_PREDICTIONS)
+    ]
+
+    start = time.perf_counter()
+    for record in records[:N_PREDICTIONS // 2]:
+        success, prediction_id = backend.save_prediction(**record)
+        assert success and prediction_id, (success, prediction_id)
+    timings['save_prediction'] = (time.perf_counter() - start) / (N_PREDICTIONS // 2)
+
+    start = time.perf_counter()
+    success, count = backend.save_predictions_batch(records[N_PREDICTIONS // 2:])
+    timings['save_predictions_batch'] = time.perf_counter() - start
+    assert success and count == N_PREDICTIONS - N_PREDICTIONS // 2, (success, count)
+
+    predictions = backend.get_user_predictions(user_id, limit=N_PREDICTIONS)
+    return {
+        'user_id': user_id,
+        'username': username,
+        'password': password,
+        'predictions': predictions,
+        'timings': timings
+    }
+
+def timed(account, name, func, *args, **kwargs):
+    """Call a backend function, recording how long it took under `name`"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    account['timings'][name] = time.perf_counter() - start
+    return result
+
+def test_migrate_is_idempotent(backend):
+    success, message = backend.migrate()
+    assert success, message
+    assert backend.get_schema_version() == SCHEMA_VERSION
+    assert len(backend.MIGRATIONS) == SCHEMA_VERSION
+
+def test_authentication(backend, account):
+    username, password = account['username'], account['password']
+
+    assert backend.authenticate_user(username, "wrong-password") == (False, None, False)
+    assert backend.get_authenticated_user(username, "wrong-password") is None
+
+    record = timed(account, 'get_authenticated_user', backend.get_authenticated_user, username, password)
+    assert record['id'] == account['user_id'] and record['username'] == username
+    assert 'password_hash' not in record
+
+def test_create_user_rejects_duplicates(backend, account):
+    success, message = backend.create_user(account['username'], "other@example.com", "another-password")
+    assert not success and message
+
+def test_users(backend, account):
+    user_id = account['user_id']
+
+    user = timed(account, 'get_user_by_id', backend.get_user_by_id, user_id)
+    assert isinstance(user, dict) and user['username'] == account['username'], user
+    assert set(user) >= {'id', 'username', 'email', 'is_admin'}
+    assert backend.get_users_by_ids([user_id, user_id])[user_id]['username'] == account['username']
+    assert any(u['id'] == user_id for u in backend.get_all_users())
+
+def test_predictions(backend, account):
+    predictions = account['predictions']
+    assert len(predictions) == N_PREDICTIONS
+    assert set(predictions[0]) >= {'id', 'date', 'risk_level', 'probability', 'user_data', 'prescription'}
+
+    prediction = timed(account, 'get_prediction_by_id', backend.get_prediction_by_id, predictions[0]['id'])
+    assert prediction['user_id'] == account['user_id'] and prediction['user_data'] == USER_DATA, prediction
+    assert isinstance(prediction['date'], datetime), prediction['date']
+
+    details = timed(account, 'get_prediction_details', backend.get_prediction_details, predictions[0]['id'])
+    assert details['username'] == account['username'], details
+
+def test_user_history(backend, account):
+    history = timed(account, 'get_user_history', backend.get_user_history, account['user_id'], limit=15, offset=10)
+    assert (history['total'], history['high'], history['low']) == (
+        N_PREDICTIONS, N_PREDICTIONS // 2, N_PREDICTIONS - N_PREDICTIONS // 2), history
+    # IDs grow with prediction time, so newest first is descending ID order
+    ids = sorted((p['id'] for p in account['predictions']), reverse=True)
+    assert [p['id'] for p in history['predictions']] == ids[10:25]
+
+    summary = history['predictions'][0]
+    assert isinstance(summary['date'], datetime) and summary['has_prescription'] is False, summary
+    assert 'prescription' not in summary
+    assert set(summary['user_data']) == {'age', 'sex', 'chol', 'trestbps', 'thalach'}, summary
+
+def test_user_trends(backend, account):
+    predictions = account['predictions']
+    trends = timed(account, 'get_user_trends', backend.get_user_trends, account['user_id'], window=4, limit=20)
+    assert trends['total'] == N_PREDICTIONS and len(trends['points']) == 20
+    assert trends['first']['position'] == 1 and trends['latest']['position'] == N_PREDICTIONS
+    assert trends['latest'] is trends['points'][-1]
+    assert trends['latest']['id'] == max(p['id'] for p in predictions)
+    assert trends['first']['chol'] == 220 and trends['first']['chol_delta'] is None, trends['first']
+    assert all(p['chol_delta'] == 0 for p in trends['points'])
+
+    # Rolling average over the last 4 risk probabilities, recomputed from the stored probabilities
+    by_id = {p['id']: (p['probability'] if p['risk_level'] == 'High' else 1 - p['probability']) for p in predictions}
+    ordered = [by_id[i] for i in sorted(by_id)]
+    assert trends['latest']['rolling_risk'] == pytest.approx(sum(ordered[-4:]) / 4)
+
+def test_search_predictions(backend, account):
+    username, predictions = account['username'], account['predictions']
+
+    all_predictions = timed(account, 'get_all_predictions', backend.get_all_predictions)
+    assert {'id', 'user_id', 'username', 'prediction_date', 'risk_level', 'probability'} <= set(all_predictions[0])
+
+    page, total = timed(account, 'search_predictions', backend.search_predictions,
+                        username, risk_level='High', limit=10, offset=5)
+    assert total == N_PREDICTIONS // 2 and len(page) == 10, (total, len(page))
+    assert all(p['username'] == username and p['risk_level'] == 'High' for p in page)
+
+    page, total = backend.search_predictions(str(predictions[0]['id']))
+    assert any(p['id'] == predictions[0]['id'] for p in page), page
+    assert backend.search_predictions("no_such_user_%_") == ([], 0)
+
+def test_iter_predictions(backend, account):
+    chunks = timed(account, 'iter_predictions', lambda: list(
+        backend.iter_predictions(search=account['username'], risk_level='Low', chunk_size=30)))
+    assert len(chunks[0]) == 30 and all(len(chunk) <= 30 for chunk in chunks)
+
+    exported = [p for chunk in chunks for p in chunk]
+    assert len(exported) == N_PREDICTIONS // 2 and exported[0]['user_data'] == USER_DATA
+    assert [p['id'] for p in exported] == sorted(p['id'] for p in exported)
+
+def test_save_during_export(backend, account):
+    # Saved for another user, so the account's counts stay as the other tests expect
+    username = f"{account['username']}_writer"
+    success, message = backend.create_user(username, f"{username}@example.com", account['password'])
+    assert success, message
+    writer_id = backend.authenticate_user(username, account['password'])[1]
+
+    # An export part way through still holds its read open
+    chunks = backend.iter_predictions(search=account['username'], chunk_size=10)
+    assert len(next(chunks)) == 10
+    try:
+        success, prediction_id = timed(account, 'save_prediction_during_export', backend.save_prediction,
+                                       writer_id, 'Low', 0.7, USER_DATA)
+        assert success and prediction_id, (success, prediction_id)
+    finally:
+        chunks.close()
+
+def test_prediction_analytics(backend, account):
+    analytics = timed(account, 'get_prediction_analytics', backend.get_prediction_analytics, bucket='week')
+    assert analytics['total'] >= N_PREDICTIONS
+    assert analytics['high'] + analytics['low'] == analytics['total'], analytics
+    assert sum(row['count'] for row in analytics['timeline']) == analytics['total']
+    assert all(len(row['period']) == 10 for row in analytics['timeline']), analytics['timeline'][:3]
+
+    mine = [row for row in analytics['by_user'] if row['user_id'] == account['user_id']]
+    assert mine and mine[0]['total'] == N_PREDICTIONS and mine[0]['high'] == N_PREDICTIONS // 2, mine
+
+    hourly = backend.get_prediction_analytics(bucket='hour', top_users=1)
+    assert all(row['period'].endswith(':00') for row in hourly['timeline']), hourly['timeline'][:3]
+    assert len(hourly['by_user']) <= 1
+
+    counts_only = backend.get_prediction_analytics(bucket=None, top_users=0)
+    assert counts_only['timeline'] == [] and counts_only['by_user'] == [], counts_only
+    assert counts_only['total'] == analytics['total'] and counts_only['high'] == analytics['high']
+
+    future = backend.get_prediction_analytics(since=datetime.utcnow() + timedelta(days=1), bucket='month')
+    assert future['total'] == 0 and future['timeline'] == [] and future['by_user'] == [], future
+
+    first, last = backend.get_prediction_date_range()
+    assert isinstance(first, datetime) and first <= last, (first, last)
+
+def test_busy_hash_pool_is_not_a_failed_login(backend, account, monkeypatch):
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, "HASH_WORKERS", 1)
+    monkeypatch.setattr(passwords, "_pending", full)
+
+    with pytest.raises(PasswordWorkBusy):
+        backend.get_authenticated_user(account['username'], account['password'])
+
+def test_query_budget(backend, account):
+    # Runs last in this module, after the other tests have timed their calls
+    slow = {name: elapsed for name, elapsed in account['timings'].items() if elapsed > QUERY_BUDGET}
+    assert not slow, f"Over the {QUERY_BUDGET}s budget: {slow}"
+
+def test_busy_sign_in_raises_stage_busy(monkeypatch):
+    def busy(*args):
+        raise PasswordWorkBusy("Too many sign-ins in progress. Please try again in a moment.")
+    monkeypatch.setitem(storage.queries, 'get_authenticated_user', busy)
+    monkeypatch.setitem(storage.queries, 'create_user', busy)
+
+    with pytest.raises(StageBusy, match="Too many sign-ins"):
+        storage.get_authenticated_user("someone", "some-password")
+    with pytest.raises(StageBusy, match="Too many sign-ins"):
+        storage.create_user("someone", "someone@example.com", "some-password")
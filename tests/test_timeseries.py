@@ -0,0 +1,39 @@
+"""
+Bucket choice and LTTB downsampling for the chart helpers in timeseries.py.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from timeseries import choose_bucket, downsample, lttb
+
+NOW = datetime(2024, 1, 1)
+
+def test_choose_bucket_picks_finest_within_budget():
+    assert choose_bucket(NOW - timedelta(days=7), NOW) == 'hour'
+    assert choose_bucket(NOW - timedelta(days=90), NOW) == 'day'
+    assert choose_bucket(NOW - timedelta(days=3 * 365), NOW) == 'week'
+    assert choose_bucket(NOW - timedelta(days=30 * 365), NOW) == 'month'
+    assert choose_bucket(NOW, NOW) == 'hour'
+    assert choose_bucket(None, None) == 'day'
+
+def test_lttb_keeps_ends_and_spikes():
+    xs = list(range(100000))
+    ys = [math.sin(x / 500) + (5 if x == 54321 else 0) for x in xs]
+    kept = lttb(xs, ys, 500)
+    assert len(kept) == 500 and kept[0] == 0 and kept[-1] == len(xs) - 1
+    assert kept == sorted(set(kept))
+    assert 54321 in kept, "LTTB dropped the spike"
+
+def test_lttb_leaves_short_series_alone():
+    assert lttb(list(range(10)), [0] * 10, 500) == list(range(10))
+
+def test_downsample_dataframe():
+    df = pd.DataFrame({'when': [NOW + timedelta(hours=i) for i in range(2000)],
+                       'value': [math.cos(i / 50) for i in range(2000)]})
+    reduced = downsample(df, 'when', 'value', threshold=100)
+    assert len(reduced) == 100
+    assert reduced['when'].iloc[0] == df['when'].iloc[0] and reduced['when'].iloc[-1] == df['when'].iloc[-1]
+    assert len(downsample(df.head(50), 'when', 'value', threshold=100)) == 50
@@ -0,0 +1,98 @@
+"""
+Time-series helpers for CardioPredict charts.
+
+Plotly sends every point to the browser on each rerun, so long histories are
+either grouped into coarser buckets or downsampled before they are charted.
+Both keep a chart series within CHART_POINT_BUDGET points.
+"""
+
+import os
+from datetime import datetime
+
+# Most points drawn for one chart series
+CHART_POINT_BUDGET = int(os.environ.get("CARDIOPREDICT_CHART_POINT_BUDGET", "500"))
+
+# Timeline bucket sizes from finest to coarsest, with their approximate length in seconds
+BUCKET_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400
+}
+
+def choose_bucket(start, end, budget=CHART_POINT_BUDGET):
+    """
+    Pick the finest bucket size that covers start..end in at most `budget` buckets.
+
+    Falls back to the coarsest bucket when even that needs more buckets than the budget.
+    """
+    if start is None or end is None:
+        return 'day'
+
+    span = max((end - start).total_seconds(), 0)
+    for bucket, seconds in BUCKET_SECONDS.items():
+        if span // seconds + 1 <= budget:
+            return bucket
+    return 'month'
+
+def lttb(xs, ys, threshold=CHART_POINT_BUDGET):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points, and from each bucket in between the point
+    that forms the largest triangle with its neighbours, so peaks survive.
+
+    Args:
+        xs: Numeric x values in ascending order
+        ys: Numeric y values, same length as xs
+        threshold: Number of points to keep
+
+    Returns:
+        Indexes of the kept points, in ascending order
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    kept = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # Index of the point kept from the previous bucket
+
+    for i in range(threshold - 2):
+        # Current bucket
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket, which the triangle's third corner is placed at
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+
+        kept.append(best)
+        a = best
+
+    kept.append(n - 1)
+    return kept
+
+def downsample(df, x, y, threshold=CHART_POINT_BUDGET):
+    """
+    Return the rows of a DataFrame kept by LTTB on columns x and y.
+
+    Dates in x are compared as timestamps. The DataFrame must be sorted by x.
+    """
+    if len(df) <= threshold:
+        return df
+
+    x_values = df[x].tolist()
+    if x_values and isinstance(x_values[0], datetime):
+        x_values = [value.timestamp() for value in x_values]
+
+    return df.iloc[lttb(x_values, df[y].tolist(), threshold)]
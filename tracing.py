@@ -0,0 +1,229 @@
+"""
+Lightweight tracing for the CardioPredict prediction path.
+
+A trace is a tree of timed spans, for example a prediction with its model
+scoring, figure building and save. Only TRACE_SAMPLE_RATE of traces are kept.
+In an unsampled trace every span is a no-op. Each kept trace becomes one JSON
+line in TRACE_FILE.
+
+    with trace("prediction"):
+        with span("inference"):
+            ...
+
+Spans follow the current thread, or the asyncio task, through contextvars.
+Work handed to another thread can be recorded with capture() and attached to
+the waiting span with Span.adopt(), as the micro-batcher does.
+
+Summarise a trace file from the command line:
+    python tracing.py [traces.jsonl] [--top 10]
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+
+# Fraction of traces written to the trace file; 0 turns tracing off
+TRACE_SAMPLE_RATE = float(os.environ.get("CARDIOPREDICT_TRACE_SAMPLE_RATE", "0.1"))
+
+# JSONL file traces are appended to
+TRACE_FILE = os.environ.get("CARDIOPREDICT_TRACE_FILE", "traces.jsonl")
+
+# Span that new spans in this context nest under, or None outside a sampled trace
+_current = contextvars.ContextVar("cardiopredict_span", default=None)
+
+_write_lock = threading.Lock()
+
+class Span:
+    """One timed operation and the spans nested inside it"""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.children = []
+        self.start = time.perf_counter()
+        self.end = None
+        self._lock = threading.Lock()
+
+    def finish(self):
+        self.end = time.perf_counter()
+        if self.parent is not None:
+            self.parent.add_child(self)
+
+    def add_child(self, child):
+        with self._lock:
+            self.children.append(child)
+
+    def adopt(self, spans, **attributes):
+        """Attach finished spans recorded elsewhere, such as on a worker thread"""
+        for child in spans:
+            child.attributes.update(attributes)
+            self.add_child(child)
+
+    def flatten(self, origin, path=""):
+        """This span and its descendants as records, with times relative to origin"""
+        path = f"{path}/{self.name}" if path else self.name
+        record = {
+            'path': path,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(((self.end or time.perf_counter()) - self.start) * 1000, 3)
+        }
+        if self.attributes:
+            record['attributes'] = self.attributes
+        records = [record]
+        for child in sorted(self.children, key=lambda span: span.start):
+            records.extend(child.flatten(origin, path))
+        return records
+
+def current_span():
+    """The span new spans would nest under, or None if the current trace is not sampled"""
+    return _current.get()
+
+@contextmanager
+def trace(name, sample_rate=None, **attributes):
+    """Start a trace, sampled at TRACE_SAMPLE_RATE, and write it out when it ends"""
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or random.random() >= rate:
+        token = _current.set(None)
+        try:
+            yield None
+        finally:
+            _current.reset(token)
+        return
+
+    root = Span(name, attributes=attributes)
+    timestamp = datetime.now().isoformat(timespec='milliseconds')
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        _current.reset(token)
+        root.finish()
+        write_trace({
+            'trace_id': uuid.uuid4().hex[:16],
+            'name': name,
+            'timestamp': timestamp,
+            'duration_ms': round((root.end - root.start) * 1000, 3),
+            'spans': root.flatten(root.start)
+        })
+
+@contextmanager
+def span(name, **attributes):
+    """Time the body of a with block as a child of the current span, if the trace is sampled"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent=parent, attributes=attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        _current.reset(token)
+        child.finish()
+
+@contextmanager
+def capture():
+    """
+    Record the spans opened in the body of a with block, whatever the sampling.
+
+    Yields a list that holds the finished top-level spans once the block ends.
+    """
+    holder = Span("capture")
+    token = _current.set(holder)
+    spans = []
+    try:
+        yield spans
+    finally:
+        _current.reset(token)
+        spans.extend(holder.children)
+
+def write_trace(record, path=None):
+    """Append one trace to the trace file"""
+    try:
+        line = json.dumps(record, default=str)
+        with _write_lock, open(path or TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Error writing trace: {e}")
+
+def load_traces(path=TRACE_FILE):
+    """Read every trace in a trace file, skipping lines that are not valid JSON"""
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                traces.append(json.loads(line))
+            except ValueError:
+                continue
+    return traces
+
+def summarize(traces):
+    """
+    Timing statistics per span path, slowest total time first.
+
+    Returns:
+        List of dicts with path, count, mean/p50/p95/max in ms and share of trace time
+    """
+    durations = {}
+    total_trace_ms = sum(t['duration_ms'] for t in traces) or 1.0
+    for t in traces:
+        for s in t['spans']:
+            durations.setdefault(s['path'], []).append(s['duration_ms'])
+
+    summary = []
+    for path, values in durations.items():
+        values.sort()
+        summary.append({
+            'path': path,
+            'count': len(values),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': values[len(values) // 2],
+            'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max_ms': values[-1],
+            'share': sum(values) / total_trace_ms
+        })
+    summary.sort(key=lambda row: -row['mean_ms'] * row['count'])
+    return summary
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise the slowest stages in a CardioPredict trace file")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE, help="Trace file to read")
+    parser.add_argument("--top", type=int, default=10, help="Stages and traces to list")
+    parser.add_argument("--name", help="Only traces with this root name, e.g. prediction")
+    args = parser.parse_args()
+
+    try:
+        traces = load_traces(args.path)
+    except OSError as e:
+        print(f"Cannot read {args.path}: {e}")
+        sys.exit(1)
+    if args.name:
+        traces = [t for t in traces if t['name'] == args.name]
+    if not traces:
+        print(f"No traces in {args.path}.")
+        sys.exit(0)
+
+    print(f"{len(traces)} traces from {args.path}\n")
+    print(f"{'stage':<48} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'share':>6}")
+    for row in summarize(traces)[:args.top]:
+        print(f"{row['path']:<48} {row['count']:>6} {row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['max_ms']:>9.1f} {row['share']:>6.0%}")
+
+    print("\nSlowest traces:")
+    for t in sorted(traces, key=lambda t: -t['duration_ms'])[:args.top]:
+        # The slowest direct child of the root is usually what to look at first
+        children = [s for s in t['spans'] if s['path'].count("/") == 1]
+        slowest = max(children, key=lambda s: s['duration_ms'], default=None)
+        detail = f"  slowest stage {slowest['path']} {slowest['duration_ms']:.1f} ms" if slowest else ""
+        print(f"  {t['timestamp']}  {t['trace_id']}  {t['duration_ms']:9.1f} ms{detail}")
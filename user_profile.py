@@ -1,11 +1,33 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from streamlit_extras.colored_header import colored_header
-from sqlite_database import get_user_predictions, get_prediction_by_id, db_connected
+from storage import get_user_history, get_user_trends, get_prediction_by_id, db_connected
 from session_state import get_current_user_id, get_current_username, logout_user
 from doctor_advice import display_saved_prescription
+from timeseries import downsample
+from fragments import page_fragment
+from memory import track_frame
 
+# Predictions added to the history list per "Load more"
+HISTORY_PAGE_SIZE = 20
+
+# Predictions averaged in the rolling risk line
+TREND_WINDOW = 5
+
+# Latest predictions read for the risk chart, which LTTB then reduces to CHART_POINT_BUDGET points
+TREND_HISTORY_LIMIT = int(os.environ.get("CARDIOPREDICT_TREND_HISTORY_LIMIT", "5000"))
+
+def load_more_history():
+    """Show another page of the prediction history"""
+    st.session_state.history_limit = st.session_state.get('history_limit', HISTORY_PAGE_SIZE) + HISTORY_PAGE_SIZE
+
+def close_prediction_view():
+    """Go back from a single prediction to the history list"""
+    st.session_state.selected_prediction_id = None
+
+@page_fragment
 def render_user_profile():
     """Render the user profile page with prediction history"""
     user_id = get_current_user_id()
@@ -20,14 +42,15 @@ def render_user_profile():
             logout_user()
             st.rerun()
     
-    # Get user prediction history
-    predictions = get_user_predictions(user_id, limit=20)
+    # Get the list columns for the loaded part of the history, plus overall counts
+    history = get_user_history(user_id, limit=st.session_state.get('history_limit', HISTORY_PAGE_SIZE))
+    predictions = history['predictions']
     
     # Add a health dashboard at the top
     if predictions:
-        total_predictions = len(predictions)
-        high_risk_count = sum(1 for p in predictions if p['risk_level'] == 'High')
-        low_risk_count = total_predictions - high_risk_count
+        total_predictions = history['total']
+        high_risk_count = history['high']
+        low_risk_count = history['low']
         
         st.markdown("""
         <div style="margin-bottom: 20px; margin-top: 10px;">
@@ -107,41 +130,62 @@ def render_user_profile():
         })
     
     history_df = pd.DataFrame(history_data)
+    # Grows with every "Load more", so it counts against history_limit
+    track_frame("profile.history", history_df, key='history_limit')
     
-    # Add buttons to view prescription details
-    for i, pred in enumerate(predictions):
-        has_prescription = 'prescription' in pred
-        prescription_indicator = "📋" if has_prescription else ""
-        
-        if st.button(f"View Details {prescription_indicator} - {pred['date'].strftime('%Y-%m-%d %H:%M')} - {pred['risk_level']} Risk", key=f"view_{pred['id']}"):
-            st.session_state.selected_prediction_id = pred['id']
-            
     # Display the prediction history
     st.dataframe(history_df, use_container_width=True)
     
+    if history['total'] > len(predictions):
+        st.caption(f"Showing your latest {len(predictions)} of {history['total']} predictions")
+        st.button("Load more", on_click=load_more_history)
+    
+    # One selector for the details view; the full prediction is only fetched once one is picked
+    option_labels = {
+        pred['id']: f"{pred['date'].strftime('%Y-%m-%d %H:%M')} - {pred['risk_level']} Risk"
+                    + (" 📋" if pred['has_prescription'] else "")
+        for pred in predictions
+    }
+    if st.session_state.get('selected_prediction_id') not in option_labels:
+        st.session_state.selected_prediction_id = None
+    st.selectbox(
+        "View details",
+        options=list(option_labels),
+        format_func=option_labels.get,
+        index=None,
+        placeholder="Select a prediction to see its details and medical advice",
+        key="selected_prediction_id"
+    )
+    
     # Display detailed prediction view if one is selected
-    if 'selected_prediction_id' in st.session_state and st.session_state.selected_prediction_id:
+    if st.session_state.selected_prediction_id:
         render_single_prediction_view(st.session_state.selected_prediction_id)
-        if st.button("Back to History"):
-            st.session_state.selected_prediction_id = None
-            st.rerun()
+        st.button("Back to History", on_click=close_prediction_view)
+    
+    render_risk_trends(user_id)
+
+def render_risk_trends(user_id):
+    """Render the risk history chart and first-vs-latest comparison from database-computed trends"""
+    trends = get_user_trends(user_id, window=TREND_WINDOW, limit=TREND_HISTORY_LIMIT)
     
     # Create a visualization of risk level history
-    if len(predictions) > 1:
+    if trends['total'] > 1:
         st.subheader("Risk Level History")
         
         # Create chart data
-        chart_data = []
-        for i, pred in enumerate(reversed(predictions)):  # Reverse to show chronological order
-            risk_probability = pred['probability'] if pred['risk_level'] == "High" else 1 - pred['probability']
-            chart_data.append({
-                'Prediction #': i + 1,
-                'Date': pred['date'].strftime("%Y-%m-%d"),
-                'Risk Probability': risk_probability,
-                'Risk Level': pred['risk_level']
-            })
-        
-        chart_df = pd.DataFrame(chart_data)
+        chart_df = pd.DataFrame(trends['points']).rename(columns={
+            'position': 'Prediction #',
+            'risk_probability': 'Risk Probability',
+            'rolling_risk': 'Rolling Average',
+            'risk_level': 'Risk Level'
+        })
+        track_frame("profile.trends", chart_df)
+        
+        # Long histories are downsampled so the chart stays small
+        chart_df = downsample(chart_df, 'Prediction #', 'Risk Probability')
+        if trends['total'] > len(chart_df):
+            st.caption(f"{len(chart_df)} points drawn from your latest {len(trends['points'])} "
+                       f"of {trends['total']} predictions, keeping the peaks and dips")
         
         # Create line chart
         fig = px.line(
@@ -153,49 +197,74 @@ def render_user_profile():
             labels={'Risk Probability': 'Risk Probability', 'Prediction #': 'Prediction Number'},
             color_discrete_map={"High": "red", "Low": "green"}
         )
+        fig.add_scatter(
+            x=chart_df['Prediction #'],
+            y=chart_df['Rolling Average'],
+            mode='lines',
+            name=f"Average of last {TREND_WINDOW}",
+            line={'color': '#325C6A', 'dash': 'dash'}
+        )
         fig.update_layout(yaxis_tickformat='.0%')
         st.plotly_chart(fig, use_container_width=True)
         
+        # Changes since the previous assessment
+        latest_pred = trends['latest']
+        delta_col1, delta_col2, delta_col3 = st.columns(3)
+        delta_col1.metric("Cholesterol", format_metric(latest_pred['chol'], "mg/dL"),
+                          format_delta(latest_pred['chol_delta']), delta_color="inverse")
+        delta_col2.metric("Blood Pressure", format_metric(latest_pred['trestbps'], "mm Hg"),
+                          format_delta(latest_pred['trestbps_delta']), delta_color="inverse")
+        delta_col3.metric("Max Heart Rate", format_metric(latest_pred['thalach'], "bpm"),
+                          format_delta(latest_pred['thalach_delta']))
+        
         # Show data comparison
-        if len(predictions) >= 2:
-            st.subheader("Compare Your First and Latest Prediction")
-            
-            col1, col2 = st.columns(2)
-            
-            first_pred = predictions[-1]  # First prediction (oldest)
-            latest_pred = predictions[0]  # Latest prediction
-            
-            with col1:
-                st.markdown(f"**First Assessment ({first_pred['date'].strftime('%Y-%m-%d')})**")
-                st.markdown(f"Risk Level: **{first_pred['risk_level']}**")
-                first_data = first_pred['user_data']
-                st.markdown(f"Age: {first_data.get('age', 'N/A')}")
-                st.markdown(f"Cholesterol: {first_data.get('chol', 'N/A')} mg/dL")
-                st.markdown(f"Blood Pressure: {first_data.get('trestbps', 'N/A')} mm Hg")
-                st.markdown(f"Max Heart Rate: {first_data.get('thalach', 'N/A')} bpm")
-            
-            with col2:
-                st.markdown(f"**Latest Assessment ({latest_pred['date'].strftime('%Y-%m-%d')})**")
-                st.markdown(f"Risk Level: **{latest_pred['risk_level']}**")
-                latest_data = latest_pred['user_data']
-                st.markdown(f"Age: {latest_data.get('age', 'N/A')}")
-                st.markdown(f"Cholesterol: {latest_data.get('chol', 'N/A')} mg/dL")
-                st.markdown(f"Blood Pressure: {latest_data.get('trestbps', 'N/A')} mm Hg")
-                st.markdown(f"Max Heart Rate: {latest_data.get('thalach', 'N/A')} bpm")
+        st.subheader("Compare Your First and Latest Prediction")
+        
+        col1, col2 = st.columns(2)
+        
+        first_pred = trends['first']  # First prediction (oldest)
+        
+        with col1:
+            st.markdown(f"**First Assessment ({first_pred['date'].strftime('%Y-%m-%d')})**")
+            st.markdown(f"Risk Level: **{first_pred['risk_level']}**")
+            st.markdown(f"Age: {format_metric(first_pred['age'])}")
+            st.markdown(f"Cholesterol: {format_metric(first_pred['chol'], 'mg/dL')}")
+            st.markdown(f"Blood Pressure: {format_metric(first_pred['trestbps'], 'mm Hg')}")
+            st.markdown(f"Max Heart Rate: {format_metric(first_pred['thalach'], 'bpm')}")
+        
+        with col2:
+            st.markdown(f"**Latest Assessment ({latest_pred['date'].strftime('%Y-%m-%d')})**")
+            st.markdown(f"Risk Level: **{latest_pred['risk_level']}**")
+            st.markdown(f"Age: {format_metric(latest_pred['age'])}")
+            st.markdown(f"Cholesterol: {format_metric(latest_pred['chol'], 'mg/dL')}")
+            st.markdown(f"Blood Pressure: {format_metric(latest_pred['trestbps'], 'mm Hg')}")
+            st.markdown(f"Max Heart Rate: {format_metric(latest_pred['thalach'], 'bpm')}")
+        
+        # Track changes in risk
+        if first_pred['risk_level'] != latest_pred['risk_level']:
+            if latest_pred['risk_level'] == "Low":
+                st.success("👏 Your risk level has improved since your first assessment!")
+            else:
+                st.warning("⚠️ Your risk level has increased since your first assessment.")
             
-            # Track changes in risk
-            if first_pred['risk_level'] != latest_pred['risk_level']:
-                if latest_pred['risk_level'] == "Low":
-                    st.success("👏 Your risk level has improved since your first assessment!")
-                else:
-                    st.warning("⚠️ Your risk level has increased since your first assessment.")
-                
-                # Provide simple recommendations based on changes
-                st.markdown("### Recommendations Based on Changes")
-                if latest_data.get('chol', 0) > first_data.get('chol', 0):
-                    st.markdown("- Your cholesterol levels have increased. Consider consulting with a healthcare provider and reviewing your diet.")
-                if latest_data.get('trestbps', 0) > first_data.get('trestbps', 0):
-                    st.markdown("- Your blood pressure has increased. Regular exercise and reducing sodium intake may help.")
+            # Provide simple recommendations based on changes
+            st.markdown("### Recommendations Based on Changes")
+            if (latest_pred['chol'] or 0) > (first_pred['chol'] or 0):
+                st.markdown("- Your cholesterol levels have increased. Consider consulting with a healthcare provider and reviewing your diet.")
+            if (latest_pred['trestbps'] or 0) > (first_pred['trestbps'] or 0):
+                st.markdown("- Your blood pressure has increased. Regular exercise and reducing sodium intake may help.")
+
+def format_metric(value, unit=""):
+    """Format a stored health metric, which may be missing"""
+    if value is None:
+        return "N/A"
+    return f"{value:g} {unit}".strip()
+
+def format_delta(value):
+    """Format the change in a metric since the previous assessment"""
+    if value is None or value == 0:
+        return None
+    return f"{value:+g}"
 
 def render_single_prediction_view(prediction_id):
     """Render a detailed view of a single prediction with prescription information"""
@@ -235,7 +304,7 @@ def render_single_prediction_view(prediction_id):
         st.markdown(f"**Exercise Angina:** {'Yes' if user_data.get('exang', 0) == 1 else 'No'}")
     
     # Display prescription or recommendation data if available
-    if 'prescription' in prediction:
+    if prediction.get('prescription'):
         st.markdown("### Medical Advice")
         st.markdown("The following prescription or recommendation was generated based on your health assessment:")
         